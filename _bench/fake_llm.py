@@ -0,0 +1,244 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import xxhash
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+# --------------------------------------------------
+# ARGUMENTS FROM JSON SCHEMA
+# --------------------------------------------------
+def sample_args(schema: Dict[str, Any], root: Optional[Dict[str, Any]] = None) -> Any:
+    root = root or schema
+    if "$ref" in schema:
+        obj = root
+        for part in schema["$ref"][2:].split("/"):
+            obj = obj.get(part, {})
+        return sample_args(obj, root)
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"]
+        return sample_args(options[0], root) if options else None
+    if "enum" in schema:
+        return schema["enum"][0]
+
+    kind = schema.get("type")
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {k: sample_args(props[k], root) for k in schema.get("required", []) if k in props}
+    if kind == "array":
+        return [sample_args(schema.get("items", {}), root)]
+    return {"string": "sample", "integer": 1, "number": 1.0, "boolean": True}.get(kind, "sample")
+
+
+# --------------------------------------------------
+# SCRIPTED CHAT MODEL
+# --------------------------------------------------
+class ScriptedChatModel(BaseChatModel):
+    # tool-call steps per query, tool calls issued per step, simulated LLM latency
+    tool_steps: int = 2
+    calls_per_step: int = 1
+    latency: float = 0.0
+    answer_words: int = 60
+    # optional: query substring → tool names per step, instead of hash-picked tools
+    script: Dict[str, List[List[str]]] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _plan(self, messages: List[BaseMessage], tools: List[Dict[str, Any]]) -> AIMessage:
+        last_human = 0
+        for i, msg in enumerate(messages):
+            if isinstance(msg, HumanMessage):
+                last_human = i
+        query = str(messages[last_human].content)
+        step = sum(1 for m in messages[last_human:] if isinstance(m, AIMessage))
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4
+
+        names = None
+        for key, steps in self.script.items():
+            if key in query:
+                names = steps[step] if step < len(steps) else []
+                break
+
+        by_name = {t["function"]["name"]: t for t in tools}
+        if names is None and tools and step < self.tool_steps:
+            seed = xxhash.xxh32_intdigest(query)
+            names = [
+                tools[(seed + step * self.calls_per_step + i) % len(tools)]["function"]["name"]
+                for i in range(self.calls_per_step)
+            ]
+
+        calls = []
+        for i, name in enumerate(names or []):
+            if name in by_name:
+                params = by_name[name]["function"].get("parameters", {})
+                calls.append({"name": name, "args": sample_args(params), "id": f"call_{step}_{i}"})
+
+        if calls:
+            content, output_tokens = "", 20 * len(calls)
+        else:
+            last_tool = next((m for m in reversed(messages) if isinstance(m, ToolMessage)), None)
+            seen = len(str(last_tool.content)) if last_tool is not None else 0
+            content = f"Answer to '{query[:40]}' after {step} steps ({seen} chars of tool output). " + " ".join(
+                ["lorem"] * self.answer_words
+            )
+            output_tokens = self.answer_words + 16
+
+        return AIMessage(
+            content=content,
+            tool_calls=calls,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": prompt_tokens + output_tokens,
+            },
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        msg = self._plan(messages, kwargs.get("tools", []))
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._generate(messages, stop=stop, **kwargs)
+
+
+# --------------------------------------------------
+# REPLAY CHAT MODEL
+# --------------------------------------------------
+def replay_key(human: str, step: int) -> str:
+    return f"{step}:{xxhash.xxh3_64_hexdigest(human)}"
+
+
+class ReplayChatModel(BaseChatModel):
+    # answers with recorded responses, matched on (last human message, step within the run);
+    # several recordings of the same turn are served round-robin
+    responses: Dict[str, List[Dict[str, Any]]] = {}
+    # recorded latency is divided by this; 0 skips the sleep entirely
+    speed: float = 1.0
+    # never let the client's response cache answer for the recording
+    cache: Any = False
+    stats: Dict[str, int] = {}
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _pick(self, messages: List[BaseMessage]) -> Optional[Dict[str, Any]]:
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        human = str(messages[last_human].content) if last_human >= 0 else ""
+        step = sum(1 for m in messages[last_human + 1:] if isinstance(m, AIMessage))
+        recorded = self.responses.get(replay_key(human, step))
+        if not recorded:
+            self.stats["misses"] = self.stats.get("misses", 0) + 1
+            return None
+        n = self.stats.get("served", 0)
+        self.stats["served"] = n + 1
+        return recorded[n % len(recorded)]
+
+    def _message(self, event: Optional[Dict[str, Any]]) -> AIMessage:
+        if event is None or "error" in event:
+            return AIMessage(content="[replay] no recorded response for this turn")
+        usage = event.get("usage") or {}
+        return AIMessage(
+            content=event.get("content", ""),
+            tool_calls=event.get("tool_calls", []),
+            usage_metadata={
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            } if usage else None,
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._message(self._pick(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        event = self._pick(messages)
+        if event is not None and self.speed:
+            await asyncio.sleep(event.get("ms", 0) / 1000 / self.speed)
+        return ChatResult(generations=[ChatGeneration(message=self._message(event))])
+
+
+# --------------------------------------------------
+# QUOTA-LIMITED DEPLOYMENT
+# --------------------------------------------------
+class QuotaChatModel(BaseChatModel):
+    # stands in for a deployment with requests/tokens-per-minute quotas, enforced like the provider
+    # does over short windows: over quota it answers 429 with a Retry-After header
+    requests_per_minute: float = 600
+    tokens_per_minute: float = 60_000
+    window: float = 10.0
+    latency: float = 0.2
+    output_tokens: int = 200
+    cache: Any = False
+    stats: Dict[str, int] = {}
+    served: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "quota-fake"
+
+    def _admit(self, tokens: int) -> Optional[float]:
+        # → None when admitted, else seconds until the window has room
+        if self.served is None:
+            self.served = deque()
+        served: Deque[Tuple[float, int]] = self.served
+        now = time.monotonic()
+        while served and now - served[0][0] > self.window:
+            served.popleft()
+        max_requests = self.requests_per_minute * self.window / 60
+        max_tokens = self.tokens_per_minute * self.window / 60
+        used = sum(t for _, t in served)
+        if len(served) + 1 > max_requests or (served and used + tokens > max_tokens):
+            return max(0.0, served[0][0] + self.window - now) if served else self.window
+        served.append((now, tokens))
+        return None
+
+    def _respond(self, messages) -> ChatResult:
+        import httpx
+        import openai
+
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        wait = self._admit(input_tokens + self.output_tokens)
+        if wait is not None:
+            self.stats["throttled"] = self.stats.get("throttled", 0) + 1
+            response = httpx.Response(
+                429,
+                headers={"retry-after": str(max(1, math.ceil(wait)))},
+                request=httpx.Request("POST", "https://quota-fake/chat/completions"),
+            )
+            raise openai.RateLimitError("Rate limit exceeded", response=response, body=None)
+        self.stats["served"] = self.stats.get("served", 0) + 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content="ok " * (self.output_tokens // 2),
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": input_tokens + self.output_tokens,
+            },
+        ))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._respond(messages)
+        time.sleep(self.latency)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        result = self._respond(messages)
+        await asyncio.sleep(self.latency)
+        return result
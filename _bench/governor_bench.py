@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from _bench.fake_llm import QuotaChatModel
+from _bench.run_bench import percentiles
+from _util.llm_governor import LLM_PRIORITY, GovernedChatModel, LLMGovernor, classify, retry_after
+
+# what the OpenAI client does on its own: a couple of retries, each caller for itself
+NAIVE_RETRIES = 2
+
+
+async def naive_call(llm, messages):
+    for attempt in range(NAIVE_RETRIES + 1):
+        try:
+            return await llm.ainvoke(messages)
+        except Exception as e:
+            if attempt == NAIVE_RETRIES or classify(e) is None:
+                raise
+            await asyncio.sleep(retry_after(e) or 0.5 * 2 ** attempt)
+
+
+def naive_call_sync(llm, messages):
+    for attempt in range(NAIVE_RETRIES + 1):
+        try:
+            return llm.invoke(messages)
+        except Exception as e:
+            if attempt == NAIVE_RETRIES or classify(e) is None:
+                raise
+            time.sleep(retry_after(e) or 0.5 * 2 ** attempt)
+
+
+async def run_mode(mode: str, args) -> Dict[str, Any]:
+    provider = QuotaChatModel(
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm, window=args.window, latency=args.latency
+    )
+    governor = None
+    if mode == "governed":
+        governor = LLMGovernor(
+            requests_per_minute=args.rpm * args.quota_error,
+            tokens_per_minute=args.tpm * args.quota_error,
+            burst_seconds=args.burst,
+            max_queue_wait=args.max_wait or None,
+        )
+        llm = GovernedChatModel(inner=provider, governor=governor, cache=False)
+    else:
+        llm = provider
+
+    latencies: Dict[str, List[float]] = {"interactive": [], "bulk": [], "sync": []}
+    failed = {"interactive": 0, "bulk": 0, "sync": 0}
+    deadline = time.monotonic() + args.duration
+
+    async def worker(priority: str, prompt_chars: int, think: float):
+        LLM_PRIORITY.set(priority)
+        messages = [("human", "x" * prompt_chars)]
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                if governor is not None:
+                    await llm.ainvoke(messages)
+                else:
+                    await naive_call(llm, messages)
+                latencies[priority].append(time.monotonic() - started)
+            except Exception:
+                failed[priority] += 1
+            if think:
+                await asyncio.sleep(think)
+
+    def sync_worker():
+        # blocking invoke() from a thread, e.g. a LangChain utility; queued as bulk
+        LLM_PRIORITY.set("bulk")
+        messages = [("human", "x" * args.bulk_chars)]
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                if governor is not None:
+                    llm.invoke(messages)
+                else:
+                    naive_call_sync(llm, messages)
+                latencies["sync"].append(time.monotonic() - started)
+            except Exception:
+                failed["sync"] += 1
+
+    started = time.monotonic()
+    await asyncio.gather(
+        *(worker("interactive", args.interactive_chars, args.think) for _ in range(args.interactive)),
+        *(worker("bulk", args.bulk_chars, 0.0) for _ in range(args.bulk)),
+        *(asyncio.to_thread(sync_worker) for _ in range(args.sync)),
+    )
+    elapsed = time.monotonic() - started
+    served = provider.stats.get("served", 0)
+    per_token = args.bulk_chars // 4 + provider.output_tokens, args.interactive_chars // 4 + provider.output_tokens
+    report = {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 2),
+        "served": served,
+        "provider_429s": provider.stats.get("throttled", 0),
+        "failed": failed,
+        "requests_per_min": round(60 * served / elapsed, 1),
+        "request_tokens": {"bulk": per_token[0], "interactive": per_token[1]},
+        "interactive": percentiles(latencies["interactive"]),
+        "bulk": percentiles(latencies["bulk"]),
+        "sync": percentiles(latencies["sync"]),
+    }
+    if governor is not None:
+        report["governor"] = governor.snapshot()
+    # tokens admitted per minute, from the served counts (the provider only keeps its last window)
+    report["tokens_per_min"] = round(
+        60 * ((len(latencies["bulk"]) + len(latencies["sync"])) * per_token[0] + len(latencies["interactive"]) * per_token[1])
+        / elapsed
+    )
+    return report
+
+
+async def run(args) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "quota": {"rpm": args.rpm, "tpm": args.tpm, "window_s": args.window},
+        "load": {"interactive": args.interactive, "bulk": args.bulk, "sync": args.sync, "duration_s": args.duration},
+        "results": [],
+    }
+    for mode in args.modes.split(","):
+        report["results"].append(await run_mode(mode, args))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM governor against a fake quota-limited deployment")
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--tpm", type=float, default=120_000)
+    parser.add_argument("--window", type=float, default=10.0, help="provider quota window in seconds")
+    parser.add_argument("--burst", type=float, default=1.0, help="governor burst_seconds")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per admitted call")
+    parser.add_argument("--interactive", type=int, default=4, help="interactive callers")
+    parser.add_argument("--bulk", type=int, default=24, help="bulk callers, closed loop")
+    parser.add_argument("--sync", type=int, default=0, help="bulk callers using blocking invoke() from threads")
+    parser.add_argument("--interactive-chars", type=int, default=2_000)
+    parser.add_argument("--bulk-chars", type=int, default=16_000)
+    parser.add_argument("--think", type=float, default=1.0, help="pause between interactive calls")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--quota-error", type=float, default=1.0,
+                        help="governor limits = quota × this (>1 simulates a quota configured too high)")
+    parser.add_argument("--max-wait", type=float, default=30.0,
+                        help="governor max_queue_wait in seconds (0: queue indefinitely)")
+    parser.add_argument("--modes", default="naive,governed")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
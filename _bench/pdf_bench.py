@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from _util.file_ops import save_to_pdf
+from _util.pdf_export import pdf_font, write_pdf
+
+
+def sample_text(lines: int) -> str:
+    # shaped like the indented message dump, with a few long and non latin-1 lines mixed in
+    out: List[str] = []
+    for i in range(lines):
+        if i % 50 == 0:
+            out.append(f'            "content": "Schritt {i}: Größe prüfen → ok ✓ {"lorem ipsum " * 20}",')
+        else:
+            out.append(f'        {{"type": "tool", "name": "integration_suite__get_iflow_{i % 97}", "id": "call_{i}"}},')
+    return "\n".join(out)
+
+
+def timed(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def run(sizes: List[int], engines: List[str]) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"font": pdf_font(), "results": []}
+    writers = {"fpdf": save_to_pdf, "reportlab": write_pdf}
+
+    with tempfile.TemporaryDirectory(prefix="pipo_pdf_bench_") as workdir:
+        for lines in sizes:
+            text = sample_text(lines)
+            for engine in engines:
+                path = os.path.join(workdir, f"{engine}_{lines}.pdf")
+                elapsed = timed(writers[engine], text, path)
+                report["results"].append({
+                    "engine": engine,
+                    "lines": lines,
+                    "seconds": round(elapsed, 3),
+                    "lines_per_s": round(lines / elapsed),
+                    "bytes": os.path.getsize(path),
+                })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PDF export throughput: fpdf vs the reportlab page writer")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated line counts")
+    parser.add_argument("--engines", default="fpdf,reportlab")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run([int(s) for s in args.sizes.split(",")], args.engines.split(","))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
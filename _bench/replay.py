@@ -0,0 +1,166 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from _bench.run_bench import percentiles
+from _util.traffic import read_trace
+
+
+# --------------------------------------------------
+# TRACE
+# --------------------------------------------------
+def load_trace(path: str) -> Dict[str, Any]:
+    from _bench.fake_llm import replay_key
+
+    catalogs: Dict[str, List[Dict[str, Any]]] = {}
+    calls: Dict[str, Dict[str, Dict[str, List[Dict[str, Any]]]]] = {}
+    llm: Dict[str, List[Dict[str, Any]]] = {}
+    asks: List[tuple] = []
+    duration = 0.0
+
+    for event in read_trace(path):
+        kind = event.get("kind")
+        duration = max(duration, event.get("t", 0.0))
+        if kind == "catalog":
+            # the last catalog seen for a server wins (it may have changed during the recording)
+            catalogs[event["server"]] = event["tools"]
+        elif kind == "ask":
+            asks.append((event["t"], event["query"]))
+        elif kind == "tool":
+            calls.setdefault(event["server"], {}).setdefault(event["tool"], {}).setdefault(event["args_hash"], []).append(event)
+        elif kind == "llm" and not event.get("cached"):
+            llm.setdefault(replay_key(event["human"], event["step"]), []).append(event)
+
+    if asks:
+        first = asks[0][0]
+        asks = [(t - first, q) for t, q in asks]
+    return {"catalogs": catalogs, "calls": calls, "llm": llm, "asks": asks, "duration": duration}
+
+
+# --------------------------------------------------
+# REPLAY RUN
+# --------------------------------------------------
+async def run(args) -> Dict[str, Any]:
+    # imported here so logging/artifacts land in the scratch working directory
+    import pipo_client_code as pcc
+    from _bench.fake_llm import ReplayChatModel
+    from _bench.stub_servers import build_replay_servers
+
+    pcc.TRAFFIC_RECORD_FILE = None
+    trace = load_trace(args.trace)
+    if not trace["asks"]:
+        raise SystemExit(f"{args.trace} has no recorded queries")
+
+    speed = args.speed
+    closed_loop = args.closed_loop or not speed
+    servers = build_replay_servers(trace["catalogs"], trace["calls"], speed=speed)
+    llm = ReplayChatModel(responses=trace["llm"], speed=speed)
+
+    # the recording repeated back to back, each copy shifted by the recording's length
+    span = (trace["asks"][-1][0] + 1.0) if trace["asks"] else 0.0
+    schedule = [(offset + i * span, query) for i in range(args.repeat) for offset, query in trace["asks"]]
+
+    tracemalloc.start()
+    mcp = pcc.MultiMCP(servers=servers, llm=llm)
+    startup = await mcp.startup()
+
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+    lags: List[float] = []
+    errors: List[str] = []
+    started = time.perf_counter()
+
+    async def one(offset: float, query: str):
+        due = started + offset / speed if not closed_loop else started
+        if not closed_loop:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        async with gate:
+            begun = time.perf_counter()
+            lags.append(begun - due)
+            try:
+                await mcp.ask(query, memory=mcp.new_memory())
+                latencies.append(time.perf_counter() - begun)
+            except Exception as e:
+                errors.append(repr(e))
+
+    await asyncio.gather(*(one(offset, query) for offset, query in schedule))
+    wall = time.perf_counter() - started
+    await mcp.artifacts.flush()
+
+    telemetry = mcp.telemetry.snapshot()
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "trace": {
+            "path": args.trace,
+            "queries": len(trace["asks"]),
+            "servers": {name: len(tools) for name, tools in trace["catalogs"].items()},
+            "duration_s": round(trace["duration"], 3),
+        },
+        "replay": {
+            "speed": speed,
+            "closed_loop": closed_loop,
+            "concurrency": args.concurrency,
+            "repeat": args.repeat,
+            "queries": len(schedule),
+            "errors": len(errors),
+            "wall_s": round(wall, 3),
+            "throughput_qps": round(len(latencies) / wall, 3) if wall else None,
+        },
+        "ask": percentiles(latencies),
+        "start_lag": percentiles([max(0.0, lag) for lag in lags]),
+        "tool_call": telemetry["latency"].get("mcp.tool", {}),
+        "llm": dict(llm.stats),
+        "concurrency": mcp.concurrency_stats(),
+        "startup": startup,
+    }
+    if errors:
+        report["error_samples"] = errors[:5]
+
+    await mcp.close()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report["memory"] = {"current_mb": round(current / 2**20, 2), "peak_mb": round(peak / 2**20, 2)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a recorded traffic trace (PIPO_TRAFFIC_RECORD) against MultiMCP with stand-in servers and LLM"
+    )
+    parser.add_argument("trace", help="trace file written by the recorder (.jsonl.zst)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="time compression: arrival gaps and recorded latencies are divided by this (0 = no waits)")
+    parser.add_argument("--concurrency", type=int, default=8, help="max queries in flight")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the recording this many times back to back")
+    parser.add_argument("--closed-loop", action="store_true", help="ignore recorded arrival times, keep the queue full")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    args.trace = os.path.abspath(args.trace)
+    out = os.path.abspath(args.out) if args.out else None
+    with tempfile.TemporaryDirectory(prefix="pipo_replay_") as workdir:
+        os.chdir(workdir)
+        os.environ["PIPO_ARTIFACT_ROOT"] = workdir
+        report = asyncio.run(run(args))
+        os.chdir(PROJECT_ROOT)
+
+    text = json.dumps(report, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from _util.router import QueryRouter
+
+LABELS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_queries.jsonl")
+
+
+# --------------------------------------------------
+# LEGACY KEYWORD SCANS (baseline)
+# --------------------------------------------------
+def legacy_route(query: str) -> Tuple[Optional[str], bool]:
+    q = query.lower()
+    server = None
+    if any(k in q for k in ["document", "documentation", "spec", "template", "sap standard"]):
+        server = "documentation_mcp"
+    elif any(k in q for k in ["iflow", "integration flow", "integration suite", "deploy flow"]):
+        server = "integration_suite"
+    elif any(k in q for k in ["test", "testing", "validate", "verification", "assertion"]):
+        server = "mcp_testing"
+    is_doc = any(k in q for k in ["document", "documentation", "guide", "spec", "template", "sap standard", "adapter guide"])
+    return server, is_doc
+
+
+def load_labels(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(route: Callable[[str], Tuple[Optional[str], bool]], labels: List[Dict], repeat: int) -> Dict:
+    server_hits = doc_hits = 0
+    misses = []
+    for item in labels:
+        server, is_doc = route(item["query"])
+        server_hits += server == item["server"]
+        doc_hits += is_doc == item["documentation"]
+        if server != item["server"]:
+            misses.append({"query": item["query"], "expected": item["server"], "got": server})
+
+    queries = [item["query"] for item in labels]
+    seconds = timeit.timeit(lambda: [route(q) for q in queries], number=repeat)
+    return {
+        "server_accuracy": round(server_hits / len(labels), 3),
+        "documentation_accuracy": round(doc_hits / len(labels), 3),
+        "us_per_query": round(1e6 * seconds / (repeat * len(queries)), 2),
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routing accuracy and speed: compiled router vs legacy keyword scans")
+    parser.add_argument("--labels", default=LABELS_FILE)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    from pipo_client_code import ROUTING_KEYWORDS, DOCUMENTATION_KEYWORDS
+
+    router = QueryRouter(ROUTING_KEYWORDS, DOCUMENTATION_KEYWORDS)
+
+    def compiled_route(query):
+        res = router.route(query)
+        return res.server, res.is_documentation
+
+    labels = load_labels(args.labels)
+    report = {
+        "queries": len(labels),
+        "compiled": evaluate(compiled_route, labels, args.repeat),
+        "legacy": evaluate(legacy_route, labels, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+DEFAULT_QUERIES = [
+    "List all iFlow packages in the integration suite",
+    "Validate the order iflow and run the regression test",
+    "Generate SAP standard documentation for the Salesforce adapter",
+    "What can you do?",
+]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - started, result
+
+
+# --------------------------------------------------
+# BENCHMARK RUN
+# --------------------------------------------------
+async def run(args) -> Dict[str, Any]:
+    # imported here so logging/artifacts land in the scratch working directory
+    import pipo_client_code as pcc
+    from _bench.fake_llm import ScriptedChatModel
+    from _bench.stub_servers import build_stub_servers
+
+    profile = {
+        "tool_count": args.tools,
+        "schema_depth": args.depth,
+        "latency": args.tool_latency,
+        "payload_bytes": args.payload,
+    }
+    servers = build_stub_servers(pcc.MCP_SERVERS, **profile)
+
+    def make_llm():
+        return ScriptedChatModel(
+            tool_steps=args.tool_steps,
+            calls_per_step=args.calls_per_step,
+            latency=args.llm_latency,
+        )
+
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "profile": profile,
+        "llm": {"latency": args.llm_latency, "tool_steps": args.tool_steps, "calls_per_step": args.calls_per_step},
+    }
+    tracemalloc.start()
+
+    # cold startup: no catalog cache on disk
+    mcp = pcc.MultiMCP(servers=servers, llm=make_llm())
+    startup = {}
+    startup["connect_s"], _ = await timed(mcp.connect())
+    startup["discover_cold_s"], _ = await timed(mcp.discover_tools())
+    startup["build_agent_s"], _ = await timed(mcp.build_agent())
+    startup["tools"] = len(mcp.tools)
+
+    # warm startup: catalog cache written by the cold run
+    warm = pcc.MultiMCP(servers=servers, llm=make_llm())
+    await warm.connect()
+    startup["discover_warm_s"], _ = await timed(warm.discover_tools())
+    if warm._catalog_task is not None:
+        await warm._catalog_task
+    await warm.close()
+    report["startup"] = {k: round(v, 4) if isinstance(v, float) else v for k, v in startup.items()}
+
+    # per-ask latency
+    ask_samples = []
+    for i in range(args.asks):
+        query = DEFAULT_QUERIES[i % len(DEFAULT_QUERIES)]
+        elapsed, _ = await timed(mcp.ask(f"{query} #{i}"))
+        ask_samples.append(elapsed)
+    report["ask"] = percentiles(ask_samples)
+
+    # raw execute() overhead over the stub's own latency (uncached tool)
+    server = next(iter(servers))
+    tool = next(t for t in mcp.tool_index[server].values() if mcp._cache_ttl(server, t.mcp_tool_name) == 0)
+    from _bench.fake_llm import sample_args
+    call_args = sample_args(tool.args_schema.model_json_schema())
+    exec_samples = []
+    for _ in range(args.calls):
+        elapsed, _ = await timed(mcp.execute(server, tool.mcp_tool_name, call_args))
+        exec_samples.append(elapsed)
+    exec_stats = percentiles(exec_samples)
+    exec_stats["overhead_mean_ms"] = round(exec_stats["mean_ms"] - args.tool_latency * 1000, 3)
+    report["tool_call"] = exec_stats
+
+    # more concurrent calls than the server's cap, with an attempt timeout only a little above the
+    # stub latency: queueing for a slot must not turn into timeouts or open the breaker
+    limit = pcc.SERVER_CONCURRENCY.get(server, 4)
+    # open the pool's sessions first; connecting is part of an attempt and would dominate a tight timeout
+    await asyncio.gather(*(mcp.execute(server, tool.mcp_tool_name, call_args) for _ in range(limit)))
+    attempt = max(1.5 * args.tool_latency, args.tool_latency + 0.05)
+    mcp.resilience.timeouts[server] = {"attempt": attempt, "budget": attempt * (args.over_cap // limit + 3)}
+    elapsed, results = await timed(asyncio.gather(
+        *(mcp.execute(server, tool.mcp_tool_name, call_args) for _ in range(args.over_cap))
+    ))
+    resilience = mcp.resilience_stats()[server]
+    report["over_cap"] = {
+        "calls": args.over_cap,
+        "limit": limit,
+        "attempt_timeout_s": attempt,
+        "errors": sum(1 for r in results if r.startswith("ERROR")),
+        "error_samples": sorted({r[:160] for r in results if r.startswith("ERROR")})[:3],
+        "resilience": resilience,
+        "peak_in_flight": mcp.concurrency_stats()[server]["peak_in_flight"],
+        "wall_s": round(elapsed, 4),
+    }
+
+    flush_s, _ = await timed(mcp.artifacts.flush())
+    artifacts = mcp.artifacts.snapshot()
+    artifacts["flush_wait_s"] = round(flush_s, 4)
+    artifacts["per_run_ms"] = round(1000 * artifacts["write_time"] / artifacts["written"], 3) if artifacts["written"] else None
+    report["artifacts"] = artifacts
+
+    await mcp.close()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    report["memory"] = {"current_mb": round(current / 2**20, 2), "peak_mb": round(peak / 2**20, 2)}
+    report["pools"] = mcp.pool_stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline MultiMCP benchmark with stub MCP servers and a fake LLM")
+    parser.add_argument("--tools", type=int, default=20, help="tools per stub server")
+    parser.add_argument("--depth", type=int, default=2, help="nesting depth of tool input schemas")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="seconds per stub tool call")
+    parser.add_argument("--payload", type=int, default=2048, help="bytes per stub tool result")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds per fake LLM turn")
+    parser.add_argument("--tool-steps", type=int, default=2)
+    parser.add_argument("--calls-per-step", type=int, default=1)
+    parser.add_argument("--asks", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--over-cap", type=int, default=24, help="concurrent calls fired at one server past its cap")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    out = os.path.abspath(args.out) if args.out else None
+    with tempfile.TemporaryDirectory(prefix="pipo_bench_") as workdir:
+        os.chdir(workdir)
+        os.environ["PIPO_ARTIFACT_ROOT"] = workdir
+        report = asyncio.run(run(args))
+        os.chdir(PROJECT_ROOT)
+
+    text = json.dumps(report, indent=2)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from _util.file_ops import gather_repo_files
+from _util.repo_scan import RepoScanner
+
+FILES_PER_DIR = 100
+
+
+def build_tree(root: str, files: int, seed: int = 7) -> Dict[str, int]:
+    # shaped like a CPI/Neo export: mostly small XML/groovy/properties, some large, some binary
+    rng = random.Random(seed)
+    counts = {"text": 0, "large": 0, "binary": 0, "jar": 0}
+    for i in range(files):
+        directory = os.path.join(root, f"pkg_{i // (FILES_PER_DIR * 10)}", f"iflow_{i // FILES_PER_DIR}")
+        if i % FILES_PER_DIR == 0:
+            os.makedirs(directory, exist_ok=True)
+        roll = rng.random()
+        if roll < 0.02:
+            name, data, kind = f"lib_{i}.jar", os.urandom(4096), "jar"
+        elif roll < 0.07:
+            name, data, kind = f"icon_{i}.png", b"\x89PNG\r\n\x1a\n\0\0" + os.urandom(2048), "binary"
+        elif roll < 0.12:
+            body = "".join(f'  <step id="{n}" adapter="SFTP">payload {n}</step>\n' for n in range(2000))
+            name, data, kind = f"flow_{i}.iflw", f"<flow>\n{body}</flow>\n".encode(), "large"
+        else:
+            body = "".join(f"property.{n}=value {n} für Größe\n" for n in range(rng.randint(5, 60)))
+            name, data, kind = f"script_{i}.groovy", body.encode(), "text"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+        counts[kind] += 1
+    return counts
+
+
+def legacy_gather(repo: str, out_path: str) -> int:
+    # what gather_repo_files did before: os.walk, every file read in full and cut to 2000 chars,
+    # then one indent=4 JSON dump of everything
+    filenames, snippets = [], {}
+    for root, dirs, files in os.walk(repo):
+        dirs[:] = [d for d in dirs if d not in (".git", "node_modules", "__pycache__", ".venv", ".idea")]
+        for f in files:
+            if f.endswith(".jar"):
+                continue
+            rel_path = os.path.relpath(os.path.join(root, f), repo)
+            filenames.append(rel_path)
+            with open(os.path.join(root, f), "r", encoding="utf-8", errors="ignore") as fh:
+                snippets[rel_path] = fh.read()[:2000]
+    with open(out_path, "w", encoding="utf-8") as fh:
+        json.dump({"filenames": filenames, "snippets": snippets}, fh, indent=4, ensure_ascii=False)
+    return len(filenames)
+
+
+def timed_gather(fn, *args) -> Dict[str, Any]:
+    started = time.perf_counter()
+    n = fn(*args)
+    if isinstance(n, tuple):
+        n = len(n[0])
+    elapsed = time.perf_counter() - started
+    return {"files": n, "seconds": round(elapsed, 3), "files_per_s": round(n / elapsed)}
+
+
+def timed_scan(scanner: RepoScanner, repo: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    first = None
+    n = 0
+    for _ in scanner.scan(repo):
+        if first is None:
+            first = time.perf_counter() - started
+        n += 1
+    elapsed = time.perf_counter() - started
+    return {
+        "files": n,
+        "seconds": round(elapsed, 3),
+        "files_per_s": round(n / elapsed),
+        "first_entry_ms": round((first or 0) * 1000, 3),
+        **{k: v for k, v in scanner.snapshot().items() if k in ("read", "cached", "binary", "removed")},
+    }
+
+
+def touch(repo: str, fraction: float, seed: int = 11) -> int:
+    rng = random.Random(seed)
+    touched = 0
+    for root, _, files in os.walk(repo):
+        for f in files:
+            if f.endswith(".groovy") and rng.random() < fraction:
+                with open(os.path.join(root, f), "a", encoding="utf-8") as fh:
+                    fh.write("property.touched=1\n")
+                touched += 1
+    return touched
+
+
+def run(files: int, workers: List[int], touch_fraction: float) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"files": files, "cpu_count": os.cpu_count(), "results": []}
+
+    with tempfile.TemporaryDirectory(prefix="pipo_scan_bench_") as workdir:
+        repo = os.path.join(workdir, "repo")
+        started = time.perf_counter()
+        report["tree"] = build_tree(repo, files)
+        report["build_s"] = round(time.perf_counter() - started, 3)
+
+        # end to end: walk + read + JSON dump (gather_repo_files writes under the cwd's _temp)
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            report["results"].append({"mode": "gather_legacy", **timed_gather(legacy_gather, repo, os.path.join(workdir, "legacy.json"))})
+            report["results"].append({"mode": "gather_cold", **timed_gather(gather_repo_files, repo)})
+            report["results"].append({"mode": "gather_warm", **timed_gather(gather_repo_files, repo)})
+        finally:
+            os.chdir(cwd)
+
+        for w in workers:
+            index = os.path.join(workdir, f"index_{w}.sqlite3")
+            scanner = RepoScanner(workers=w, index_path=index)
+            report["results"].append({"mode": "cold", "workers": w, **timed_scan(scanner, repo)})
+            report["results"].append({"mode": "warm", "workers": w, **timed_scan(scanner, repo)})
+
+        w = workers[-1]
+        scanner = RepoScanner(workers=w, index_path=os.path.join(workdir, f"index_{w}.sqlite3"))
+        touched = touch(repo, touch_fraction)
+        report["results"].append({"mode": "incremental", "workers": w, "touched": touched, **timed_scan(scanner, repo)})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the repo scanner on a synthetic CPI-style tree")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--workers", default="1,8", help="comma-separated thread pool sizes")
+    parser.add_argument("--touch", type=float, default=0.01, help="fraction of text files changed before the incremental run")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.files, [int(w) for w in args.workers.split(",")], args.touch)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
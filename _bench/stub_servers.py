@@ -0,0 +1,115 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.tools.tool import Tool, ToolResult
+from mcp.types import TextContent
+
+from _util.traffic import args_hash
+
+TOOL_VERBS = ["list", "get", "search", "create", "deploy"]
+
+
+# --------------------------------------------------
+# STUB TOOL
+# --------------------------------------------------
+class StubTool(Tool):
+    latency: float = 0.0
+    payload_bytes: int = 1024
+
+    async def run(self, arguments: Dict[str, Any]) -> ToolResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = json.dumps({"tool": self.name, "args": arguments})
+        pad = "x" * max(0, self.payload_bytes - len(body))
+        return ToolResult(content=[TextContent(type="text", text=body + pad)])
+
+
+def nested_schema(depth: int, width: int = 3) -> Dict[str, Any]:
+    props: Dict[str, Any] = {"name": {"type": "string"}}
+    for i in range(1, width):
+        props[f"field_{i}"] = {"type": ["string", "integer", "boolean"][i % 3]}
+    props["mode"] = {"enum": ["fast", "full"]}
+    props["tags"] = {"type": "array", "items": {"type": "string"}}
+
+    required = ["name"]
+    if depth > 0:
+        props["child"] = nested_schema(depth - 1, width)
+        required.append("child")
+    return {"type": "object", "properties": props, "required": required}
+
+
+# --------------------------------------------------
+# STUB SERVERS
+# --------------------------------------------------
+def build_stub_server(
+    name: str,
+    tool_count: int = 20,
+    schema_depth: int = 2,
+    latency: float = 0.05,
+    payload_bytes: int = 2048,
+) -> FastMCP:
+    server = FastMCP(name)
+    for i in range(tool_count):
+        verb = TOOL_VERBS[i % len(TOOL_VERBS)]
+        server.add_tool(StubTool(
+            name=f"{verb}_{name}_{i}",
+            description=f"Stub {verb} tool #{i} standing in for {name}.",
+            parameters=nested_schema(schema_depth),
+            latency=latency,
+            payload_bytes=payload_bytes,
+        ))
+    return server
+
+
+def build_stub_servers(names, **profile) -> Dict[str, FastMCP]:
+    return {name: build_stub_server(name, **profile) for name in names}
+
+
+# --------------------------------------------------
+# REPLAY SERVERS
+# --------------------------------------------------
+class ReplayTool(Tool):
+    # recorded calls for this tool: args hash → events; unmatched args fall back to any recording
+    recorded: Dict[str, List[Dict[str, Any]]] = {}
+    speed: float = 1.0
+    served: int = 0
+
+    async def run(self, arguments: Dict[str, Any]) -> ToolResult:
+        events = self.recorded.get(args_hash(arguments)) or [e for group in self.recorded.values() for e in group]
+        if not events:
+            return ToolResult(content=[TextContent(type="text", text=json.dumps({"tool": self.name, "replay": "no recording"}))])
+        event = events[self.served % len(events)]
+        self.served += 1
+
+        if self.speed:
+            await asyncio.sleep(event.get("ms", 0) / 1000 / self.speed)
+        if "error" in event:
+            raise ToolError(event["error"])
+        text = event.get("result", "")
+        # the recorder keeps at most max_result_bytes; pad back to the size the server sent
+        pad = event.get("bytes", 0) - len(text.encode("utf-8"))
+        return ToolResult(content=[TextContent(type="text", text=text + " " * pad if pad > 0 else text)])
+
+
+def build_replay_servers(
+    catalogs: Dict[str, List[Dict[str, Any]]],
+    calls: Dict[str, Dict[str, Dict[str, List[Dict[str, Any]]]]],
+    speed: float = 1.0,
+) -> Dict[str, FastMCP]:
+    # catalogs: server → recorded tool list; calls: server → tool → args hash → recorded calls
+    servers = {}
+    for name, tools in catalogs.items():
+        server = FastMCP(name)
+        for t in tools:
+            server.add_tool(ReplayTool(
+                name=t["name"],
+                description=t.get("description", ""),
+                parameters=t.get("inputSchema") or {"type": "object", "properties": {}},
+                recorded=calls.get(name, {}).get(t["name"], {}),
+                speed=speed,
+            ))
+        servers[name] = server
+    return servers
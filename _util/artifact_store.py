@@ -0,0 +1,350 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import xxhash
+import zstandard
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    ts REAL NOT NULL,
+    query TEXT,
+    query_hash TEXT,
+    answer_preview TEXT,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    raw_bytes INTEGER NOT NULL,
+    pdf_path TEXT,
+    json_path TEXT
+);
+CREATE TABLE IF NOT EXISTS run_tools (
+    run_id TEXT NOT NULL,
+    server TEXT,
+    tool TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    live_bytes INTEGER NOT NULL DEFAULT 0,
+    sealed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs(ts);
+CREATE INDEX IF NOT EXISTS idx_runs_query_hash ON runs(query_hash);
+CREATE INDEX IF NOT EXISTS idx_runs_segment ON runs(segment);
+CREATE INDEX IF NOT EXISTS idx_run_tools_run ON run_tools(run_id);
+CREATE INDEX IF NOT EXISTS idx_run_tools_server ON run_tools(server, run_id);
+CREATE INDEX IF NOT EXISTS idx_run_tools_tool ON run_tools(tool, run_id);
+"""
+
+RUN_COLUMNS = "run_id, ts, query, query_hash, answer_preview, raw_bytes, length, pdf_path, json_path"
+
+
+def new_run_id() -> str:
+    # sortable by time, unique across threads and processes
+    return f"{datetime.now():%Y%m%d_%H%M%S_%f}_{uuid.uuid4().hex[:8]}"
+
+
+def _writer_alive(segment: str) -> bool:
+    # segments are named seg_<ns>_<pid>_<rand>.zst; a pid we cannot check counts as alive
+    try:
+        pid = int(segment.split("_")[2])
+    except (IndexError, ValueError):
+        return False
+    if pid == os.getpid():
+        return True
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED: exists, owned by someone else
+        kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def query_hash(query: str) -> str:
+    return xxhash.xxh3_64_hexdigest(" ".join((query or "").lower().split()))
+
+
+# --------------------------------------------------
+# SEGMENTED RUN STORE
+# --------------------------------------------------
+class ArtifactStore:
+    # runs are zstd frames appended to segment files; a SQLite index maps run → (segment, offset, length).
+    # every writer (process or store instance) appends to its own segment, so writers never interleave.
+    def __init__(
+        self,
+        root: str,
+        level: int = 3,
+        segment_bytes: int = 64 * 1024 * 1024,
+        max_age_days: Optional[float] = 90,
+        max_runs: Optional[int] = 50_000,
+        compact_ratio: float = 0.5,
+    ):
+        self.root = root
+        self.level = level
+        self.segment_bytes = segment_bytes
+        self.max_age_days = max_age_days
+        self.max_runs = max_runs
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._cctx = zstandard.ZstdCompressor(level=level)
+        self._dctx = zstandard.ZstdDecompressor()
+        self._segment: Optional[str] = None
+        self._segment_size = 0
+        self.stats = {"appended": 0, "raw_bytes": 0, "stored_bytes": 0, "expired": 0, "compacted": 0}
+
+    # -----------------------------
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.root, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _seal(self, db: sqlite3.Connection):
+        if self._segment is not None:
+            db.execute("UPDATE segments SET sealed = 1 WHERE name = ?", (self._segment,))
+            self._segment = None
+
+    def _writable_segment(self, db: sqlite3.Connection, incoming: int) -> str:
+        if self._segment is not None and self._segment_size + incoming > self.segment_bytes:
+            self._seal(db)
+        if self._segment is None:
+            self._segment = f"seg_{time.time_ns()}_{os.getpid()}_{uuid.uuid4().hex[:6]}.zst"
+            self._segment_size = 0
+            db.execute("INSERT INTO segments(name) VALUES (?)", (self._segment,))
+        return self._segment
+
+    def _append_frame(self, db: sqlite3.Connection, frame: bytes) -> Tuple[str, int]:
+        segment = self._writable_segment(db, len(frame))
+        with open(self._segment_path(segment), "ab") as f:
+            offset = f.tell()
+            f.write(frame)
+        self._segment_size = offset + len(frame)
+        db.execute(
+            "UPDATE segments SET bytes = bytes + ?, live_bytes = live_bytes + ? WHERE name = ?",
+            (len(frame), len(frame), segment),
+        )
+        return segment, offset
+
+    # -----------------------------
+    def append(
+        self,
+        record: Dict[str, Any],
+        run_id: Optional[str] = None,
+        query: Optional[str] = None,
+        answer: Optional[str] = None,
+        tools: Iterable[Tuple[Optional[str], str]] = (),
+        pdf_path: Optional[str] = None,
+        json_path: Optional[str] = None,
+    ) -> str:
+        run_id = run_id or new_run_id()
+        raw = json.dumps(record, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+
+        with self._lock:
+            frame = self._cctx.compress(raw)
+            db = self._conn()
+            with db:
+                segment, offset = self._append_frame(db, frame)
+                db.execute(
+                    "INSERT INTO runs(run_id, ts, query, query_hash, answer_preview, segment, offset, length, "
+                    "raw_bytes, pdf_path, json_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id, time.time(), query, query_hash(query) if query else None, (answer or "")[:200],
+                        segment, offset, len(frame), len(raw), pdf_path, json_path,
+                    ),
+                )
+                db.executemany(
+                    "INSERT INTO run_tools(run_id, server, tool) VALUES (?, ?, ?)",
+                    [(run_id, server, tool) for server, tool in tools],
+                )
+            self.stats["appended"] += 1
+            self.stats["raw_bytes"] += len(raw)
+            self.stats["stored_bytes"] += len(frame)
+        return run_id
+
+    # -----------------------------
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT segment, offset, length FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            segment, offset, length = row
+            with open(self._segment_path(segment), "rb") as f:
+                f.seek(offset)
+                frame = f.read(length)
+        return json.loads(self._dctx.decompress(frame))
+
+    def set_pdf(self, run_id: str, pdf_path: str):
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute("UPDATE runs SET pdf_path = ? WHERE run_id = ?", (pdf_path, run_id))
+
+    def find(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        query: Optional[str] = None,
+        server: Optional[str] = None,
+        tool: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        sql = [f"SELECT {RUN_COLUMNS} FROM runs r WHERE 1=1"]
+        params: List[Any] = []
+        if since is not None:
+            sql.append("AND r.ts >= ?")
+            params.append(since)
+        if until is not None:
+            sql.append("AND r.ts < ?")
+            params.append(until)
+        if query:
+            sql.append("AND r.query_hash = ?")
+            params.append(query_hash(query))
+        if server:
+            sql.append("AND EXISTS (SELECT 1 FROM run_tools t WHERE t.run_id = r.run_id AND t.server = ?)")
+            params.append(server)
+        if tool:
+            sql.append("AND EXISTS (SELECT 1 FROM run_tools t WHERE t.run_id = r.run_id AND t.tool = ?)")
+            params.append(tool)
+        sql.append("ORDER BY r.ts DESC LIMIT ?")
+        params.append(limit)
+
+        with self._lock:
+            db = self._conn()
+            rows = db.execute(" ".join(sql), params).fetchall()
+            names = [c.strip() for c in RUN_COLUMNS.split(",")]
+            runs = [dict(zip(names, row)) for row in rows]
+            for run in runs:
+                run["tools"] = [
+                    {"server": s, "tool": t}
+                    for s, t in db.execute("SELECT server, tool FROM run_tools WHERE run_id = ?", (run["run_id"],))
+                ]
+        return runs
+
+    # -----------------------------
+    def _drop_runs(self, db: sqlite3.Connection, rows: List[Tuple[str, str, int, Optional[str], Optional[str]]]):
+        for run_id, segment, length, pdf_path, json_path in rows:
+            db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            db.execute("DELETE FROM run_tools WHERE run_id = ?", (run_id,))
+            db.execute("UPDATE segments SET live_bytes = live_bytes - ? WHERE name = ?", (length, segment))
+            for path in (pdf_path, json_path):
+                if path and os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        self.stats["expired"] += len(rows)
+
+    def apply_retention(self) -> int:
+        cols = "run_id, segment, length, pdf_path, json_path"
+        with self._lock:
+            db = self._conn()
+            with db:
+                expired = []
+                if self.max_age_days is not None:
+                    cutoff = time.time() - self.max_age_days * 86400
+                    expired += db.execute(f"SELECT {cols} FROM runs WHERE ts < ?", (cutoff,)).fetchall()
+                if self.max_runs is not None:
+                    expired += db.execute(
+                        f"SELECT {cols} FROM runs ORDER BY ts DESC LIMIT -1 OFFSET ?", (self.max_runs,)
+                    ).fetchall()
+                expired = list({row[0]: row for row in expired}.values())
+                self._drop_runs(db, expired)
+        if expired:
+            logger.info(f"[STORE] retention expired {len(expired)} runs")
+        return len(expired)
+
+    def compact(self) -> int:
+        # rewrite sealed segments that are mostly dead; live frames are copied as-is (no recompression)
+        compacted = 0
+        with self._lock:
+            db = self._conn()
+            victims = db.execute(
+                "SELECT name FROM segments WHERE sealed = 1 AND (live_bytes <= 0 OR live_bytes < bytes * ?)",
+                (self.compact_ratio,),
+            ).fetchall()
+            for (name,) in victims:
+                path = self._segment_path(name)
+                with db:
+                    rows = db.execute(
+                        "SELECT run_id, offset, length FROM runs WHERE segment = ? ORDER BY offset", (name,)
+                    ).fetchall()
+                    if rows:
+                        with open(path, "rb") as src:
+                            for run_id, offset, length in rows:
+                                src.seek(offset)
+                                segment, new_offset = self._append_frame(db, src.read(length))
+                                db.execute(
+                                    "UPDATE runs SET segment = ?, offset = ? WHERE run_id = ?",
+                                    (segment, new_offset, run_id),
+                                )
+                    db.execute("DELETE FROM segments WHERE name = ?", (name,))
+                if os.path.exists(path):
+                    os.remove(path)
+                compacted += 1
+            self.stats["compacted"] += compacted
+        if compacted:
+            logger.info(f"[STORE] compacted {compacted} segments")
+        return compacted
+
+    def seal_orphans(self) -> int:
+        # a writer that crashed never sealed its segment, which would keep it out of compaction for good
+        with self._lock:
+            db = self._conn()
+            open_segments = db.execute("SELECT name FROM segments WHERE sealed = 0").fetchall()
+            orphans = [(name,) for (name,) in open_segments if name != self._segment and not _writer_alive(name)]
+            if orphans:
+                with db:
+                    db.executemany("UPDATE segments SET sealed = 1 WHERE name = ?", orphans)
+        if orphans:
+            logger.info(f"[STORE] sealed {len(orphans)} segments left open by exited writers")
+        return len(orphans)
+
+    def maintain(self):
+        self.seal_orphans()
+        self.apply_retention()
+        self.compact()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                with self._db:
+                    self._seal(self._db)
+                self._db.close()
+                self._db = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["ratio"] = round(stats["raw_bytes"] / stats["stored_bytes"], 2) if stats["stored_bytes"] else None
+        return stats
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from opentelemetry.context import Context
+
+from _util.artifact_store import ArtifactStore, new_run_id
+from _util.file_ops import pdf_and_json_path
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# MESSAGE FILTERS
+# --------------------------------------------------
+HUMAN_UNWANTED = {
+    "additional_kwargs",
+    "response_metadata",
+    "id",
+    "name"
+}
+
+AI_UNWANTED = {
+    "additional_kwargs",
+    "response_metadata",
+    "usage_metadata",
+    "id",
+    "invalid_tool_calls",
+    "name"
+}
+
+TOOL_UNWANTED = {
+    "additional_kwargs",
+    "response_metadata",
+    "tool_call_id",
+    "artifact",
+    "id"
+}
+
+UNWANTED_BY_TYPE = {
+    "human": HUMAN_UNWANTED,
+    "ai": AI_UNWANTED,
+    "tool": TOOL_UNWANTED,
+}
+
+DROP_POLICIES = {"block", "drop_newest", "drop_oldest"}
+
+
+def filter_message(msg_dict: Dict[str, Any]) -> Dict[str, Any]:
+    unwanted = UNWANTED_BY_TYPE.get(msg_dict.get("type"), set())
+    return {k: v for k, v in msg_dict.items() if k not in unwanted}
+
+
+def serialize_messages(agent_messages: List[Any]):
+    full = []
+    filtered = []
+    for idx, msg in enumerate(agent_messages):
+        msg_dict = msg.model_dump()
+        msg_dict["index"] = idx
+        full.append(msg_dict)
+        filtered.append(filter_message(msg_dict))
+    return full, filtered
+
+
+PDF_MODES = ("full", "answer")
+
+
+def final_answer(agent_messages: List[Any]) -> str:
+    content = getattr(agent_messages[-1], "content", agent_messages[-1]) if agent_messages else ""
+    return content if isinstance(content, str) else json.dumps(content, indent=4, ensure_ascii=False, default=str)
+
+
+def render_pdf(run_id: str, full: List[Dict[str, Any]], answer: str, pdf_mode: str = "full") -> str:
+    # reportlab is only needed once the first PDF is written
+    from _util.pdf_export import write_pdf
+
+    if pdf_mode not in PDF_MODES:
+        raise ValueError(f"Unknown PDF mode: {pdf_mode}")
+    pdf_path, _ = pdf_and_json_path(run_id)
+    if pdf_mode == "answer":
+        text = answer
+    else:
+        text = json.dumps([filter_message(m) for m in full], indent=4, ensure_ascii=False, default=str)
+    write_pdf(text, pdf_path)
+    return pdf_path
+
+
+def write_artifacts(
+    agent_messages: List[Any],
+    pdf_mode: Optional[str] = None,
+    store: Optional[ArtifactStore] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> str:
+    # the full message dump lives only in the store; a PDF is rendered per run only when pdf_mode is set
+    meta = meta or {}
+    run_id = new_run_id()
+    full, _ = serialize_messages(agent_messages)
+    answer = final_answer(agent_messages)
+    pdf_path = render_pdf(run_id, full, answer, pdf_mode) if pdf_mode else None
+
+    if store is not None:
+        store.append(
+            {"run_id": run_id, "query": meta.get("query"), "messages": full},
+            run_id=run_id,
+            query=meta.get("query"),
+            answer=answer,
+            tools=meta.get("tools", ()),
+            pdf_path=pdf_path,
+        )
+    return run_id
+
+
+def export_pdf(store: ArtifactStore, run_id: str, pdf_mode: str = "full") -> Optional[str]:
+    # on-demand PDF for a stored run; the path is recorded so retention removes it with the run
+    record = store.get(run_id)
+    if record is None:
+        return None
+    full = record.get("messages", [])
+    answer = full[-1].get("content", "") if full else ""
+    if not isinstance(answer, str):
+        answer = json.dumps(answer, indent=4, ensure_ascii=False, default=str)
+    pdf_path = render_pdf(run_id, full, answer, pdf_mode)
+    store.set_pdf(run_id, pdf_path)
+    return pdf_path
+
+
+# --------------------------------------------------
+# BACKGROUND ARTIFACT PIPELINE
+# --------------------------------------------------
+class ArtifactPipeline:
+    def __init__(
+        self,
+        max_queue: int = 8,
+        policy: str = "block",
+        workers: int = 1,
+        pdf_mode: Optional[str] = None,
+        store: Optional[ArtifactStore] = None,
+        maintain_interval: float = 3600.0,
+        telemetry=None,
+    ):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown artifact policy: {policy}")
+        if pdf_mode is not None and pdf_mode not in PDF_MODES:
+            raise ValueError(f"Unknown PDF mode: {pdf_mode}")
+        self.max_queue = max_queue
+        self.policy = policy
+        self.workers = workers
+        self.pdf_mode = pdf_mode
+        self.store = store
+        self.maintain_interval = maintain_interval
+        self.telemetry = telemetry
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._closed = False
+
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "write_time": 0.0,
+        }
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            if self.store is not None:
+                self._tasks.append(asyncio.create_task(self._maintain_loop()))
+
+    async def _maintain_loop(self):
+        # once at start (sealing segments left behind by crashed writers), then on a timer,
+        # so retention and compaction run however few runs this process writes
+        while True:
+            try:
+                await asyncio.to_thread(self.store.maintain)
+            except Exception as e:
+                logger.error(f"[ARTIFACTS] store maintenance failed → {e}")
+            await asyncio.sleep(self.maintain_interval)
+
+    async def _worker(self):
+        while True:
+            agent_messages, meta = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                write = (write_artifacts, agent_messages, self.pdf_mode, self.store, meta)
+                if self.telemetry is not None:
+                    # new trace root: the worker outlives the run that started it
+                    with self.telemetry.span("artifact.write", context=Context()):
+                        await asyncio.to_thread(*write)
+                else:
+                    await asyncio.to_thread(*write)
+                self.stats["written"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"[ARTIFACTS] write failed → {e}")
+            finally:
+                self.stats["write_time"] += time.perf_counter() - started
+                self._queue.task_done()
+
+    async def submit(self, agent_messages: List[Any], meta: Optional[Dict[str, Any]] = None) -> bool:
+        if self._closed:
+            return False
+        self.start()
+        self.stats["submitted"] += 1
+
+        if self.policy == "block":
+            await self._queue.put((agent_messages, meta))
+            return True
+
+        if self._queue.full():
+            if self.policy == "drop_newest":
+                self.stats["dropped"] += 1
+                logger.warning("[ARTIFACTS] queue full, dropped newest run")
+                return False
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.stats["dropped"] += 1
+            logger.warning("[ARTIFACTS] queue full, dropped oldest run")
+
+        self._queue.put_nowait((agent_messages, meta))
+        return True
+
+    async def flush(self):
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self):
+        self._closed = True
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "write_time": round(self.stats["write_time"], 4),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+TOOL_LIST_CHANGED = "notifications/tools/list_changed"
+
+
+# --------------------------------------------------
+# LIVE TOOL CATALOG WATCHER
+# --------------------------------------------------
+class CatalogWatcher:
+    # servers push tools/list_changed on any open session; servers that never push are polled.
+    # either way only the server that changed is re-fetched, and bursts collapse into one refresh.
+    def __init__(
+        self,
+        refresh: Callable[[str], Awaitable[bool]],
+        servers: Iterable[str],
+        poll_interval: Optional[float] = 300.0,
+        debounce: float = 1.0,
+    ):
+        self.refresh = refresh
+        self.servers = list(servers)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._poller: Optional[asyncio.Task] = None
+        self._closed = False
+        self.last_refresh: Dict[str, float] = {}
+        self.stats = {"notifications": 0, "polls": 0, "refreshes": 0, "changed": 0, "failures": 0}
+
+    def message_handler(self, server: str) -> Callable[[Any], Awaitable[None]]:
+        # runs inside the session's receive loop: only schedule, never await a refresh here
+        async def handle(message):
+            if getattr(getattr(message, "root", None), "method", None) == TOOL_LIST_CHANGED:
+                self.stats["notifications"] += 1
+                logger.info(f"[CATALOG] {server} sent tools/list_changed")
+                self.notify(server)
+        return handle
+
+    def notify(self, server: str):
+        if self._closed or server in self._pending:
+            return
+        task = asyncio.create_task(self._refresh_later(server))
+        self._pending[server] = task
+        task.add_done_callback(lambda _, server=server: self._pending.pop(server, None))
+
+    async def _refresh_later(self, server: str):
+        await asyncio.sleep(self.debounce)
+        self.stats["refreshes"] += 1
+        try:
+            if await self.refresh(server):
+                self.stats["changed"] += 1
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.error(f"[CATALOG] {server} refresh failed → {e}")
+        finally:
+            self.last_refresh[server] = time.monotonic()
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            now = time.monotonic()
+            for server in self.servers:
+                # a notification-driven refresh inside the interval already covers this server
+                if now - self.last_refresh.get(server, 0.0) >= self.poll_interval:
+                    self.stats["polls"] += 1
+                    self.notify(server)
+
+    # -----------------------------
+    def start(self):
+        if self.poll_interval and self._poller is None and not self._closed:
+            self._poller = asyncio.create_task(self._poll())
+
+    async def close(self):
+        self._closed = True
+        tasks = list(self._pending.values())
+        if self._poller is not None:
+            tasks.append(self._poller)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._pending)}
@@ -0,0 +1,423 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import zstandard
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    thread_id TEXT PRIMARY KEY,
+    memory TEXT NOT NULL,
+    run_thread TEXT,
+    run_query TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated);
+"""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: a commit is an append to the log, fsync only at checkpoints; a power cut can
+    # lose the last few steps (they re-run on resume) but never corrupts the file
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+# --------------------------------------------------
+# SQLITE CHECKPOINT SAVER
+# --------------------------------------------------
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    # laid out like InMemorySaver: a checkpoint row holds versions only, channel values go to
+    # `blobs` once per new version, so a step rewrites just the channels it changed (messages).
+    # pending writes are stored per task, which is what lets a resumed run skip tool calls that
+    # finished before the failure
+    def __init__(self, path: Optional[str] = None, level: int = 3, serde=None):
+        super().__init__(serde=serde)
+        self.path = path or os.path.join(os.getcwd(), "_temp", "checkpoints.sqlite3")
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._cctx = zstandard.ZstdCompressor(level=level)
+        self._dctx = zstandard.ZstdDecompressor()
+        self.stats = {"puts": 0, "writes": 0, "reads": 0, "bytes": 0, "put_ms": 0.0, "deleted_threads": 0}
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = _connect(self.path)
+        return self._db
+
+    def _dump(self, value: Any) -> Tuple[str, bytes]:
+        kind, data = self.serde.dumps_typed(value)
+        data = self._cctx.compress(data)
+        self.stats["bytes"] += len(data)
+        return kind, data
+
+    def _load(self, kind: str, data: Optional[bytes]) -> Any:
+        return self.serde.loads_typed((kind, self._dctx.decompress(data) if data else b""))
+
+    # -----------------------------
+    def _tuple(self, db: sqlite3.Connection, row: tuple) -> CheckpointTuple:
+        thread_id, ns, checkpoint_id, parent_id, kind, data, metadata_kind, metadata = row
+        checkpoint: Checkpoint = self._load(kind, data)
+        values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = db.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, ns, channel, str(version)),
+            ).fetchone()
+            if blob is not None and blob[0] != "empty":
+                values[channel] = self._load(*blob)
+        writes = db.execute(
+            "SELECT task_id, channel, type, blob FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+        self.stats["reads"] += 1
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": values},
+            metadata=self._load(metadata_kind, metadata),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self._load(kind, blob)) for task_id, channel, kind, blob in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        conf = config["configurable"]
+        args = [conf["thread_id"], conf.get("checkpoint_ns", "")]
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query += " AND checkpoint_id = ?"
+            args.append(checkpoint_id)
+        else:
+            # checkpoint ids are uuid6: they sort by creation time
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            db = self._conn()
+            row = db.execute(query, args).fetchone()
+            return self._tuple(db, row) if row is not None else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, args = [], []
+        if config is not None:
+            conf = config["configurable"]
+            clauses.append("thread_id = ?")
+            args.append(conf["thread_id"])
+            if conf.get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                args.append(conf["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                args.append(get_checkpoint_id(config))
+        if before is not None and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            args.append(get_checkpoint_id(before))
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {'WHERE ' + ' AND '.join(clauses) if clauses else ''} ORDER BY checkpoint_id DESC"
+        )
+        with self._lock:
+            db = self._conn()
+            rows = db.execute(query, args).fetchall()
+            found = []
+            for row in rows:
+                item = self._tuple(db, row)
+                # metadata is serialized, so the filter is applied here rather than in SQL
+                if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                found.append(item)
+                if limit is not None and len(found) >= limit:
+                    break
+        yield from found
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        started = time.perf_counter()
+        conf = config["configurable"]
+        thread_id, ns = conf["thread_id"], conf.get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        # zstd contexts are not thread-safe and the async methods run on worker threads: encode under the lock
+        with self._lock:
+            blobs = [
+                (thread_id, ns, channel, str(version), *(self._dump(values[channel]) if channel in values else ("empty", None)))
+                for channel, version in new_versions.items()
+            ]
+            kind, data = self._dump(c)
+            meta = self._dump(get_checkpoint_metadata(config, metadata))
+            db = self._conn()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+                db.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint["id"], conf.get("checkpoint_id"), kind, data, *meta, time.time()),
+                )
+            self.stats["puts"] += 1
+            self.stats["put_ms"] += (time.perf_counter() - started) * 1000
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        conf = config["configurable"]
+        with self._lock:
+            rows = [
+                (conf["thread_id"], conf.get("checkpoint_ns", ""), conf["checkpoint_id"], task_id,
+                 WRITES_IDX_MAP.get(channel, idx), channel, *self._dump(value), task_path)
+                for idx, (channel, value) in enumerate(writes)
+            ]
+            db = self._conn()
+            with db:
+                # special writes (errors, interrupts) replace; regular ones keep the first attempt
+                db.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [r for r in rows if r[4] < 0])
+                db.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [r for r in rows if r[4] >= 0])
+            self.stats["writes"] += len(rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            db = self._conn()
+            with db:
+                for table in ("checkpoints", "blobs", "writes"):
+                    db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self.stats["deleted_threads"] += 1
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        return InMemorySaver.get_next_version(self, current, channel)
+
+    # -----------------------------
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # -----------------------------
+    def prune(self, max_age: float) -> int:
+        # runs that failed and were never resumed; a thread goes once its newest checkpoint is stale
+        cutoff = time.time() - max_age
+        with self._lock:
+            db = self._conn()
+            stale = [
+                row[0] for row in db.execute(
+                    "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created) < ?", (cutoff,)
+                )
+            ]
+        for thread_id in stale:
+            self.delete_thread(thread_id)
+        if stale:
+            logger.info(f"[CHECKPOINT] pruned {len(stale)} stale run(s)")
+        return len(stale)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["put_ms"] = round(stats["put_ms"], 3)
+        stats["avg_put_ms"] = round(stats["put_ms"] / stats["puts"], 3) if stats["puts"] else 0.0
+        return stats
+
+
+# --------------------------------------------------
+# PERSISTENT SESSIONS
+# --------------------------------------------------
+class CheckpointSessionStore:
+    # thread_id → conversation memory, plus the run in flight for it (so a restart can resume it);
+    # shares the checkpoint database file
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = _connect(self.path)
+        return self._db
+
+    def load(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT memory, run_thread, run_query, updated FROM sessions WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"memory": json.loads(row[0]), "run_thread": row[1], "run_query": row[2], "updated": row[3]}
+
+    def save_memory(self, thread_id: str, memory: Dict[str, Any]):
+        with self._lock:
+            db = self._conn()
+            with db:
+                db.execute(
+                    "INSERT INTO sessions(thread_id, memory, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET memory = excluded.memory, updated = excluded.updated",
+                    (thread_id, json.dumps(memory, ensure_ascii=False), time.time()),
+                )
+
+    def begin_run(self, thread_id: str, run_thread: str, query: str) -> Optional[str]:
+        # → the run it replaces, if one was still recorded as in flight
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT run_thread FROM sessions WHERE thread_id = ?", (thread_id,)).fetchone()
+            with db:
+                db.execute(
+                    "INSERT INTO sessions(thread_id, memory, run_thread, run_query, updated) VALUES (?, '{}', ?, ?, ?) "
+                    "ON CONFLICT(thread_id) DO UPDATE SET run_thread = excluded.run_thread, "
+                    "run_query = excluded.run_query, updated = excluded.updated",
+                    (thread_id, run_thread, query, time.time()),
+                )
+        return row[0] if row is not None else None
+
+    def end_run(self, thread_id: str, memory: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            db = self._conn()
+            with db:
+                if memory is not None:
+                    db.execute(
+                        "UPDATE sessions SET memory = ?, run_thread = NULL, run_query = NULL, updated = ? WHERE thread_id = ?",
+                        (json.dumps(memory, ensure_ascii=False), time.time(), thread_id),
+                    )
+                else:
+                    db.execute(
+                        "UPDATE sessions SET run_thread = NULL, run_query = NULL, updated = ? WHERE thread_id = ?",
+                        (time.time(), thread_id),
+                    )
+
+    def prune(self, max_age: float) -> int:
+        # sessions nobody used for max_age (e.g. one-off server requests); their runs go with the checkpoint prune
+        cutoff = time.time() - max_age
+        with self._lock:
+            db = self._conn()
+            with db:
+                pruned = db.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,)).rowcount
+        if pruned:
+            logger.info(f"[CHECKPOINT] pruned {pruned} idle session(s)")
+        return pruned
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn().execute(
+                "SELECT thread_id, run_query, updated FROM sessions ORDER BY updated DESC"
+            ).fetchall()
+        return [{"thread_id": t, "interrupted": q, "updated": u} for t, q, u in rows]
+
+    def delete(self, thread_id: str) -> bool:
+        with self._lock:
+            db = self._conn()
+            with db:
+                return db.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,)).rowcount > 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -3,7 +3,8 @@ import json
 import tempfile
 from typing import Tuple
 from datetime import datetime
-from fpdf import FPDF
+
+from _util.repo_scan import RepoScanner
 
 def prepare_output_dir(cf_repo_prefix : str) -> str:
     try:
@@ -16,15 +17,19 @@ def prepare_output_dir(cf_repo_prefix : str) -> str:
     finally:
         return cf_repo
 
-def write_json(json_value, json_file_name):
+def write_json(json_value, json_file_name, indent=4):
     try:
         base_dir = os.getcwd()
         temp_dir = os.path.join(base_dir, "_temp")
         os.makedirs(temp_dir, exist_ok=True)
         json_path = os.path.join(temp_dir, json_file_name)
         
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(json_value, f, indent=4, ensure_ascii=False)
+        # write-then-rename: concurrent writers never leave a torn file behind
+        fd, tmp_path = tempfile.mkstemp(dir=temp_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            separators = None if indent is not None else (",", ":")
+            json.dump(json_value, f, indent=indent, separators=separators, ensure_ascii=False)
+        os.replace(tmp_path, json_path)
 
     except Exception as e:
         print(f"Exception in write_json function: {e}")
@@ -32,34 +37,37 @@ def write_json(json_value, json_file_name):
     finally:
         pass
 
+def read_json(json_file_name):
+    json_value = None
+    try:
+        base_dir = os.getcwd()
+        json_path = os.path.join(base_dir, "_temp", json_file_name)
+        if not os.path.exists(json_path):
+            return json_value
+
+        with open(json_path, "r", encoding="utf-8") as f:
+            json_value = json.load(f)
+
+    except Exception as e:
+        print(f"Exception in read_json function: {e}")
+        json_value = None
+
+    finally:
+        return json_value
+
 def gather_repo_files(neo_repo: str, max_chars: bool = True) -> Tuple[list, dict]:
+    # bounded, parallel, incremental reads; use RepoScanner.scan directly to stream results
     try:
         filenames = []
         snippets = {}
-        exclude_dirs = [".git", "node_modules", "__pycache__", ".venv", ".idea"]
-        exclude_files = [".jar"]
-
-        for root, dirs, files in os.walk(neo_repo):
-            dirs[:] = [d for d in dirs if d not in exclude_dirs]
-            for f in files:
-                if any(f.endswith(ext) for ext in exclude_files):
-                    continue
-
-                rel_path = os.path.relpath(os.path.join(root, f), neo_repo)
-                filenames.append(rel_path)
-                try:
-                    if max_chars == True:
-                        snippets[rel_path] = read_text_file(rel_path = os.path.join(root, f))[:2000]
-                    
-                    else:    
-                        snippets[rel_path] = read_text_file(rel_path = os.path.join(root, f))
-                    
-                except Exception as e:
-                    print(f"Exception reading file {rel_path}: {e}")
-                    snippets[rel_path] = "<unreadable>"
-                    
+        scanner = RepoScanner(max_chars=2000 if max_chars == True else None)
+
+        for entry in scanner.scan(neo_repo):
+            filenames.append(entry.path)
+            snippets[entry.path] = entry.snippet
+
         json_value = {"filenames": filenames, "snippets": snippets}
-        write_json(json_value = json_value, json_file_name = "gather_repo_files.json")
+        write_json(json_value = json_value, json_file_name = "gather_repo_files.json", indent = None)
         
     except Exception as e:
         print(f"Exception in gather_repo_files function: {e}")
@@ -100,8 +108,10 @@ def write_txt(txt_value, txt_file_name):
         os.makedirs(temp_dir, exist_ok=True)
         txt_path = os.path.join(temp_dir, txt_file_name)
         
-        with open(txt_path, "w", encoding="utf-8") as f:
+        fd, tmp_path = tempfile.mkstemp(dir=temp_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
             f.write(txt_value)
+        os.replace(tmp_path, txt_path)
 
     except Exception as e:
         print(f"Exception in write_txt function: {e}")
@@ -110,6 +120,8 @@ def write_txt(txt_value, txt_file_name):
         pass
 
 def save_to_pdf(text: str, filename: str):
+    from fpdf import FPDF
+
     pdf = FPDF()
     pdf.add_page()
     
@@ -128,18 +140,21 @@ def save_to_pdf(text: str, filename: str):
     pdf.output(filename)
     print(f"Saved PDF: {filename}")            
 
-def pdf_and_json_path() -> str:
-    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+def artifact_root() -> str:
+    return os.getenv("PIPO_ARTIFACT_ROOT") or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def pdf_and_json_path(run_id: str = None) -> str:
+    project_root = artifact_root()
     pdf_base_dir = os.path.join(project_root, "_downloads", "_pdf")
     json_base_dir = os.path.join(project_root, "_downloads", "_json")
     
     os.makedirs(pdf_base_dir, exist_ok=True)
     os.makedirs(json_base_dir, exist_ok=True)
     
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-    print(f"🐞 ts: {ts}")
+    # run_id is unique per run; a bare timestamp can collide between concurrent writers
+    ts = run_id or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
 
     pdf_dest_path = os.path.join(pdf_base_dir, f"agent_result_{ts}.pdf")
     json_dest_path = os.path.join(json_base_dir, f"agent_result_{ts}.json")
     
-    return os.path.normpath(pdf_dest_path), os.path.normpath(json_dest_path)
\ No newline at end of file
+    return os.path.normpath(pdf_dest_path), os.path.normpath(json_dest_path)
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import xxhash
+import zstandard
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.outputs import Generation
+
+logger = logging.getLogger(__name__)
+
+# set per query (ask(..., cache=False)): skip lookups but still store the fresh answer
+LLM_CACHE_BYPASS: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+# per-response bookkeeping that differs between a live answer and its cached replay; a replayed
+# answer goes back into the history, so these must not change the key of the next call
+VOLATILE_MESSAGE_FIELDS = ("id", "usage_metadata", "response_metadata")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    bytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed);
+"""
+
+
+# --------------------------------------------------
+# EXACT-MATCH LLM RESPONSE CACHE
+# --------------------------------------------------
+class LLMResponseCache(BaseCache):
+    # langchain hands us the serialized messages (ids stripped) and an llm_string holding the
+    # model params and bound tool schemas; the key adds the deployment on top of both
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        deployment: str = "",
+        ttl: Optional[float] = 7 * 86400,
+        max_memory_entries: int = 256,
+        max_entries: int = 20_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        level: int = 3,
+        prune_every: int = 100,
+    ):
+        self.path = path or os.path.join(os.getcwd(), "_temp", "llm_cache.sqlite3")
+        self.deployment = deployment
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+
+        self._lock = threading.RLock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._cctx = zstandard.ZstdCompressor(level=level)
+        self._dctx = zstandard.ZstdDecompressor()
+        # key → (created, serialized generations)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._writes = 0
+        self.stats = {
+            "lookups": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "writes": 0,
+            "expired": 0,
+            "evicted": 0,
+            "saved_input_tokens": 0,
+            "saved_output_tokens": 0,
+        }
+
+    @staticmethod
+    def canonical_prompt(prompt: str) -> str:
+        try:
+            messages = json.loads(prompt)
+        except ValueError:
+            return prompt
+        for message in messages if isinstance(messages, list) else ():
+            kwargs = message.get("kwargs") if isinstance(message, dict) else None
+            if isinstance(kwargs, dict):
+                for field in VOLATILE_MESSAGE_FIELDS:
+                    kwargs.pop(field, None)
+        return json.dumps(messages, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+    def key(self, prompt: str, llm_string: str) -> str:
+        hasher = xxhash.xxh3_128()
+        for part in (self.deployment, llm_string, self.canonical_prompt(prompt)):
+            hasher.update(part.encode("utf-8"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remember(self, key: str, created: float, text: str):
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    # -----------------------------
+    def _memory_lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return entry[1]
+
+    def _disk_lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            db = self._conn()
+            row = db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, created = row
+            with db:
+                if self._expired(created):
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self.stats["expired"] += 1
+                    self.stats["misses"] += 1
+                    return None
+                db.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+            text = self._dctx.decompress(value).decode("utf-8")
+            self._remember(key, created, text)
+            self.stats["disk_hits"] += 1
+            return text
+
+    def _load(self, text: str) -> Sequence[Generation]:
+        generations = loads(text)
+        for gen in generations:
+            # nothing was spent on this call: count the tokens as saved, not as used
+            message = getattr(gen, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                self.stats["saved_input_tokens"] += usage.get("input_tokens", 0)
+                self.stats["saved_output_tokens"] += usage.get("output_tokens", 0)
+                message.usage_metadata = None
+            if message is not None:
+                message.response_metadata = {**(message.response_metadata or {}), "llm_cache": "hit"}
+        return generations
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        self.stats["lookups"] += 1
+        if LLM_CACHE_BYPASS.get():
+            self.stats["bypassed"] += 1
+            return None
+        key = self.key(prompt, llm_string)
+        text = self._memory_lookup(key) or self._disk_lookup(key)
+        return self._load(text) if text is not None else None
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        # memory hits stay on the loop; only SQLite goes to a thread
+        self.stats["lookups"] += 1
+        if LLM_CACHE_BYPASS.get():
+            self.stats["bypassed"] += 1
+            return None
+        key = self.key(prompt, llm_string)
+        text = self._memory_lookup(key)
+        if text is None:
+            text = await asyncio.to_thread(self._disk_lookup, key)
+        return self._load(text) if text is not None else None
+
+    # -----------------------------
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        key = self.key(prompt, llm_string)
+        text = dumps(list(return_val))
+        value = self._cctx.compress(text.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, text)
+            db = self._conn()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO llm_cache(key, value, bytes, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value), now, now),
+                )
+            self.stats["writes"] += 1
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self.prune()
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        await asyncio.to_thread(self.update, prompt, llm_string, return_val)
+
+    def prune(self) -> int:
+        with self._lock:
+            db = self._conn()
+            with db:
+                removed = 0
+                if self.ttl is not None:
+                    removed += db.execute("DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,)).rowcount
+                    self.stats["expired"] += removed
+                count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM llm_cache").fetchone()
+                if count > self.max_entries or total > self.max_bytes:
+                    # least recently used first, until both limits hold again
+                    victims = []
+                    for key, size in db.execute("SELECT key, bytes FROM llm_cache ORDER BY accessed"):
+                        if count <= self.max_entries and total <= self.max_bytes:
+                            break
+                        victims.append((key,))
+                        count -= 1
+                        total -= size
+                    db.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+                    self.stats["evicted"] += len(victims)
+                    removed += len(victims)
+        if removed:
+            logger.info(f"[LLM CACHE] pruned {removed} entries")
+        return removed
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._memory.clear()
+            db = self._conn()
+            with db:
+                db.execute("DELETE FROM llm_cache")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        answered = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / answered, 3) if answered else 0.0
+        stats["memory_entries"] = len(self._memory)
+        return stats
@@ -0,0 +1,468 @@
+import asyncio
+import concurrent.futures
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+
+from _util.resilience import RETRYABLE_HTTP_STATUS
+
+logger = logging.getLogger(__name__)
+
+# lower rank is served first; within a class, first come first served
+PRIORITIES = {"interactive": 0, "bulk": 1, "background": 2}
+# set per query (ask(..., priority=...)); graph tasks copy it when they are created
+LLM_PRIORITY: ContextVar[str] = ContextVar("llm_priority", default="interactive")
+
+
+class QueueTimeoutError(TimeoutError):
+    # the call never left the governor queue within max_queue_wait; nothing was sent, so retrying is safe
+    def __init__(self, priority: str, waited: float):
+        super().__init__(f"{priority} LLM call waited {waited:.1f}s in the governor queue, retry later")
+        self.priority = priority
+        self.waited = waited
+
+
+# --------------------------------------------------
+# ERROR CLASSIFICATION
+# --------------------------------------------------
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    # seconds the provider asked us to wait: retry-after-ms, then retry-after (seconds or HTTP date)
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException) -> Optional[str]:
+    # → "throttled" (429: everyone waits), "transient" (this call backs off) or None (not retried)
+    import openai
+
+    status = _status(exc)
+    if status == 429:
+        return "throttled"
+    if status in RETRYABLE_HTTP_STATUS:
+        return "transient"
+    if status is None and isinstance(exc, (openai.APIConnectionError, asyncio.TimeoutError, ConnectionError)):
+        return "transient"
+    return None
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+# --------------------------------------------------
+# TOKEN BUCKET
+# --------------------------------------------------
+class TokenBucket:
+    # refills continuously at per_minute / 60 and holds burst_seconds worth. Providers enforce quotas
+    # over short sliding windows, and a full bucket plus a window's refill would admit up to twice
+    # the quota in one window, so the burst is kept small. The level may go negative: a request
+    # larger than the bucket, or usage above the estimate, is paid back as debt
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # a request larger than the bucket waits for a full bucket, then runs into debt
+        need = min(amount, self.capacity)
+        return 0.0 if self.level >= need else (need - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def drain(self):
+        self._refill(time.monotonic())
+        self.level = min(self.level, 0.0)
+
+
+# --------------------------------------------------
+# LLM CALL GOVERNOR
+# --------------------------------------------------
+class LLMGovernor:
+    # one per deployment, shared by every MultiMCP in the process. Calls queue by priority and are
+    # released when both the request and the token bucket allow; a 429 pauses the whole queue for
+    # the provider's Retry-After instead of letting each caller retry on its own
+    def __init__(
+        self,
+        requests_per_minute: float = 300,
+        tokens_per_minute: float = 200_000,
+        burst_seconds: float = 1.0,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        default_output_tokens: int = 256,
+        max_queue_wait: Optional[float] = 30.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute, burst_seconds)
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        # None waits as long as it takes
+        self.max_queue_wait = max_queue_wait
+
+        # estimates learn from usage_metadata: prompt chars per input token, typical answer size
+        self.chars_per_token = 4.0
+        self.output_tokens = float(default_output_tokens)
+
+        # heap of [rank, seq, tokens, future]
+        self._queue: List[list] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # the loop async callers queue on; sync callers from other threads hop onto it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_lock = threading.Lock()
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self.waits: Dict[str, Deque[float]] = {name: deque(maxlen=200) for name in PRIORITIES}
+        self.stats = {
+            "calls": 0,
+            "throttled": 0,
+            "transient_errors": 0,
+            "retries": 0,
+            "gave_up": 0,
+            "queue_timeouts": 0,
+            "estimated_tokens": 0,
+            "used_tokens": 0,
+            "estimate_error_tokens": 0,
+        }
+
+    # -----------------------------
+    def estimate(self, messages: List[Any], kwargs: Dict[str, Any]) -> Tuple[int, int]:
+        # → (prompt chars, estimated tokens for the whole call)
+        chars = 0
+        for message in messages:
+            content = message.content
+            chars += len(content) if isinstance(content, str) else len(json.dumps(content, default=str))
+            for call in getattr(message, "tool_calls", None) or []:
+                chars += len(json.dumps(call.get("args", {}), default=str))
+        if kwargs.get("tools"):
+            chars += len(json.dumps(kwargs["tools"], default=str))
+        output = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or self.output_tokens
+        return chars, int(chars / self.chars_per_token + output)
+
+    async def acquire(self, tokens: int, priority: str):
+        loop = self._loop = asyncio.get_running_loop()
+        entry = [PRIORITIES.get(priority, PRIORITIES["bulk"]), next(self._seq), tokens, loop.create_future()]
+        heapq.heappush(self._queue, entry)
+        started = time.monotonic()
+        self._pump()
+        try:
+            # asyncio.wait leaves the entry alone on timeout, so a release racing the deadline still counts
+            await asyncio.wait((entry[3],), timeout=self.max_queue_wait)
+        except asyncio.CancelledError:
+            if entry[3].done() and not entry[3].cancelled():
+                # released just as the caller went away: hand the budget back
+                self.requests.give(1)
+                self.tokens.give(tokens)
+            else:
+                entry[3].cancel()
+            self._pump()
+            raise
+        waited = time.monotonic() - started
+        if not entry[3].done():
+            entry[3].cancel()
+            self.stats["queue_timeouts"] += 1
+            self._pump()
+            raise QueueTimeoutError(priority, waited)
+        self.waits.get(priority, self.waits["bulk"]).append(waited)
+
+    def _elsewhere(self) -> Optional[asyncio.AbstractEventLoop]:
+        # the governor's loop, when it is running in another thread than the caller
+        loop = self._loop
+        if loop is not None and loop.is_running() and _running_loop() is not loop:
+            return loop
+        return None
+
+    def _on_loop(self, fn, *args):
+        loop = self._elsewhere()
+        if loop is None:
+            return fn(*args)
+        done: concurrent.futures.Future = concurrent.futures.Future()
+
+        def run():
+            try:
+                done.set_result(fn(*args))
+            except BaseException as e:
+                done.set_exception(e)
+
+        loop.call_soon_threadsafe(run)
+        return done.result()
+
+    def acquire_sync(self, tokens: int, priority: str):
+        # sync callers (invoke/batch). With the governor's loop running in another thread they join its
+        # priority queue; otherwise (plain sync use, or a blocking call on the loop thread itself)
+        # they wait on the buckets directly
+        loop = self._elsewhere()
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.acquire(tokens, priority), loop).result()
+            return
+        started = time.monotonic()
+        while True:
+            with self._sync_lock:
+                now = time.monotonic()
+                wait = max(self.paused_until - now, self.requests.wait_for(1, now), self.tokens.wait_for(tokens, now))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    break
+                if self.max_queue_wait is not None and now + wait - started > self.max_queue_wait:
+                    # the buckets already say it cannot be admitted in time; fail now instead of sleeping first
+                    self.stats["queue_timeouts"] += 1
+                    raise QueueTimeoutError(priority, now - started)
+            time.sleep(wait)
+        self.waits.get(priority, self.waits["bulk"]).append(time.monotonic() - started)
+
+    def settle_sync(self, chars: int, estimated: int, usage: Optional[Dict[str, Any]]):
+        self._on_loop(self.settle, chars, estimated, usage)
+
+    def failed_sync(self, exc: BaseException, attempt: int, estimated: int) -> Optional[float]:
+        return self._on_loop(self.failed, exc, attempt, estimated)
+
+    def _pump(self):
+        now = time.monotonic()
+        while self._queue:
+            head = self._queue[0]
+            if head[3].done():
+                heapq.heappop(self._queue)
+                continue
+            wait = max(self.paused_until - now, self.requests.wait_for(1, now), self.tokens.wait_for(head[2], now))
+            if wait > 0:
+                # strict priority: nothing behind the head is released early
+                if self._timer is not None:
+                    self._timer.cancel()
+                loop = _running_loop()
+                if loop is not None:
+                    self._timer = loop.call_later(wait, self._pump)
+                return
+            heapq.heappop(self._queue)
+            self.requests.take(1)
+            self.tokens.take(head[2])
+            head[3].set_result(None)
+
+    def settle(self, chars: int, estimated: int, usage: Optional[Dict[str, Any]]):
+        # corrects the token bucket by what the call really cost
+        self.stats["calls"] += 1
+        self.stats["estimated_tokens"] += estimated
+        if not usage:
+            self._remember(estimated)
+            return
+        input_tokens = usage.get("input_tokens", 0) or 0
+        output_tokens = usage.get("output_tokens", 0) or 0
+        used = input_tokens + output_tokens
+        self.stats["used_tokens"] += used
+        self.stats["estimate_error_tokens"] += abs(used - estimated)
+        if used > estimated:
+            self.tokens.take(used - estimated)
+        else:
+            self.tokens.give(estimated - used)
+        if input_tokens and chars:
+            self.chars_per_token = 0.8 * self.chars_per_token + 0.2 * (chars / input_tokens)
+        if output_tokens:
+            self.output_tokens = 0.8 * self.output_tokens + 0.2 * output_tokens
+        self._remember(used)
+        self._pump()
+
+    def _remember(self, tokens: int):
+        now = time.monotonic()
+        self._recent.append((now, tokens))
+        while self._recent and now - self._recent[0][0] > 60:
+            self._recent.popleft()
+
+    def failed(self, exc: BaseException, attempt: int, estimated: int) -> Optional[float]:
+        # → seconds before the next attempt, or None when the error is not retried
+        kind = classify(exc)
+        if kind is None or attempt >= self.max_retries:
+            if kind is not None:
+                self.stats["gave_up"] += 1
+            return None
+        # the failed request was not billed
+        self.tokens.give(estimated)
+        delay = retry_after(exc)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if kind == "throttled":
+            self.stats["throttled"] += 1
+            # everyone waits, and restarts from empty buckets rather than in one burst
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.requests.drain()
+            self.tokens.drain()
+            logger.warning(f"[LLM GOVERNOR] throttled (429), pausing all LLM calls for {delay:.2f}s")
+        else:
+            self.stats["transient_errors"] += 1
+            logger.warning(f"[LLM GOVERNOR] attempt {attempt + 1} failed → {exc!r}, retrying in {delay:.2f}s")
+        self.stats["retries"] += 1
+        return delay
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        queued = {name: 0 for name in PRIORITIES}
+        ranks = {rank: name for name, rank in PRIORITIES.items()}
+        for entry in self._queue:
+            if not entry[3].done():
+                queued[ranks.get(entry[0], "bulk")] += 1
+        waits = {}
+        for name, window in self.waits.items():
+            if window:
+                ordered = sorted(window)
+                waits[name] = {
+                    "p50_ms": round(1000 * ordered[len(ordered) // 2], 1),
+                    "p95_ms": round(1000 * ordered[int(0.95 * (len(ordered) - 1))], 1),
+                }
+        recent = [t for t in self._recent if now - t[0] <= 60]
+        return {
+            **self.stats,
+            "queued": queued,
+            "wait": waits,
+            "paused_for_s": round(max(0.0, self.paused_until - now), 2),
+            "last_minute": {"requests": len(recent), "tokens": sum(t for _, t in recent)},
+            "limits": {"rpm": round(self.requests.rate * 60), "tpm": round(self.tokens.rate * 60)},
+            "bucket": {"requests": round(self.requests.level, 1), "tokens": round(self.tokens.level)},
+            "chars_per_token": round(self.chars_per_token, 2),
+        }
+
+
+_GOVERNORS: Dict[str, LLMGovernor] = {}
+
+
+def shared_governor(deployment: str, **options) -> LLMGovernor:
+    if deployment not in _GOVERNORS:
+        _GOVERNORS[deployment] = LLMGovernor(**options)
+    return _GOVERNORS[deployment]
+
+
+# --------------------------------------------------
+# GOVERNED CHAT MODEL
+# --------------------------------------------------
+class GovernedChatModel(BaseChatModel):
+    # wraps the provider model; the response cache sits on this wrapper, so cache hits never
+    # reach the governor. Type, params and tool binding are the inner model's, which keeps
+    # cache keys and request payloads unchanged
+    inner: BaseChatModel
+    governor: LLMGovernor
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    @property
+    def deployment_id(self) -> Optional[str]:
+        return getattr(self.inner, "deployment_id", None)
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(**self.inner.bind_tools(tools, **kwargs).kwargs)
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        return self.inner._combine_llm_outputs(llm_outputs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # same buckets, priorities and retry policy as the async path
+        for attempt in itertools.count():
+            chars, estimated = self.governor.estimate(messages, kwargs)
+            self.governor.acquire_sync(estimated, LLM_PRIORITY.get())
+            try:
+                result = self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                delay = self.governor.failed_sync(e, attempt, estimated)
+                if delay is None:
+                    raise
+                # a throttle pauses the buckets; acquire_sync waits it out
+                time.sleep(0 if classify(e) == "throttled" else delay)
+                continue
+            message = result.generations[0].message if result.generations else None
+            self.governor.settle_sync(chars, estimated, getattr(message, "usage_metadata", None))
+            return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        for attempt in itertools.count():
+            chars, estimated = self.governor.estimate(messages, kwargs)
+            await self.governor.acquire(estimated, LLM_PRIORITY.get())
+            try:
+                result = await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            except Exception as e:
+                delay = self.governor.failed(e, attempt, estimated)
+                if delay is None:
+                    raise
+                # a throttle already paused the queue; acquire() waits it out with everyone else
+                await asyncio.sleep(0 if classify(e) == "throttled" else delay)
+                continue
+            message = result.generations[0].message if result.generations else None
+            self.governor.settle(chars, estimated, getattr(message, "usage_metadata", None))
+            return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[Any]:
+        for attempt in itertools.count():
+            chars, estimated = self.governor.estimate(messages, kwargs)
+            await self.governor.acquire(estimated, LLM_PRIORITY.get())
+            usage: Dict[str, int] = {}
+            streamed = False
+            try:
+                async for chunk in self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                    streamed = True
+                    for key, value in (getattr(chunk.message, "usage_metadata", None) or {}).items():
+                        if isinstance(value, int):
+                            usage[key] = usage.get(key, 0) + value
+                    yield chunk
+            except Exception as e:
+                # once tokens went out the turn cannot be replayed
+                delay = None if streamed else self.governor.failed(e, attempt, estimated)
+                if delay is None:
+                    if streamed:
+                        self.governor.settle(chars, estimated, usage)
+                    raise
+                await asyncio.sleep(0 if classify(e) == "throttled" else delay)
+                continue
+            self.governor.settle(chars, estimated, usage)
+            return
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from _util.tokens import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+# --------------------------------------------------
+# TOKEN-BUDGETED CONVERSATION MEMORY
+# --------------------------------------------------
+class ConversationMemory:
+    def __init__(
+        self,
+        token_budget: int = 6000,
+        summary_token_budget: int = 800,
+        max_message_tokens: int = 3000,
+        summarizer: Optional[Callable[[str], Awaitable[str]]] = None,
+    ):
+        self.token_budget = token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_message_tokens = max_message_tokens
+        self.summarizer = summarizer
+
+        self.turns: List[Dict[str, Any]] = []
+        self.turn_tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
+
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    # -----------------------------
+    def append(self, role: str, content: str):
+        tokens = count_tokens(content)
+        if tokens > self.max_message_tokens:
+            content = truncate_to_tokens(content, self.max_message_tokens) + "\n[...truncated]"
+            tokens = count_tokens(content)
+
+        self.turns.append({"role": role, "content": content, "tokens": tokens})
+        self.turn_tokens += tokens
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        evicted = False
+        while len(self.turns) > 1 and (
+            self.turn_tokens > self.token_budget
+            # never start the replayed history with an orphaned assistant turn
+            or (evicted and self.turns[0]["role"] != "user")
+        ):
+            turn = self.turns.pop(0)
+            self.turn_tokens -= turn["tokens"]
+            self._pending.append(turn)
+            evicted = True
+
+        if evicted and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._summarize_pending())
+
+    async def _summarize_pending(self):
+        while self._pending:
+            batch, self._pending = self._pending, []
+            transcript = "\n".join(f"{t['role']}: {t['content']}" for t in batch)
+            digest = None
+
+            if self.summarizer is not None:
+                try:
+                    digest = await self.summarizer(
+                        f"{self.summary}\n{transcript}".strip()
+                    )
+                except Exception as e:
+                    logger.warning(f"[MEMORY] summarization failed, keeping a truncated digest → {e}")
+
+            if not digest:
+                digest = f"{self.summary}\n{transcript}".strip()
+
+            self.summary = truncate_to_tokens(digest, self.summary_token_budget)
+            self.summary_tokens = count_tokens(self.summary)
+            logger.info(f"[MEMORY] summarized {len(batch)} messages → {self.summary_tokens} tokens")
+
+    async def flush(self):
+        if self._task is not None:
+            await self._task
+
+    # -----------------------------
+    def messages(self) -> List[Dict[str, str]]:
+        out = []
+        if self.summary:
+            out.append({"role": "system", "content": SUMMARY_PREFIX + self.summary})
+        out.extend({"role": t["role"], "content": t["content"]} for t in self.turns)
+        return out
+
+    def token_count(self) -> int:
+        return self.turn_tokens + self.summary_tokens
+
+    # -----------------------------
+    def state(self) -> Dict[str, Any]:
+        # turns still waiting for the summarizer are kept as turns, so nothing is lost on restart
+        return {"turns": [*self._pending, *self.turns], "summary": self.summary}
+
+    def restore(self, state: Dict[str, Any]):
+        self.clear()
+        self.summary = state.get("summary", "")
+        self.summary_tokens = count_tokens(self.summary)
+        for turn in state.get("turns", []):
+            self.turns.append(turn)
+            self.turn_tokens += turn["tokens"]
+        self._enforce_budget()
+
+    def clear(self):
+        self.turns = []
+        self.turn_tokens = 0
+        self.summary = ""
+        self.summary_tokens = 0
+        self._pending = []
+
+    def __len__(self):
+        return len(self.turns)
@@ -0,0 +1,98 @@
+import logging
+import os
+from typing import Iterator, List, Optional
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+logger = logging.getLogger(__name__)
+
+# first existing file wins; PIPO_PDF_FONT overrides. Courier (latin-1 only) is the last resort.
+MONO_FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/TTF/DejaVuSansMono.ttf",
+    "/Library/Fonts/DejaVuSansMono.ttf",
+    "/System/Library/Fonts/Supplemental/Courier New.ttf",
+    "C:\\Windows\\Fonts\\consola.ttf",
+    "C:\\Windows\\Fonts\\cour.ttf",
+)
+FALLBACK_FONT = "Courier"
+PDF_FONT_NAME = "PipoMono"
+
+FONT_SIZE = 9
+LEADING = 11
+MARGIN = 36
+TAB_SIZE = 4
+
+_font_name: Optional[str] = None
+
+
+def pdf_font() -> str:
+    global _font_name
+    if _font_name is not None:
+        return _font_name
+
+    candidates = [os.getenv("PIPO_PDF_FONT")] + list(MONO_FONT_CANDIDATES)
+    _font_name = FALLBACK_FONT
+    for path in candidates:
+        if path and os.path.exists(path):
+            try:
+                pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, path))
+                _font_name = PDF_FONT_NAME
+                break
+            except Exception as e:
+                logger.warning(f"[PDF] could not load font {path} → {e}")
+    if _font_name == FALLBACK_FONT:
+        logger.warning("[PDF] no Unicode monospace font found, non latin-1 text will not render")
+    return _font_name
+
+
+def wrap_lines(text: str, width: int) -> Iterator[str]:
+    # monospace: wrapping is plain slicing, no per-glyph measuring
+    for line in text.splitlines():
+        if "\t" in line:
+            line = line.expandtabs(TAB_SIZE)
+        if len(line) <= width:
+            yield line
+            continue
+        for start in range(0, len(line), width):
+            yield line[start:start + width]
+
+
+# --------------------------------------------------
+# STREAMING PAGE WRITER
+# --------------------------------------------------
+def write_pdf(text: str, filename: str, font_size: int = FONT_SIZE, leading: int = LEADING) -> int:
+    font = pdf_font()
+    page_w, page_h = A4
+    char_w = pdfmetrics.stringWidth("M", font, font_size)
+    width = max(1, int((page_w - 2 * MARGIN) // char_w))
+    per_page = max(1, int((page_h - 2 * MARGIN) // leading))
+
+    c = canvas.Canvas(filename, pagesize=A4)
+    pages = 0
+    page: List[str] = []
+
+    def flush(lines: List[str]):
+        t = c.beginText(MARGIN, page_h - MARGIN - font_size)
+        t.setFont(font, font_size, leading)
+        t.textLines(lines, trim=0)
+        c.drawText(t)
+        c.showPage()
+
+    for line in wrap_lines(text, width):
+        page.append(line)
+        if len(page) == per_page:
+            flush(page)
+            pages += 1
+            page = []
+    if page or not pages:
+        flush(page)
+        pages += 1
+
+    c.save()
+    logger.info(f"[PDF] {pages} pages → {filename}")
+    return pages
@@ -0,0 +1,217 @@
+import logging
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+EXCLUDE_DIRS = (".git", "node_modules", "__pycache__", ".venv", ".idea")
+EXCLUDE_EXTENSIONS = (".jar",)
+# same heuristic as git: a NUL byte near the start means binary
+SNIFF_BYTES = 8000
+BINARY = "<binary>"
+UNREADABLE = "<unreadable>"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    binary INTEGER NOT NULL,
+    snippet TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+@dataclass
+class ScanEntry:
+    path: str
+    snippet: str
+    binary: bool = False
+    cached: bool = False
+
+
+# --------------------------------------------------
+# PARALLEL INCREMENTAL REPO SCANNER
+# --------------------------------------------------
+class RepoScanner:
+    # the walk runs in the caller's thread and feeds a thread pool that stats and reads files;
+    # files whose (mtime, size) match the index are served from it without being opened
+    def __init__(
+        self,
+        max_chars: Optional[int] = 2000,
+        workers: int = 8,
+        window: int = 64,
+        chunk_size: int = 128,
+        index_path: Optional[str] = None,
+        exclude_dirs: Iterable[str] = EXCLUDE_DIRS,
+        exclude_extensions: Tuple[str, ...] = EXCLUDE_EXTENSIONS,
+        batch_size: int = 1000,
+    ):
+        self.max_chars = max_chars
+        # a UTF-8 character is at most 4 bytes, so this always covers max_chars characters
+        self.max_bytes = max(SNIFF_BYTES, 4 * max_chars) if max_chars else None
+        self.workers = max(1, workers)
+        self.window = max(self.workers, window)
+        self.chunk_size = max(1, chunk_size)
+        self.index_path = index_path
+        self.exclude_dirs = frozenset(exclude_dirs)
+        self.exclude_extensions = tuple(exclude_extensions)
+        self.batch_size = batch_size
+        self.stats: Dict[str, int] = {}
+
+    # -----------------------------
+    def _open_index(self, root: str) -> sqlite3.Connection:
+        path = self.index_path or os.path.join(
+            os.getcwd(), "_temp", f"repo_index_{xxhash.xxh3_64_hexdigest(root)}.sqlite3"
+        )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = sqlite3.connect(path)
+        db.execute("PRAGMA journal_mode=WAL")
+        # a cache: losing the tail of it in a crash only costs a re-read
+        db.execute("PRAGMA synchronous=OFF")
+        db.executescript(SCHEMA)
+
+        # snippets cut at a different length are useless, start over
+        limit = str(self.max_chars)
+        row = db.execute("SELECT value FROM meta WHERE key = 'max_chars'").fetchone()
+        if row is None or row[0] != limit:
+            with db:
+                db.execute("DELETE FROM files")
+                db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('max_chars', ?)", (limit,))
+        return db
+
+    def _walk(self, root: str) -> Iterator[List[Tuple[str, str]]]:
+        # yields chunks of (path, rel) so pool hand-off is paid per chunk, not per file
+        stack = [(root, "")]
+        while stack:
+            directory, rel_dir = stack.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                logger.warning(f"[SCAN] cannot list {directory} → {e}")
+                continue
+            subdirs = []
+            chunk = []
+            for entry in entries:
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                if entry.is_dir():
+                    if entry.name not in self.exclude_dirs and not entry.is_symlink():
+                        subdirs.append((entry.path, rel))
+                elif not entry.name.endswith(self.exclude_extensions):
+                    chunk.append((entry.path, rel))
+                    if len(chunk) == self.chunk_size:
+                        yield chunk
+                        chunk = []
+            if chunk:
+                yield chunk
+            # pushed in reverse so directories are visited top-down in listing order
+            stack.extend(reversed(subdirs))
+
+    def _read_chunk(self, chunk: List[Tuple[str, str, Optional[Tuple[int, int]]]]) -> list:
+        return [self._read(path, rel, known) for path, rel, known in chunk]
+
+    def _read(self, path: str, rel: str, known: Optional[Tuple[int, int]]):
+        # → (rel, mtime_ns, size, snippet or None when unchanged, binary, indexable)
+        try:
+            if known is not None:
+                st = os.stat(path)
+                if known == (st.st_mtime_ns, st.st_size):
+                    return rel, st.st_mtime_ns, st.st_size, None, False, True
+            with open(path, "rb") as f:
+                # fstat on the open file: a new file costs one path lookup, not two
+                st = os.fstat(f.fileno())
+                data = f.read(self.max_bytes) if self.max_bytes else f.read()
+        except OSError as e:
+            logger.warning(f"[SCAN] cannot read {rel} → {e}")
+            return rel, 0, 0, UNREADABLE, False, False
+
+        if b"\0" in data[:SNIFF_BYTES]:
+            return rel, st.st_mtime_ns, st.st_size, BINARY, True, True
+        text = data.decode("utf-8", errors="ignore")
+        return rel, st.st_mtime_ns, st.st_size, text[: self.max_chars] if self.max_chars else text, False, True
+
+    # -----------------------------
+    def scan(self, repo: str) -> Iterator[ScanEntry]:
+        # streams entries in walk order while later files are still being read; breaking out
+        # early keeps what was read so far but leaves entries for unvisited files in the index
+        root = os.path.abspath(repo)
+        db = self._open_index(root)
+        known = {path: (mtime, size) for path, mtime, size in db.execute("SELECT path, mtime_ns, size FROM files")}
+        stats = self.stats = {"files": 0, "read": 0, "cached": 0, "binary": 0, "unreadable": 0, "removed": 0}
+        seen = set()
+        upserts: List[tuple] = []
+        complete = False
+
+        def flush():
+            if upserts:
+                with db:
+                    db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", upserts)
+                upserts.clear()
+
+        def collect(results) -> List[ScanEntry]:
+            unchanged = [r[0] for r in results if r[3] is None]
+            cached = {}
+            if unchanged:
+                marks = ",".join("?" * len(unchanged))
+                cached = {
+                    path: (binary, snippet)
+                    for path, binary, snippet in db.execute(
+                        f"SELECT path, binary, snippet FROM files WHERE path IN ({marks})", unchanged
+                    )
+                }
+
+            entries = []
+            for rel, mtime, size, snippet, binary, indexable in results:
+                seen.add(rel)
+                if snippet is None:
+                    binary, snippet = cached[rel]
+                    stats["cached"] += 1
+                    stats["binary"] += binary
+                    entries.append(ScanEntry(rel, snippet, bool(binary), cached=True))
+                    continue
+                if indexable:
+                    stats["read"] += 1
+                    stats["binary"] += binary
+                    upserts.append((rel, mtime, size, int(binary), snippet))
+                else:
+                    stats["unreadable"] += 1
+                entries.append(ScanEntry(rel, snippet, binary))
+            stats["files"] += len(entries)
+            if len(upserts) >= self.batch_size:
+                flush()
+            return entries
+
+        pool = ThreadPoolExecutor(self.workers, thread_name_prefix="repo_scan")
+        try:
+            pending = deque()
+            for chunk in self._walk(root):
+                pending.append(pool.submit(self._read_chunk, [(path, rel, known.get(rel)) for path, rel in chunk]))
+                if len(pending) >= self.window:
+                    yield from collect(pending.popleft().result())
+            while pending:
+                yield from collect(pending.popleft().result())
+            complete = True
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            flush()
+            if complete:
+                removed = [(p,) for p in known.keys() - seen]
+                if removed:
+                    with db:
+                        db.executemany("DELETE FROM files WHERE path = ?", removed)
+                stats["removed"] = len(removed)
+            db.close()
+            logger.info(f"[SCAN] {root} → {stats}")
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.stats)
@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from typing import Any, AsyncContextManager, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from exceptiongroup import BaseExceptionGroup
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_MCP_CODES = {-32000, -32603, 408}
+RETRYABLE_HTTP_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, server: str, retry_in: float):
+        super().__init__(f"{server} is unavailable (circuit open), retry in {retry_in:.0f}s")
+        self.server = server
+        self.retry_in = retry_in
+
+
+class BudgetExhaustedError(TimeoutError):
+    pass
+
+
+# --------------------------------------------------
+# ERROR CLASSIFICATION
+# --------------------------------------------------
+def is_transport_error(exc: BaseException) -> bool:
+    # the connection itself failed, closed or timed out: the session it happened on cannot be trusted
+    import anyio
+    import httpx
+    from mcp import McpError
+    from mcp.types import CONNECTION_CLOSED
+
+    if isinstance(exc, BaseExceptionGroup):
+        return any(is_transport_error(e) for e in exc.exceptions)
+    if isinstance(exc, McpError):
+        return exc.error.code == CONNECTION_CLOSED
+    return isinstance(exc, (
+        asyncio.TimeoutError,
+        ConnectionError,
+        OSError,
+        httpx.TransportError,
+        anyio.ClosedResourceError,
+        anyio.BrokenResourceError,
+        anyio.EndOfStream,
+    ))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    # deferred: importing fastmcp/httpx costs ~2s and is not needed until the first failure
+    import httpx
+    from fastmcp.exceptions import ToolError, FastMCPError
+    from mcp import McpError
+
+    if isinstance(exc, BaseExceptionGroup):
+        return any(is_retryable(e) for e in exc.exceptions)
+
+    if isinstance(exc, (ToolError, ValidationError, FastMCPError)):
+        return False
+    if isinstance(exc, McpError):
+        return exc.error.code in RETRYABLE_MCP_CODES
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_HTTP_STATUS
+
+    # only transient transport failures are retried; anything unrecognised is a bug or a
+    # caller error and fails fast
+    return is_transport_error(exc)
+
+
+# --------------------------------------------------
+# CIRCUIT BREAKER
+# --------------------------------------------------
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.opened_count = 0
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"[BREAKER] {self.name} {self.state} → {state}")
+            self.state = state
+
+    def before_call(self) -> bool:
+        # True when this call took the half-open probe slot
+        if self.state == "open":
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout:
+                raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+            self._set_state("half_open")
+            self.half_open_calls = 0
+
+        if self.state == "half_open":
+            if self.half_open_calls >= self.half_open_max_calls:
+                raise CircuitOpenError(self.name, self.reset_timeout)
+            self.half_open_calls += 1
+            return True
+        return False
+
+    def release_probe(self):
+        # an abandoned probe says nothing about the server; free the slot for the next caller
+        if self.state == "half_open" and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_success(self):
+        self.failures = 0
+        self._set_state("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self.opened_count += 1
+            self._set_state("open")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "opened_count": self.opened_count}
+
+
+# --------------------------------------------------
+# RESILIENT CALLER
+# --------------------------------------------------
+class ResilientCaller:
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        timeouts: Optional[Dict[str, Dict[str, Any]]] = None,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.5,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_options = {
+            "failure_threshold": failure_threshold,
+            "reset_timeout": reset_timeout,
+            "half_open_max_calls": half_open_max_calls,
+        }
+        self.timeouts = timeouts or {}
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _breaker(self, server: str) -> CircuitBreaker:
+        if server not in self.breakers:
+            self.breakers[server] = CircuitBreaker(server, **self.breaker_options)
+        return self.breakers[server]
+
+    def _count(self, server: str, key: str, n: int = 1):
+        stats = self.stats.setdefault(server, {
+            "calls": 0, "successes": 0, "retries": 0, "fatal": 0, "failures": 0,
+            "timeouts": 0, "rejected": 0, "hedges": 0, "hedge_wins": 0,
+        })
+        stats[key] += n
+
+    def _timeouts_for(self, server: str, tool: str) -> Tuple[float, float]:
+        opts = self.timeouts.get(server, {})
+        attempt = opts.get("tools", {}).get(tool, opts.get("attempt", 60.0))
+        return attempt, opts.get("budget", attempt * self.max_attempts)
+
+    def _backoff(self, attempt: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _hedge_delay(self, server: str, tool: str) -> Optional[float]:
+        window = self.latencies.get((server, tool))
+        if not window or len(window) < self.hedge_min_samples:
+            return None
+        ordered = sorted(window)
+        p95 = ordered[int(0.95 * (len(ordered) - 1))]
+        return max(p95, self.hedge_min_delay)
+
+    async def _hedged(self, server: str, call: Callable[[], Awaitable[Any]], delay: float):
+        first = asyncio.ensure_future(call())
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return first.result()
+
+            self._count(server, "hedges")
+            second = asyncio.ensure_future(call())
+            tasks.add(second)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._count(server, "hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _attempt(
+        self,
+        server: str,
+        tool: str,
+        call: Callable[..., Awaitable[Any]],
+        admit: Optional[Callable[[], AsyncContextManager]],
+        attempt_timeout: float,
+        deadline: float,
+    ):
+        async with AsyncExitStack() as stack:
+            args = ()
+            if admit is not None:
+                # queueing for a slot is bounded by the budget only; the attempt clock starts once admitted
+                try:
+                    slot = await asyncio.wait_for(stack.enter_async_context(admit()), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise BudgetExhaustedError(f"{server}/{tool} timeout budget exhausted while queued") from None
+                args = (slot,)
+
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(call(*args), min(attempt_timeout, max(0.0, remaining)))
+            except asyncio.TimeoutError:
+                if remaining < attempt_timeout:
+                    # cut short by the budget, not by the server taking its full attempt timeout
+                    raise BudgetExhaustedError(f"{server}/{tool} timeout budget exhausted after {remaining:.1f}s") from None
+                raise
+            # service time only, so queueing does not inflate the hedge delay
+            self.latencies.setdefault((server, tool), deque(maxlen=100)).append(time.monotonic() - started)
+            return result
+
+    async def call(
+        self,
+        server: str,
+        tool: str,
+        call: Callable[..., Awaitable[Any]],
+        hedge: bool = False,
+        admit: Optional[Callable[[], AsyncContextManager]] = None,
+    ):
+        # admit: optional per-attempt slot (concurrency cap, pooled session) entered before the
+        # attempt timeout starts; its value is passed to call
+        breaker = self._breaker(server)
+        attempt_timeout, budget = self._timeouts_for(server, tool)
+        deadline = time.monotonic() + budget
+        self._count(server, "calls")
+
+        attempt = 0
+        while True:
+            try:
+                probe = breaker.before_call()
+            except CircuitOpenError:
+                self._count(server, "rejected")
+                raise
+
+            def leg():
+                return self._attempt(server, tool, call, admit, attempt_timeout, deadline)
+
+            remaining = deadline - time.monotonic()
+            try:
+                hedge_delay = self._hedge_delay(server, tool) if hedge else None
+                if hedge_delay is not None and hedge_delay < remaining:
+                    result = await self._hedged(server, leg, hedge_delay)
+                else:
+                    result = await leg()
+
+            except BudgetExhaustedError:
+                # spent queueing or squeezed by the budget: nothing to hold against the server
+                self._count(server, "timeouts")
+                self._count(server, "failures")
+                if probe:
+                    breaker.release_probe()
+                raise
+
+            except Exception as e:
+                retryable = is_retryable(e)
+                if isinstance(e, asyncio.TimeoutError):
+                    self._count(server, "timeouts")
+
+                if not retryable:
+                    # the server answered; it is up even if the call was bad
+                    breaker.record_success()
+                    self._count(server, "fatal")
+                    raise
+
+                breaker.record_failure()
+                attempt += 1
+                delay = self._backoff(attempt)
+                if attempt >= self.max_attempts:
+                    self._count(server, "failures")
+                    raise
+                if time.monotonic() + delay >= deadline:
+                    self._count(server, "failures")
+                    raise BudgetExhaustedError(f"{server}/{tool} timeout budget of {budget:.0f}s exhausted: {e!r}") from e
+
+                self._count(server, "retries")
+                logger.warning(f"[RETRY] {server}/{tool} attempt {attempt} failed → {e!r}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            except BaseException:
+                # cancelled (client gone, Ctrl-C): no outcome to record, but never keep the probe slot
+                if probe:
+                    breaker.release_probe()
+                raise
+
+            breaker.record_success()
+            self._count(server, "successes")
+            return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            server: {**self.stats.get(server, {}), "breaker": breaker.snapshot()}
+            for server, breaker in self.breakers.items()
+        }
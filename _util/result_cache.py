@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(server: str, tool: str, args: Dict[str, Any]) -> str:
+    canonical = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{server}/{tool}/{xxhash.xxh3_128_hexdigest(canonical)}"
+
+
+# --------------------------------------------------
+# TTL + LRU RESULT CACHE WITH SINGLE-FLIGHT
+# --------------------------------------------------
+class ToolResultCache:
+    def __init__(self, max_entries: int = 512, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # key → (expires_at, size, value)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "deduplicated": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store(self, key: str, value: Any, ttl: float):
+        size = len(value.encode("utf-8")) if isinstance(value, str) else len(repr(value))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats["evictions"] += 1
+
+    async def _fill(self, key: str, ttl: float, call: Callable[[], Awaitable[Any]]):
+        try:
+            value = await call()
+            self._store(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_or_call(self, key: str, ttl: float, call: Callable[[], Awaitable[Any]]):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[2]
+            self._drop(key)
+            self.stats["expired"] += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            task = asyncio.ensure_future(self._fill(key, ttl, call))
+            # followers may all be cancelled; never leave the exception unretrieved
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        else:
+            self.stats["deduplicated"] += 1
+
+        return await asyncio.shield(task)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["deduplicated"]
+        return {
+            **self.stats,
+            "hit_rate": round((self.stats["hits"] + self.stats["deduplicated"]) / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "inflight": len(self._inflight),
+        }
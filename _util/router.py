@@ -0,0 +1,157 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DOCUMENTATION_LABEL = "__documentation__"
+WORD_RE = re.compile(r"[a-z0-9]+")
+SUFFIXES = ("ing", "es", "ed", "s", "d")
+
+# words that say nothing about which server a tool belongs to
+TOOL_STOPWORDS = {
+    "the", "and", "for", "with", "from", "into", "this", "that", "tool", "tools", "server",
+    "list", "get", "create", "update", "delete", "search", "read", "fetch", "find", "set",
+    "run", "return", "returns", "given", "using", "data", "name", "value", "values", "all",
+    "new", "existing", "specified", "optional", "required", "object", "string", "details",
+}
+
+
+@dataclass
+class RouteResult:
+    server: Optional[str]
+    confidence: float
+    ranked: List[Tuple[str, float]] = field(default_factory=list)
+    is_documentation: bool = False
+    matched: List[str] = field(default_factory=list)
+
+
+def _normalize(phrase: str) -> str:
+    return re.sub(r"[\s_\-]+", " ", phrase.strip().lower())
+
+
+def _tool_words(text: str) -> List[str]:
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text)
+    return [w for w in re.findall(r"[a-z]{4,}", text.lower()) if w not in TOOL_STOPWORDS]
+
+
+# --------------------------------------------------
+# SINGLE-PASS KEYWORD ROUTER
+# --------------------------------------------------
+class QueryRouter:
+    def __init__(
+        self,
+        keywords: Dict[str, Dict[str, float]],
+        documentation_keywords: Dict[str, float],
+        min_score: float = 1.0,
+        name_weight: float = 0.3,
+        description_weight: float = 0.1,
+        max_tool_keywords: int = 200,
+    ):
+        self.keywords = keywords
+        self.documentation_keywords = documentation_keywords
+        self.min_score = min_score
+        self.name_weight = name_weight
+        self.description_weight = description_weight
+        self.max_tool_keywords = max_tool_keywords
+
+        self.tool_keywords: Dict[str, Dict[str, float]] = {}
+        self._table: Optional[Dict[str, Tuple[str, List[Tuple[str, float]]]]] = None
+        self._heads = set()
+        self._max_words = 1
+        self._priority = {server: i for i, server in enumerate(keywords)}
+
+    def set_tool_keywords(self, server: str, tools: Iterable[Tuple[str, str]]):
+        counts: Counter = Counter()
+        weights: Dict[str, float] = {}
+        for name, description in tools:
+            for w in _tool_words(name):
+                counts[w] += 1
+                weights[w] = max(weights.get(w, 0.0), self.name_weight)
+            for w in _tool_words(description or ""):
+                counts[w] += 1
+                weights.setdefault(w, self.description_weight)
+
+        top = [w for w, _ in counts.most_common(self.max_tool_keywords)]
+        self.tool_keywords[server] = {w: weights[w] for w in top}
+        self._table = None
+
+    def _compile(self):
+        table: Dict[str, List[Tuple[str, float]]] = {}
+
+        def add(label, phrase, weight):
+            table.setdefault(_normalize(phrase), []).append((label, weight))
+
+        for server, words in self.keywords.items():
+            for phrase, weight in words.items():
+                add(server, phrase, weight)
+        for phrase, weight in self.documentation_keywords.items():
+            add(DOCUMENTATION_LABEL, phrase, weight)
+
+        # tool-derived words only count when they point at a single server
+        owners: Dict[str, List[str]] = {}
+        for server, words in self.tool_keywords.items():
+            for w in words:
+                owners.setdefault(w, []).append(server)
+        for server, words in self.tool_keywords.items():
+            for w, weight in words.items():
+                if len(owners[w]) == 1 and _normalize(w) not in table:
+                    add(server, w, weight)
+
+        # expand plural/verb suffixes on the last word up front so matching is one dict lookup
+        forms: Dict[str, Tuple[str, List[Tuple[str, float]]]] = {}
+        heads = set()
+        for phrase, hits in table.items():
+            for suffix in ("",) + SUFFIXES:
+                forms.setdefault(phrase + suffix, (phrase, hits))
+            if " " in phrase:
+                heads.add(phrase.split(" ", 1)[0])
+
+        self._table = forms
+        self._heads = heads
+        self._max_words = max(len(phrase.split()) for phrase in table) if table else 1
+
+    def route(self, query: str) -> RouteResult:
+        if self._table is None:
+            self._compile()
+
+        # one pass over the query words; phrase heads try the longest phrase first
+        words = WORD_RE.findall(query.lower())
+        forms = self._table
+        heads = self._heads
+        scores: Dict[str, float] = {}
+        seen = set()
+        i, count = 0, len(words)
+        while i < count:
+            word = words[i]
+            match, step = None, 1
+            if word in heads:
+                for n in range(min(self._max_words, count - i), 1, -1):
+                    match = forms.get(" ".join(words[i:i + n]))
+                    if match is not None:
+                        step = n
+                        break
+            if match is None:
+                match = forms.get(word)
+
+            if match is not None and match[0] not in seen:
+                seen.add(match[0])
+                for label, weight in match[1]:
+                    scores[label] = scores.get(label, 0.0) + weight
+            i += step
+
+        doc_score = scores.pop(DOCUMENTATION_LABEL, 0.0)
+        server, confidence, ranked = None, 0.0, []
+        if scores:
+            priority, last = self._priority, len(self._priority)
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], priority.get(kv[0], last)))
+            if ranked[0][1] >= self.min_score:
+                server = ranked[0][0]
+                confidence = round(ranked[0][1] / sum(scores.values()), 3)
+
+        return RouteResult(
+            server=server,
+            confidence=confidence,
+            ranked=[(s, round(v, 3)) for s, v in ranked],
+            is_documentation=doc_score >= self.min_score,
+            matched=sorted(seen),
+        )
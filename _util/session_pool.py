@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from _util.resilience import is_transport_error
+
+logger = logging.getLogger(__name__)
+
+
+# --------------------------------------------------
+# PER-SERVER MCP SESSION POOL
+# --------------------------------------------------
+class SessionPool:
+    def __init__(
+        self,
+        name: str,
+        client_factory: Callable[[], Any],
+        max_size: int = 4,
+        health_check_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+    ):
+        self.name = name
+        self.client_factory = client_factory
+        self.max_size = max(1, max_size)
+        self.health_check_interval = health_check_interval
+        self.ping_timeout = ping_timeout
+
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+
+        self.stats = {
+            "opened": 0,
+            "closed": 0,
+            "acquired": 0,
+            "reused": 0,
+            "reconnects": 0,
+            "open_failures": 0,
+            "wait_time": 0.0,
+        }
+
+    # -----------------------------
+    async def _open(self):
+        client = self.client_factory()
+        try:
+            await client.__aenter__()
+        except Exception:
+            self.stats["open_failures"] += 1
+            raise
+        self.stats["opened"] += 1
+        logger.info(f"[POOL] {self.name} session opened ({self._size}/{self.max_size})")
+        return client
+
+    async def _close_client(self, client):
+        try:
+            await client.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"[POOL] {self.name} session close failed → {e}")
+        self.stats["closed"] += 1
+
+    async def _is_alive(self, client, last_used: float) -> bool:
+        if not client.is_connected():
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            return await asyncio.wait_for(client.ping(), self.ping_timeout)
+        except Exception:
+            return False
+
+    async def _discard_slot(self):
+        async with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    # -----------------------------
+    async def _reserve(self) -> Tuple[Optional[Any], float]:
+        # waits for a slot only; the session is checked/opened by _ready
+        started = time.perf_counter()
+        client, last_used = None, 0.0
+
+        async with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"Session pool for {self.name} is closed")
+                if self._idle:
+                    client, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                await self._cond.wait()
+            self._in_use += 1
+
+        self.stats["wait_time"] += time.perf_counter() - started
+        self.stats["acquired"] += 1
+        return client, last_used
+
+    async def _ready(self, client, last_used: float):
+        if client is None:
+            return await self._open()
+
+        if await self._is_alive(client, last_used):
+            self.stats["reused"] += 1
+            return client
+
+        logger.info(f"[POOL] {self.name} stale session, reconnecting")
+        await self._close_client(client)
+        self.stats["reconnects"] += 1
+        return await self._open()
+
+    async def _release(self, client, broken: bool, last_used: Optional[float] = None):
+        self._in_use -= 1
+        if client is None:
+            # the slot never got a live session
+            await self._discard_slot()
+            return
+        if broken or self._closed:
+            await self._close_client(client)
+            await self._discard_slot()
+            return
+
+        async with self._cond:
+            self._idle.append((client, time.monotonic() if last_used is None else last_used))
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def lease(self):
+        # holds a pool slot; lease.client() opens or health-checks the session on first use
+        lease = SessionLease(self, *await self._reserve())
+        broken = False
+        try:
+            yield lease
+        except Exception as e:
+            # tool/protocol/caller errors leave the session usable; only transport failures and timeouts break it
+            broken = is_transport_error(e)
+            raise
+        except BaseException:
+            # cancelled mid-request: the reply may still arrive on this session
+            broken = True
+            raise
+        finally:
+            if lease.live is not None:
+                await self._release(lease.live, broken)
+            else:
+                # never used (or failed to open): an untouched idle session goes back as it was
+                await self._release(lease.idle, False, lease.last_used)
+
+    @asynccontextmanager
+    async def session(self):
+        async with self.lease() as lease:
+            yield await lease.client()
+
+    # -----------------------------
+    async def close(self):
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for client, _ in idle:
+            await self._close_client(client)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "wait_time": round(self.stats["wait_time"], 4),
+            "open": self._size,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "max_size": self.max_size,
+        }
+
+
+class SessionLease:
+    def __init__(self, pool: SessionPool, idle, last_used: float):
+        self.pool = pool
+        self.idle = idle
+        self.last_used = last_used
+        self.live = None
+
+    async def client(self):
+        if self.live is None:
+            idle, self.idle = self.idle, None
+            self.live = await self.pool._ready(idle, self.last_used)
+        return self.live
@@ -0,0 +1,178 @@
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import xxhash
+
+from _util.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+HANDLE_RE = re.compile(r"^[0-9a-f]{32}$")
+# results are encoded and written in slices so a huge payload is never copied whole
+SLICE_CHARS = 1 << 20
+
+
+# --------------------------------------------------
+# LARGE TOOL RESULT SPILL
+# --------------------------------------------------
+class ResultSpill:
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_bytes: int = 32_000,
+        max_tokens: int = 8_000,
+        preview_bytes: int = 2_000,
+        page_bytes: int = 8_000,
+        max_files: int = 500,
+        max_matches: int = 50,
+        min_age: float = 0.0,
+    ):
+        self.root = root or os.path.join(os.getcwd(), "_temp", "tool_results")
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.preview_bytes = preview_bytes
+        self.page_bytes = page_bytes
+        self.max_files = max_files
+        self.max_matches = max_matches
+        # handles written/read this recently are never pruned (covers results still held by the tool cache)
+        self.min_age = min_age
+        self.stats = {"results": 0, "spilled": 0, "spilled_bytes": 0, "pages": 0, "greps": 0}
+
+    def _path(self, handle: str) -> str:
+        if not HANDLE_RE.match(handle or ""):
+            raise ValueError(f"Invalid result handle: {handle!r}")
+        return os.path.join(self.root, f"{handle}.txt")
+
+    def fit(self, parts: List[str], separator: str = "\n") -> Optional[str]:
+        # the joined result if it is within the caps, else None (caller spills)
+        self.stats["results"] += 1
+        size = sum(len(p) for p in parts) + len(separator) * max(0, len(parts) - 1)
+        if size > self.max_bytes:
+            return None
+        text = separator.join(parts)
+        if len(text.encode("utf-8")) <= self.max_bytes and count_tokens(text) <= self.max_tokens:
+            return text
+        return None
+
+    def spill(self, parts: List[str], separator: str = "\n") -> str:
+        os.makedirs(self.root, exist_ok=True)
+        hasher = xxhash.xxh3_128()
+        written = 0
+        preview = b""
+
+        # stream the parts into a temp file while hashing, never building the joined string
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for i, part in enumerate(parts):
+                    slices = [separator] if i else []
+                    slices += [part[start:start + SLICE_CHARS] for start in range(0, len(part), SLICE_CHARS)]
+                    for piece in slices:
+                        chunk = piece.encode("utf-8")
+                        hasher.update(chunk)
+                        f.write(chunk)
+                        written += len(chunk)
+                        if len(preview) < self.preview_bytes:
+                            preview += chunk[: self.preview_bytes - len(preview)]
+
+            handle = hasher.hexdigest()
+            path = self._path(handle)
+            try:
+                # reused handle: refresh it so the prune keeps what was just referenced
+                os.utime(path)
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.stats["spilled"] += 1
+        self.stats["spilled_bytes"] += written
+        self._prune()
+
+        pages = -(-written // self.page_bytes)
+        logger.info(f"[SPILL] {written} bytes → {handle}")
+        return (
+            f"[Result too large for context: {written} bytes, {pages} pages. Stored as handle={handle}. "
+            f"Use read_tool_result with this handle and a page number (1-{pages}) or a grep pattern "
+            f"to see more.]\n"
+            f"Preview:\n{preview.decode('utf-8', errors='ignore')}"
+        )
+
+    def _touch(self, path: str):
+        # the prune evicts by mtime, so reads keep a handle alive too (e.g. one returned by a cached result)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _prune(self):
+        try:
+            entries = [e for e in os.scandir(self.root) if e.name.endswith(".txt")]
+        except FileNotFoundError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        cutoff = time.time() - self.min_age
+        for entry in entries[: len(entries) - self.max_files]:
+            if entry.stat().st_mtime > cutoff:
+                break
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def page(self, handle: str, page: int = 1) -> str:
+        path = self._path(handle)
+        if not os.path.exists(path):
+            return f"ERROR: no stored result for handle {handle}"
+        self._touch(path)
+        size = os.path.getsize(path)
+        pages = max(1, -(-size // self.page_bytes))
+        page = min(max(1, page), pages)
+
+        with open(path, "rb") as f:
+            f.seek((page - 1) * self.page_bytes)
+            chunk = f.read(self.page_bytes)
+        self.stats["pages"] += 1
+        # pages are byte ranges; a character split at the edge is dropped rather than garbled
+        return f"[page {page}/{pages}]\n{chunk.decode('utf-8', errors='ignore')}"
+
+    def grep(self, handle: str, pattern: str) -> str:
+        path = self._path(handle)
+        if not os.path.exists(path):
+            return f"ERROR: no stored result for handle {handle}"
+        try:
+            regex = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            regex = re.compile(re.escape(pattern), re.IGNORECASE)
+
+        self._touch(path)
+        matches = []
+        n = 1
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            # bounded reads: minified JSON is one very long line
+            while len(matches) < self.max_matches:
+                line = f.readline(SLICE_CHARS)
+                if not line:
+                    break
+                for m in regex.finditer(line):
+                    start = max(0, m.start() - 100)
+                    matches.append(f"{n}: {line[start:m.end() + 200].rstrip()}")
+                    if len(matches) >= self.max_matches:
+                        matches.append(f"[stopped after {self.max_matches} matches]")
+                        break
+                if line.endswith("\n"):
+                    n += 1
+        self.stats["greps"] += 1
+        return "\n".join(matches) if matches else f"No lines match {pattern!r}"
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.stats)
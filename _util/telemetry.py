@@ -0,0 +1,202 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from opentelemetry import context as otel_context
+from opentelemetry import metrics, trace
+from opentelemetry.trace import Status, StatusCode
+
+# upper bounds in ms; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+# --------------------------------------------------
+# IN-PROCESS HISTOGRAM
+# --------------------------------------------------
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record(self, value_ms: float):
+        self.count += 1
+        self.total += value_ms
+        if value_ms < self.min:
+            self.min = value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, value_ms)] += 1
+
+    def quantile(self, q: float) -> float:
+        # bucket upper bound, clamped to the observed max
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3),
+            "min_ms": round(self.min, 3),
+            "p50_ms": round(self.quantile(0.50), 3),
+            "p95_ms": round(self.quantile(0.95), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+# --------------------------------------------------
+# TELEMETRY
+# --------------------------------------------------
+# spans go through the OpenTelemetry API, so they are no-ops until an SDK/exporter is
+# installed; histograms and counters are always kept in-process for snapshot()
+class Telemetry:
+    def __init__(self, name: str = "pipo_client"):
+        self.tracer = trace.get_tracer(name)
+        meter = metrics.get_meter(name)
+        self._latency = meter.create_histogram("pipo.latency", unit="ms")
+        self._counter = meter.create_counter("pipo.events")
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+
+    def record(self, name: str, value_ms: float, **attrs):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.record(value_ms)
+        self._latency.record(value_ms, {"op": name, **attrs})
+
+    def add(self, name: str, value: float = 1, **attrs):
+        self.counters[name] = self.counters.get(name, 0) + value
+        self._counter.add(value, {"event": name, **attrs})
+
+    @contextmanager
+    def span(self, name: str, context: Optional[otel_context.Context] = None, **attrs):
+        started = time.perf_counter()
+        try:
+            with self.tracer.start_as_current_span(name, context=context, attributes=attrs) as span:
+                yield span
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000, **attrs)
+
+    def begin(self, name: str, context: Optional[otel_context.Context] = None, **attrs) -> Tuple[Any, float]:
+        # for spans that cannot be a with-block (callbacks, async generators)
+        return self.tracer.start_span(name, context=context, attributes=attrs), time.perf_counter()
+
+    def end(self, name: str, op: Tuple[Any, float], error: Optional[BaseException] = None, **attrs):
+        span, started = op
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, repr(error)))
+        span.end()
+        self.record(name, (time.perf_counter() - started) * 1000, **attrs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "latency": {name: hist.snapshot() for name, hist in sorted(self.histograms.items())},
+            "counters": {name: round(v, 3) for name, v in sorted(self.counters.items())},
+        }
+
+
+# --------------------------------------------------
+# AGENT RUN CALLBACK
+# --------------------------------------------------
+class TelemetryCallback(BaseCallbackHandler):
+    # called on the event loop; keeps the per-event cost to a dict update
+    run_inline = True
+
+    def __init__(self, telemetry: Telemetry, parent: Optional[otel_context.Context] = None):
+        self.telemetry = telemetry
+        self.parent = parent if parent is not None else otel_context.get_current()
+        self._steps: Dict[Any, Tuple[Tuple[Any, float], str, int]] = {}
+        self._llm: Dict[Any, Tuple[Any, float]] = {}
+        # graph step → [pending tool runs, first start, busy ms of each tool run]
+        self._tool_batches: Dict[int, list] = {}
+
+    def _context_for(self, run_id) -> otel_context.Context:
+        step = self._steps.get(run_id)
+        return trace.set_span_in_context(step[0][0], self.parent) if step else self.parent
+
+    # --- agent steps (one per graph node run; each tool call is its own "tools" run) ---
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kw):
+        node = (metadata or {}).get("langgraph_node")
+        if not node or kw.get("name") != node:
+            return
+        step = (metadata or {}).get("langgraph_step", 0)
+        op = self.telemetry.begin("agent.step", self.parent, node=node, step=step)
+        self._steps[run_id] = (op, node, step)
+        if node == "tools":
+            batch = self._tool_batches.setdefault(step, [0, op[1], []])
+            batch[0] += 1
+
+    def _end_step(self, run_id, error=None):
+        entry = self._steps.pop(run_id, None)
+        if entry is None:
+            return
+        op, node, step = entry
+        self.telemetry.end("agent.step", op, error, node=node)
+        if node != "tools":
+            return
+
+        now = time.perf_counter()
+        batch = self._tool_batches[step]
+        batch[0] -= 1
+        batch[2].append((now - op[1]) * 1000)
+        if batch[0]:
+            return
+        del self._tool_batches[step]
+        busy = batch[2]
+        if len(busy) > 1:
+            # time parallel execution saved over running the same calls one after another
+            wall_ms = (now - batch[1]) * 1000
+            saved = max(0.0, sum(busy) - wall_ms)
+            self.telemetry.add("tools.parallel_steps")
+            self.telemetry.add("tools.parallel_calls", len(busy))
+            self.telemetry.add("tools.busy_ms", sum(busy))
+            self.telemetry.add("tools.wall_ms", wall_ms)
+            self.telemetry.add("tools.saved_ms", saved)
+            self.telemetry.record("tools.step_saved", saved)
+
+    def on_chain_end(self, outputs, *, run_id, **kw):
+        self._end_step(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kw):
+        self._end_step(run_id, error)
+
+    # --- LLM calls ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kw):
+        self._llm[run_id] = self.telemetry.begin("llm.call", self._context_for(parent_run_id))
+
+    def on_llm_end(self, response, *, run_id, **kw):
+        op = self._llm.pop(run_id, None)
+        if op is None:
+            return
+        for generations in response.generations:
+            for gen in generations:
+                usage = getattr(getattr(gen, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                op[0].set_attribute("llm.input_tokens", usage.get("input_tokens", 0))
+                op[0].set_attribute("llm.output_tokens", usage.get("output_tokens", 0))
+                self.telemetry.add("tokens.input", usage.get("input_tokens", 0))
+                self.telemetry.add("tokens.output", usage.get("output_tokens", 0))
+                self.telemetry.add("tokens.cached", (usage.get("input_token_details") or {}).get("cache_read", 0) or 0)
+        self.telemetry.end("llm.call", op)
+
+    def on_llm_error(self, error, *, run_id, **kw):
+        op = self._llm.pop(run_id, None)
+        if op is not None:
+            self.telemetry.end("llm.call", op, error)
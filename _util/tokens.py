@@ -0,0 +1,43 @@
+import logging
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING = "o200k_base"
+
+_encoding = None
+
+
+# --------------------------------------------------
+# TOKEN COUNTING
+# --------------------------------------------------
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+        except Exception as e:
+            # encodings are downloaded on first use; fall back to a chars/4 estimate offline
+            logger.warning(f"[TOKENS] tiktoken encoding unavailable, estimating → {e}")
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is False:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is False:
+        return text[: max_tokens * 4]
+    ids = encoding.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return encoding.decode(ids[:max_tokens])
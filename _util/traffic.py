@@ -0,0 +1,187 @@
+import io
+import json
+import logging
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import xxhash
+import zstandard
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+REDACTED = "[REDACTED]"
+
+# dict keys whose values are dropped wherever they appear (args, results, messages)
+SECRET_KEY_RE = re.compile(
+    r"passw(or)?d|passphrase|secret|token(?!s)|api[_-]?key|authori[sz]ation|cookie|credential|private[_-]?key",
+    re.IGNORECASE,
+)
+# secrets that show up inside free text: (pattern, replacement)
+SECRET_TEXT_RES = (
+    (re.compile(r"\bbearer\s+[\w.~+/=-]{8,}", re.IGNORECASE), REDACTED),
+    (re.compile(r"\beyJ[\w-]{8,}\.[\w-]{8,}\.[\w-]{8,}"), REDACTED),
+    (re.compile(r"\b(sk|pk|ghp|gho|xox[abps])[-_][\w-]{16,}"), REDACTED),
+    (re.compile(r"(https?://)[^/\s:@]+:[^/\s@]+@", re.IGNORECASE), r"\1" + REDACTED + "@"),
+    (
+        re.compile(r"\b(client_secret|password|passwd|api_?key|access_token|refresh_token|token)=([^&\s\"']+)", re.IGNORECASE),
+        r"\1=" + REDACTED,
+    ),
+)
+
+
+def redact_text(text: str) -> str:
+    for pattern, replacement in SECRET_TEXT_RES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def redact(value: Any) -> Any:
+    if isinstance(value, str):
+        return redact_text(value)
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if isinstance(k, str) and SECRET_KEY_RE.search(k) and v not in (None, "") else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def args_hash(args: Any) -> str:
+    return xxhash.xxh3_64_hexdigest(json.dumps(args, sort_keys=True, separators=(",", ":"), default=str))
+
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    # the recorder ends a zstd frame every few events, so a trace cut short by a crash still reads
+    with open(path, "rb") as f:
+        reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+        for line in io.TextIOWrapper(reader, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+# --------------------------------------------------
+# TRAFFIC RECORDER
+# --------------------------------------------------
+class TrafficRecorder:
+    # one JSON event per line, zstd-compressed; `t` is seconds since recording started.
+    # everything is redacted before it is written
+    def __init__(self, path: str, level: int = 3, max_result_bytes: int = 1024 * 1024, frame_every: int = 50):
+        self.path = path
+        self.max_result_bytes = max_result_bytes
+        self.frame_every = frame_every
+        self._started = time.monotonic()
+        self._file = open(path, "wb")
+        self._writer = zstandard.ZstdCompressor(level=level).stream_writer(self._file)
+        self._closed = False
+        self.stats = {"events": 0, "asks": 0, "tool_calls": 0, "llm_calls": 0, "raw_bytes": 0, "truncated": 0}
+        self._write({"kind": "header", "version": TRACE_VERSION, "started": time.time()})
+
+    def _write(self, event: Dict[str, Any]):
+        if self._closed:
+            return
+        event["t"] = round(time.monotonic() - self._started, 4)
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+        data = line.encode("utf-8")
+        self._writer.write(data)
+        self.stats["events"] += 1
+        self.stats["raw_bytes"] += len(data)
+        if self.stats["events"] % self.frame_every == 0:
+            self._writer.flush(zstandard.FLUSH_FRAME)
+
+    # -----------------------------
+    def catalog(self, server: str, tools: List[Dict[str, Any]]):
+        self._write({
+            "kind": "catalog",
+            "server": server,
+            "tools": [
+                {"name": t["name"], "description": redact_text(t.get("description") or ""), "inputSchema": t.get("inputSchema") or {}}
+                for t in tools
+            ],
+        })
+
+    def ask(self, query: str):
+        self.stats["asks"] += 1
+        self._write({"kind": "ask", "query": redact_text(query)})
+
+    def tool_call(self, server: str, tool: str, args: Dict[str, Any], parts: Optional[List[str]], error: Optional[str], ms: float):
+        args = redact(args)
+        event = {"kind": "tool", "server": server, "tool": tool, "args": args, "args_hash": args_hash(args), "ms": round(ms, 3)}
+        if error is not None:
+            event["error"] = redact_text(error)
+        else:
+            text = "\n".join(parts or [])
+            size = len(text.encode("utf-8"))
+            event["bytes"] = size
+            if size > self.max_result_bytes:
+                # replay pads back to `bytes`, so payload sizes stay realistic without storing all of it
+                text = text.encode("utf-8")[: self.max_result_bytes].decode("utf-8", errors="ignore")
+                self.stats["truncated"] += 1
+            event["result"] = redact_text(text)
+        self.stats["tool_calls"] += 1
+        self._write(event)
+
+    def llm_call(self, human: str, step: int, message: Any, ms: float, cached: bool = False, error: Optional[str] = None):
+        event: Dict[str, Any] = {"kind": "llm", "human": redact_text(human), "step": step, "ms": round(ms, 3), "cached": cached}
+        if error is not None:
+            event["error"] = redact_text(error)
+        else:
+            content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+            event["content"] = redact_text(content)
+            event["tool_calls"] = [
+                {"name": c["name"], "args": redact(c["args"]), "id": c.get("id")} for c in getattr(message, "tool_calls", None) or []
+            ]
+            event["usage"] = dict(getattr(message, "usage_metadata", None) or {})
+        self.stats["llm_calls"] += 1
+        self._write(event)
+
+    # -----------------------------
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._writer.close()
+        logger.info(f"[TRAFFIC] recorded → {self.path} {self.snapshot()}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return dict(self.stats)
+
+
+# --------------------------------------------------
+# LLM EXCHANGE CALLBACK
+# --------------------------------------------------
+class TrafficCallback(BaseCallbackHandler):
+    # the replay LLM answers by (last human message, step within the run), so that is what is kept
+    run_inline = True
+
+    def __init__(self, recorder: TrafficRecorder):
+        self.recorder = recorder
+        self._pending: Dict[Any, tuple] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kw):
+        batch = messages[0] if messages else []
+        last_human = max((i for i, m in enumerate(batch) if getattr(m, "type", None) == "human"), default=-1)
+        human = batch[last_human].content if last_human >= 0 else ""
+        step = sum(1 for m in batch[last_human + 1:] if getattr(m, "type", None) == "ai")
+        self._pending[run_id] = (time.perf_counter(), human if isinstance(human, str) else str(human), step)
+
+    def on_llm_end(self, response, *, run_id, **kw):
+        entry = self._pending.pop(run_id, None)
+        if entry is None or not response.generations or not response.generations[0]:
+            return
+        started, human, step = entry
+        message = getattr(response.generations[0][0], "message", None)
+        if message is None:
+            return
+        cached = (message.response_metadata or {}).get("llm_cache") == "hit"
+        self.recorder.llm_call(human, step, message, (time.perf_counter() - started) * 1000, cached=cached)
+
+    def on_llm_error(self, error, *, run_id, **kw):
+        entry = self._pending.pop(run_id, None)
+        if entry is not None:
+            started, human, step = entry
+            self.recorder.llm_call(human, step, None, (time.perf_counter() - started) * 1000, error=repr(error))
@@ -1,26 +1,48 @@
+import argparse
 import asyncio
 import json
 import os
 import sys
 import logging
 import re
-from typing import Dict, List, Any, Optional, Type
+import time
+import uuid
  
-import httpx
-from dotenv import load_dotenv
-from pydantic import BaseModel, create_model
+_IMPORT_STARTED = time.perf_counter()
+ 
+from contextlib import asynccontextmanager
+from fnmatch import fnmatchcase
+from typing import AsyncIterator, Dict, List, Any, Optional, Type
  
-from fastmcp.client import Client
-from fastmcp.client.transports import StreamableHttpTransport
+import xxhash
+from dotenv import load_dotenv
+from pydantic import VERSION as PYDANTIC_VERSION, BaseModel, Field, create_model
+from opentelemetry import trace
  
 # MODERN LANGCHAIN IMPORTS
-from langchain.agents import create_agent
+# fastmcp, httpx, langchain.agents and gen_ai_hub are imported where first used:
+# together they are most of the import time and are not needed to parse args or load config
+from langchain_core import __version__ as LANGCHAIN_CORE_VERSION
 from langchain_core.tools import BaseTool
 from langchain_core.callbacks import BaseCallbackHandler
- 
- 
-from gen_ai_hub.proxy.langchain.openai import ChatOpenAI
-from _util.file_ops import write_json, save_to_pdf, pdf_and_json_path
+from langchain_core.utils.function_calling import convert_to_openai_function, convert_to_openai_tool
+ 
+from _util.file_ops import artifact_root, write_json, read_json
+from _util.artifacts import ArtifactPipeline, export_pdf
+from _util.artifact_store import ArtifactStore
+from _util.catalog_watch import CatalogWatcher
+from _util.checkpoint import CheckpointSessionStore, SQLiteCheckpointSaver
+from _util.llm_cache import LLM_CACHE_BYPASS, LLMResponseCache
+from _util.llm_governor import LLM_PRIORITY, GovernedChatModel, shared_governor
+from _util.session_pool import SessionPool
+from _util.tokens import count_tokens
+from _util.resilience import ResilientCaller
+from _util.memory import ConversationMemory
+from _util.result_cache import ToolResultCache, result_cache_key
+from _util.router import QueryRouter, RouteResult
+from _util.spill import ResultSpill
+from _util.telemetry import Telemetry, TelemetryCallback
+from _util.traffic import TrafficCallback, TrafficRecorder
  
  
 # --------------------------------------------------
@@ -63,8 +85,145 @@ TRANSPORT_OPTIONS = {
     "documentation_mcp": {"verify": False, "timeout": 60.0},
 }
  
+# max in-flight tool calls per server, shared by every query running on this MultiMCP;
+# same-step tool calls on one server run in parallel up to this limit, extra calls queue
+SERVER_CONCURRENCY = {
+    "integration_suite": 4,
+    "mcp_testing": 4,
+    "documentation_mcp": 4,
+}
+ 
+# live sessions kept per server; idle sessions older than the interval are pinged before reuse
+SESSION_POOL_OPTIONS = {
+    "integration_suite": {"max_size": 4, "health_check_interval": 30.0},
+    "mcp_testing": {"max_size": 4, "health_check_interval": 30.0},
+    "documentation_mcp": {"max_size": 4, "health_check_interval": 30.0},
+}
+ 
+# run artifacts are written off the event loop; policy: block | drop_newest | drop_oldest;
+# pdf_mode: None (no PDF unless exported) | full (filtered message dump) | answer (final answer only);
+# store retention/compaction runs at startup and then every maintain_interval seconds
+ARTIFACT_OPTIONS = {"max_queue": 8, "policy": "block", "workers": 1, "pdf_mode": None, "maintain_interval": 3600.0}
+# every run is appended (zstd) to _downloads/_store with a SQLite index, the only copy of the full message
+# dump; runs past max_age_days / max_runs are dropped (with their PDF) and mostly-dead segments compacted
+ARTIFACT_STORE_OPTIONS = {
+    "level": 3,
+    "segment_bytes": 64 * 1024 * 1024,
+    "max_age_days": 90,
+    "max_runs": 50_000,
+    "compact_ratio": 0.5,
+}
+ 
 MAX_RETRIES = 3
-MEMORY_LIMIT = 12
+ 
+# retries use exponential backoff with jitter; the breaker opens per server after
+# failure_threshold consecutive retryable failures and probes again after reset_timeout
+RESILIENCE_OPTIONS = {
+    "max_attempts": MAX_RETRIES,
+    "base_delay": 0.5,
+    "max_delay": 8.0,
+    "failure_threshold": 5,
+    "reset_timeout": 30.0,
+    "half_open_max_calls": 1,
+}
+ 
+# seconds per attempt (optionally per tool) and the total budget across retries
+CALL_TIMEOUTS = {
+    "integration_suite": {"attempt": 60.0, "budget": 150.0, "tools": {}},
+    "mcp_testing": {"attempt": 60.0, "budget": 90.0, "tools": {}},
+    "documentation_mcp": {"attempt": 60.0, "budget": 150.0, "tools": {}},
+}
+ 
+# opt-in result caching for idempotent tools: case-insensitive fnmatch pattern on the MCP tool name → TTL seconds.
+# tools whose name contains a write verb are never cached, whatever the patterns say.
+TOOL_CACHE_TTL = {
+    "integration_suite": {"list*": 60.0, "get*": 60.0, "search*": 60.0},
+    "mcp_testing": {},
+    "documentation_mcp": {},
+}
+TOOL_CACHE_OPTIONS = {"max_entries": 512, "max_bytes": 32 * 1024 * 1024}
+WRITE_TOOL_VERBS = {
+    "create", "update", "delete", "remove", "deploy", "undeploy", "upload", "import",
+    "write", "save", "set", "put", "post", "patch", "send", "start", "stop", "run",
+    "execute", "trigger", "copy", "move", "rename", "generate",
+}
+ 
+# tool results over either cap are written to _temp/tool_results and replaced by a preview
+# plus a handle the agent can page/grep through read_tool_result
+TOOL_RESULT_LIMITS = {
+    "max_bytes": 32_000,
+    "max_tokens": 8_000,
+    "preview_bytes": 2_000,
+    "page_bytes": 8_000,
+    "max_files": 500,
+}
+ 
+# exact-match LLM response cache: the model runs at temperature=0, so the same messages + bound tools
+# + deployment give the same answer. In-memory LRU over a SQLite file in _temp; ask(..., cache=False)
+# skips lookups for one query (the fresh answer is still stored). Off by default: a cached answer can
+# outlive changes behind the MCP tools it was based on. Opt in by setting "enabled": True (replays,
+# benches, demos) and keep the ttl shorter than the data it answers about can go stale
+LLM_CACHE_OPTIONS = {
+    "enabled": False,
+    "ttl": 7 * 86400,
+    "max_memory_entries": 256,
+    "max_entries": 20_000,
+    "max_bytes": 256 * 1024 * 1024,
+}
+ 
+# every call to the GenAI Hub deployment goes through one governor per process: token buckets for the
+# deployment's requests/tokens per minute (tokens estimated up front, corrected from usage_metadata),
+# priority classes (interactive > bulk > background) and a shared pause on 429 for its Retry-After.
+# The governor owns retries, so the OpenAI client's own retries are off while it is enabled.
+# A call still queued after max_queue_wait seconds fails with QueueTimeoutError (nothing was sent,
+# safe to retry; the server answers 503 + Retry-After); None lets calls queue indefinitely
+LLM_GOVERNOR_OPTIONS = {
+    "enabled": True,
+    "requests_per_minute": 300,
+    "tokens_per_minute": 200_000,
+    "burst_seconds": 1.0,
+    "max_retries": 6,
+    "max_queue_wait": 30.0,
+}
+ 
+# PIPO_TRAFFIC_RECORD=<file>.jsonl.zst records every MCP call, LLM exchange and query (secrets
+# redacted) for load replay with _bench/replay.py
+TRAFFIC_RECORD_FILE = os.getenv("PIPO_TRAFFIC_RECORD")
+ 
+# every agent run is checkpointed step by step to _temp/checkpoints.sqlite3, so a failed or killed
+# run resumes from its last completed step (tool calls that finished are not repeated);
+# durability "async" writes each checkpoint while the next step runs. Finished runs are deleted,
+# interrupted ones are kept for max_age_days. Session memory persists per thread ID in the same file
+# and is dropped after session_max_age_days unused; both prunes run at startup and every prune_interval_hours
+CHECKPOINT_OPTIONS = {
+    "enabled": True,
+    "durability": "async",
+    "max_age_days": 7,
+    "session_max_age_days": 30,
+    "prune_interval_hours": 6,
+}
+ 
+# cold start: how long startup() waits for tool discovery before building the agent with the
+# servers that answered; slower servers register their tools (and rebuild the agent) on arrival
+STARTUP_DISCOVERY_WAIT = 10.0
+ 
+# read-only tools get a second, hedged request once they run past their observed p95
+HEDGE_READ_ONLY_TOOLS = False
+TOOL_CATALOG_FILE = "tool_catalog.json"
+# canonical tool schemas are cached next to the catalog, keyed by entry hash; they depend on how
+# pydantic/langchain render a model, so a version change recomputes them
+CATALOG_SCHEMA_FORMAT = f"pydantic-{PYDANTIC_VERSION}/langchain-core-{LANGCHAIN_CORE_VERSION}"
+# after startup the catalog stays live: a tools/list_changed notification (or, for servers that
+# never send one, a poll every poll_interval seconds; None disables polling) re-fetches that server
+# only; notifications within `debounce` seconds collapse into one refresh
+CATALOG_WATCH_OPTIONS = {"poll_interval": 300.0, "debounce": 1.0}
+# replayed history is bounded by tokens, not message count; older turns are folded
+# into a background summary capped at summary_token_budget
+MEMORY_OPTIONS = {
+    "token_budget": 6000,
+    "summary_token_budget": 800,
+    "max_message_tokens": 3000,
+}
  
 SERVER_ROUTING_GUIDE = {
     "documentation_mcp": "Use for SAP-standard documentation/specification/template generation.",
@@ -72,6 +231,35 @@ SERVER_ROUTING_GUIDE = {
     "mcp_testing": "Use for validation, test execution, and test-report related tasks.",
 }
  
+# keyword → weight per server; matched on word boundaries (plus plural/verb suffixes) in one
+# pass together with words taken from each server's discovered tool names and descriptions
+ROUTING_KEYWORDS = {
+    "documentation_mcp": {
+        "document": 1.0, "documentation": 1.5, "spec": 1.0, "specification": 1.0,
+        "template": 1.0, "sap standard": 1.5, "adapter guide": 2.0, "guide": 1.0,
+    },
+    "integration_suite": {
+        "iflow": 1.0, "integration flow": 1.0, "integration suite": 1.5, "deploy flow": 2.0,
+        "deploy": 0.7, "undeploy": 1.0, "package": 0.5, "integration package": 1.5,
+        "cloud integration": 1.0, "cpi": 1.0, "adapter": 0.3,
+    },
+    "mcp_testing": {
+        "test": 2.0, "testing": 2.0, "validate": 2.0, "validation": 2.0, "verification": 2.0,
+        "verify": 2.0, "assertion": 2.0, "test report": 2.5, "regression": 1.0,
+    },
+}
+DOCUMENTATION_KEYWORDS = {
+    "document": 1.0, "documentation": 1.0, "guide": 1.0, "spec": 1.0, "specification": 1.0,
+    "template": 1.0, "sap standard": 1.0, "adapter guide": 1.0,
+}
+ 
+# when a query has a routing hint, the agent only sees that server's tools plus a small
+# fallback set from the other servers: the explicit names below, then up to
+# ROUTE_FALLBACK_PER_SERVER read-only tools per server
+ROUTE_FALLBACK_TOOLS: Dict[str, List[str]] = {}
+ROUTE_FALLBACK_PER_SERVER = 2
+READ_ONLY_TOOL_PREFIXES = ("list", "get", "search", "read", "fetch", "find")
+ 
 SAP_DOC_TEMPLATE = """
 Documentation output contract (must follow exactly for documentation requests):
 - Title line: "<Adapter Name> Guide"
@@ -110,49 +298,99 @@ Documentation output contract (must follow exactly for documentation requests):
 """.strip()
  
  
+# static instructions first, in a fixed order, so provider prompt caching can reuse them;
+# everything that changes per turn (memory, query, routing hint) goes after
+SYSTEM_PROMPT = "\n".join([
+    "You are an SAP MCP automation agent.",
+    "Select tools strictly by server responsibility.",
+    "Server routing rules:",
+    *(f"- {name}: {guide}" for name, guide in SERVER_ROUTING_GUIDE.items()),
+    "If the user asks for SAP-standard documentation, prioritize documentation_mcp tools first.",
+    "If the task is iFlow creation, prioritize integration_suite tools.",
+    "If the task is testing or validation, prioritize mcp_testing tools.",
+    "Do not mix servers unless explicitly required.",
+    "",
+    SAP_DOC_TEMPLATE,
+])
+ 
+ 
 # --------------------------------------------------
 # LLM
 # --------------------------------------------------
 def create_llm():
+    from gen_ai_hub.proxy.langchain.openai import ChatOpenAI
+ 
     dep = os.getenv("LLM_DEPLOYMENT_ID")
     if not dep:
         raise RuntimeError("LLM_DEPLOYMENT_ID missing in .env")
-    return ChatOpenAI(deployment_id=dep, temperature=0)
+    # stream_usage so streamed turns also report usage (including cached prompt tokens)
+    return ChatOpenAI(
+        deployment_id=dep,
+        temperature=0,
+        stream_usage=True,
+        max_retries=0 if LLM_GOVERNOR_OPTIONS["enabled"] else 2,
+    )
  
 # --------------------------------------------------
 # JSON SCHEMA → PYDANTIC MODEL
 # --------------------------------------------------
-def build_model(name: str, schema: Dict, root=None):
+_MODEL_CACHE: Dict[str, Any] = {}
+ 
+ 
+def schema_hash(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return xxhash.xxh3_64_hexdigest(raw)
+ 
+ 
+def build_model(name: str, schema: Dict, root=None, root_key=None):
     if root is None:
         root = schema
+    if root_key is None:
+        root_key = schema_hash(root)
  
     if "type" not in schema and "schema" in schema:
         schema = schema["schema"]
  
     if "$ref" in schema:
+        # one model per $ref target within the same root schema
+        key = f"{root_key}:{schema['$ref']}"
+        if key in _MODEL_CACHE:
+            return _MODEL_CACHE[key]
         ref = schema["$ref"][2:].split("/")
         obj = root
         for r in ref:
             obj = obj.get(r, {})
-        return build_model(name, obj, root)
+        model = build_model(name, obj, root, root_key)
+        _MODEL_CACHE[key] = model
+        return model
  
     if "enum" in schema:
         from typing import Literal
         return Literal[tuple(schema["enum"])]
  
     if schema.get("type") == "object":
+        # identical sub-schemas share one model; schemas with nested refs are scoped to their root
+        raw = json.dumps(schema, sort_keys=True, separators=(",", ":"), default=str)
+        key = xxhash.xxh3_64_hexdigest(raw)
+        if '"$ref"' in raw:
+            key = f"{root_key}:{key}"
+        if key in _MODEL_CACHE:
+            return _MODEL_CACHE[key]
+ 
         props = schema.get("properties", {})
         required = schema.get("required", [])
         fields = {}
         for k, v in props.items():
-            t = build_model(name + "_" + k, v, root)
+            t = build_model(name + "_" + k, v, root, root_key)
             default = ... if k in required else None
             fields[k] = (t, default)
         safe = re.sub(r"\W", "_", name)
-        return create_model(safe, **fields)
+        model = create_model(safe, **fields)
+        _MODEL_CACHE[key] = model
+        return model
  
     if schema.get("type") == "array":
-        t = build_model(name + "_item", schema.get("items", {}), root)
+        t = build_model(name + "_item", schema.get("items", {}), root, root_key)
         return List[t]
  
     return {
@@ -166,7 +404,23 @@ def build_model(name: str, schema: Dict, root=None):
 # --------------------------------------------------
 # MCP TOOL WRAPPER
 # --------------------------------------------------
-class MCPTool(BaseTool):
+def canonical_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    # refs inlined and titles dropped once, keys sorted so the same tool always
+    # serializes to the same bytes in the prompt
+    params = convert_to_openai_function(model)["parameters"]
+    return json.loads(json.dumps(params, sort_keys=True))
+ 
+ 
+class PrecomputedSchemaTool(BaseTool):
+    call_schema: Dict[str, Any]
+ 
+    # bind_tools converts every tool on every model step; hand it the precomputed schema
+    @property
+    def tool_call_schema(self) -> Dict[str, Any]:
+        return {**self.call_schema, "description": self.description}
+ 
+ 
+class MCPTool(PrecomputedSchemaTool):
     name: str
     description: str
     args_schema: Type[BaseModel]
@@ -181,6 +435,34 @@ class MCPTool(BaseTool):
         return await self.manager.execute(self.server, self.mcp_tool_name, kwargs)
  
  
+class ReadToolResultInput(BaseModel):
+    handle: str = Field(description="Handle of a stored tool result, from the 'handle=' note")
+    page: int = Field(default=1, description="1-based page number to read")
+    pattern: Optional[str] = Field(default=None, description="Regex to search for instead of reading a page")
+ 
+ 
+class ReadToolResultTool(PrecomputedSchemaTool):
+    name: str = "read_tool_result"
+    description: str = (
+        "Read a tool result that was too large for the conversation. "
+        "Pass the handle and a page number, or a pattern to get only matching lines."
+    )
+    args_schema: Type[BaseModel] = ReadToolResultInput
+    call_schema: Dict[str, Any] = canonical_schema(ReadToolResultInput)
+    spill: ResultSpill
+ 
+    def _run(self, *a, **kw):
+        raise NotImplementedError()
+ 
+    async def _arun(self, handle: str, page: int = 1, pattern: Optional[str] = None):
+        try:
+            if pattern:
+                return await asyncio.to_thread(self.spill.grep, handle, pattern)
+            return await asyncio.to_thread(self.spill.page, handle, page)
+        except ValueError as e:
+            return f"ERROR: {e}"
+ 
+ 
 # --------------------------------------------------
 # STEP LOGGER
 # --------------------------------------------------
@@ -196,315 +478,1197 @@ class StepLogger(BaseCallbackHandler):
             self.steps[-1]["output"] = str(output)
  
  
+# --------------------------------------------------
+# PROMPT CACHE USAGE
+# --------------------------------------------------
+class UsageLogger(BaseCallbackHandler):
+    def __init__(self, stats: Dict[str, int]):
+        self.stats = stats
+ 
+    def on_llm_end(self, response, **kw):
+        for generations in response.generations:
+            for gen in generations:
+                message = getattr(gen, "message", None)
+                usage = getattr(message, "usage_metadata", None)
+                # replayed from the LLM response cache: nothing was sent to the model
+                if not usage or message.response_metadata.get("llm_cache") == "hit":
+                    continue
+                cached = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+                self.stats["llm_calls"] += 1
+                self.stats["input_tokens"] += usage.get("input_tokens", 0)
+                self.stats["cached_tokens"] += cached
+                logger.info(f"[PROMPT] input={usage.get('input_tokens', 0)} cached={cached}")
+ 
+ 
 # --------------------------------------------------
 # MULTI MCP MANAGER
 # --------------------------------------------------
 class MultiMCP:
-    def __init__(self):
-        self.clients: Dict[str, Client] = {}
+    # servers maps a name to an MCP URL or to an in-process FastMCP server (used by _bench)
+    def __init__(self, servers: Optional[Dict[str, Any]] = None, llm=None):
+        self.servers: Dict[str, Any] = dict(servers or MCP_SERVERS)
+        self.pools: Dict[str, SessionPool] = {}
+        self.limits: Dict[str, asyncio.Semaphore] = {
+            name: asyncio.Semaphore(SERVER_CONCURRENCY.get(name, 4)) for name in self.servers
+        }
+        self.server_load: Dict[str, Dict[str, Any]] = {
+            name: {"calls": 0, "queued": 0, "in_flight": 0, "peak_in_flight": 0, "wait_time": 0.0}
+            for name in self.servers
+        }
+        self.telemetry = Telemetry()
+        self.recorder = TrafficRecorder(TRAFFIC_RECORD_FILE) if TRAFFIC_RECORD_FILE else None
         self.tools: List[MCPTool] = []
-        self.llm = create_llm()
+        self.router = QueryRouter(ROUTING_KEYWORDS, DOCUMENTATION_KEYWORDS)
+        opts = dict(LLM_CACHE_OPTIONS)
+        self.llm_cache = LLMResponseCache(**opts) if opts.pop("enabled", False) else None
+        # built on first use (startup() builds it in a thread, alongside discovery)
+        self.llm_governor = None
+        self._llm = self._attach_cache(llm) if llm is not None else None
         self.agent = None
-        self.memory: List[Dict[str, str]] = []
+        self.agents: Dict[tuple, Any] = {}
+        self._tool_tokens: Dict[str, int] = {}
+        self.routing_stats = {
+            "queries": 0,
+            "subset_queries": 0,
+            "full_tool_tokens": 0,
+            "bound_tool_tokens": 0,
+        }
+        self.prompt_stats = {"llm_calls": 0, "input_tokens": 0, "cached_tokens": 0}
+        self.catalog: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.tool_index: Dict[str, Dict[str, MCPTool]] = {}
+        self._catalog_task: Optional[asyncio.Task] = None
+        self._prune_task: Optional[asyncio.Task] = None
+        self.catalog_watch = CatalogWatcher(self.refresh_server, self.servers, **CATALOG_WATCH_OPTIONS)
+        self.catalog_version = 0
+        self.artifact_store = ArtifactStore(
+            os.path.join(artifact_root(), "_downloads", "_store"), **ARTIFACT_STORE_OPTIONS
+        )
+        self.artifacts = ArtifactPipeline(**ARTIFACT_OPTIONS, store=self.artifact_store, telemetry=self.telemetry)
+        self.resilience = ResilientCaller(timeouts=CALL_TIMEOUTS, **RESILIENCE_OPTIONS)
+        self.result_cache = ToolResultCache(**TOOL_CACHE_OPTIONS)
+        # a cached result may hand out a spill handle until its TTL runs out, so the prune keeps those files
+        cache_ttl = max((ttl for patterns in TOOL_CACHE_TTL.values() for ttl in patterns.values()), default=0.0)
+        self.spill = ResultSpill(**TOOL_RESULT_LIMITS, min_age=cache_ttl)
+        self.result_reader = ReadToolResultTool(spill=self.spill)
+        opts = dict(CHECKPOINT_OPTIONS)
+        self.checkpointer = SQLiteCheckpointSaver() if opts["enabled"] else None
+        self.sessions = CheckpointSessionStore(self.checkpointer.path) if self.checkpointer is not None else None
+        self.durability = opts["durability"] if self.checkpointer is not None else None
+        self.checkpoint_max_age = opts["max_age_days"] * 86400
+        self.session_max_age = opts["session_max_age_days"] * 86400
+        self.prune_interval = opts["prune_interval_hours"] * 3600
+        self._closing = asyncio.Event()
+        self.memory = self.new_memory()
+        self.thread_id: Optional[str] = None
+        self._late_discovery: set = set()
+        self.discovery_times: Dict[str, float] = {}
+        self.startup_report: Dict[str, Any] = {}
+ 
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = self._attach_cache(self._govern(create_llm()))
+        return self._llm
+ 
+    def _govern(self, llm):
+        opts = dict(LLM_GOVERNOR_OPTIONS)
+        if not opts.pop("enabled", True):
+            return llm
+        deployment = getattr(llm, "deployment_id", None) or os.getenv("LLM_DEPLOYMENT_ID") or llm._llm_type
+        self.llm_governor = shared_governor(deployment, **opts)
+        return GovernedChatModel(inner=llm, governor=self.llm_governor)
+ 
+    def _attach_cache(self, llm):
+        # a model that already has its own cache setting (including cache=False) keeps it
+        if self.llm_cache is not None and getattr(llm, "cache", None) is None:
+            self.llm_cache.deployment = (
+                getattr(llm, "deployment_id", None) or os.getenv("LLM_DEPLOYMENT_ID") or llm._llm_type
+            )
+            llm.cache = self.llm_cache
+        return llm
  
     def _safe_tool_name(self, server: str, tool_name: str) -> str:
         safe = re.sub(r"\W+", "_", f"{server}__{tool_name}").strip("_").lower()
         return safe[:64] if safe else f"{server}_tool"
  
-    def _routing_hint_for_query(self, query: str) -> Optional[str]:
-        q = query.lower()
-        if any(k in q for k in ["document", "documentation", "spec", "template", "sap standard"]):
-            return "documentation_mcp"
-        if any(k in q for k in ["iflow", "integration flow", "integration suite", "deploy flow"]):
-            return "integration_suite"
-        if any(k in q for k in ["test", "testing", "validate", "verification", "assertion"]):
-            return "mcp_testing"
-        return None
- 
-    def _is_documentation_query(self, query: str) -> bool:
-        q = query.lower()
-        return any(
-            k in q
-            for k in [
-                "document",
-                "documentation",
-                "guide",
-                "spec",
-                "template",
-                "sap standard",
-                "adapter guide",
-            ]
-        )
+    def route(self, query: str) -> RouteResult:
+        # callers route once per request and hand the result to ask()/ask_stream()/resume()
+        return self.router.route(query)
+ 
+    # -----------------------------
+    def _server_id(self, name: str) -> str:
+        target = self.servers[name]
+        return target if isinstance(target, str) else f"inproc:{target.name}"
+ 
+    def _make_client(self, name: str):
+        import httpx
+        from fastmcp.client import Client
+        from fastmcp.client.transports import StreamableHttpTransport
+ 
+        target = self.servers[name]
+        handler = self.catalog_watch.message_handler(name)
+        if not isinstance(target, str):
+            return Client(target, message_handler=handler)
+ 
+        opts = TRANSPORT_OPTIONS.get(name, {})
+ 
+        def factory(**kw):
+            kw["verify"] = opts.get("verify", True)
+            kw["timeout"] = opts.get("timeout", 30)
+            return httpx.AsyncClient(**kw)
+ 
+        transport = StreamableHttpTransport(target, httpx_client_factory=factory)
+        return Client(transport=transport, message_handler=handler)
  
     # -----------------------------
     async def connect(self):
-        for name, url in MCP_SERVERS.items():
+        with self.telemetry.span("mcp.connect"):
+            for name in self.servers:
+                try:
+                    opts = SESSION_POOL_OPTIONS.get(name, {})
+                    self.pools[name] = SessionPool(
+                        name,
+                        lambda name=name: self._make_client(name),
+                        max_size=opts.get("max_size", 4),
+                        health_check_interval=opts.get("health_check_interval", 30.0),
+                    )
+ 
+                    logger.info(f"[OK] Connected → {name}")
+ 
+                except Exception as e:
+                    logger.error(f"[FAIL] {name} → {e}")
+ 
+    async def close(self):
+        if self._catalog_task is not None:
+            self._catalog_task.cancel()
+        for task in list(self._late_discovery):
+            task.cancel()
+        await self.catalog_watch.close()
+        await self.memory.flush()
+        logger.info(f"[ROUTE] stats → {self.route_stats()}")
+        logger.info(f"[CALL] resilience → {self.resilience_stats()}")
+        logger.info(f"[CACHE] tool results → {self.result_cache.snapshot()}")
+        logger.info(f"[PROMPT] cache → {self.prompt_cache_stats()}")
+        logger.info(f"[STATS] concurrency → {self.concurrency_stats()}")
+        logger.info(f"[STATS] telemetry → {self.telemetry.snapshot()}")
+        await self.artifacts.close()
+        logger.info(f"[ARTIFACTS] flushed → {self.artifacts.snapshot()}")
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.llm_governor is not None:
+            logger.info(f"[LLM GOVERNOR] {self.llm_governor.snapshot()}")
+        if self.llm_cache is not None:
+            logger.info(f"[LLM CACHE] {self.llm_cache.snapshot()}")
+            self.llm_cache.close()
+        if self.checkpointer is not None:
+            if self._prune_task is not None:
+                # lets a prune in progress finish before the database is closed
+                self._closing.set()
+                await self._prune_task
+            logger.info(f"[CHECKPOINT] {self.checkpointer.snapshot()}")
+            self.checkpointer.close()
+            self.sessions.close()
+        for name, pool in self.pools.items():
+            await pool.close()
+            logger.info(f"[POOL] {name} closed → {pool.snapshot()}")
+ 
+    def _prune_checkpoints(self):
+        self.checkpointer.prune(self.checkpoint_max_age)
+        self.sessions.prune(self.session_max_age)
+ 
+    async def _prune_loop(self):
+        while not self._closing.is_set():
             try:
-                opts = TRANSPORT_OPTIONS.get(name, {})
+                await asyncio.to_thread(self._prune_checkpoints)
+            except Exception as e:
+                logger.warning(f"[CHECKPOINT] prune failed → {e}")
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.prune_interval)
+            except asyncio.TimeoutError:
+                pass
  
-                def factory(**kw):
-                    kw["verify"] = opts.get("verify", True)
-                    kw["timeout"] = opts.get("timeout", 30)
-                    return httpx.AsyncClient(**kw)
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
  
-                transport = StreamableHttpTransport(url, httpx_client_factory=factory)
-                self.clients[name] = Client(transport=transport)
+    # -----------------------------
+    def _make_tool(
+        self, server: str, entry: Dict[str, Any], used_names: set, call_schema: Optional[Dict[str, Any]] = None
+    ) -> MCPTool:
+        Model = build_model(entry["name"] + "_Input", entry["inputSchema"])
+        base_name = self._safe_tool_name(server, entry["name"])
+        agent_tool_name = base_name
+        suffix = 2
+        while agent_tool_name in used_names:
+            agent_tool_name = f"{base_name}_{suffix}"
+            suffix += 1
+        used_names.add(agent_tool_name)
+ 
+        desc_prefix = f"[server={server}] {SERVER_ROUTING_GUIDE.get(server, '')}".strip()
+        full_desc = f"{desc_prefix} Original tool: {entry['name']}. {entry['description']}".strip()
+ 
+        return MCPTool(
+            name=agent_tool_name,
+            description=full_desc,
+            args_schema=Model,
+            call_schema=call_schema or canonical_schema(Model),
+            server=server,
+            mcp_tool_name=entry["name"],
+            manager=self,
+        )
  
-                logger.info(f"[OK] Connected → {name}")
+    def _rebuild_tool_list(self):
+        self.tools = [
+            tool
+            for server in self.servers
+            for tool in self.tool_index.get(server, {}).values()
+        ]
+ 
+    def _apply_server_catalog(
+        self, server: str, entries: Dict[str, Dict[str, Any]], schemas: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> bool:
+        old_entries = self.catalog.get(server, {})
+        old_tools = self.tool_index.get(server, {})
+        if server in self.tool_index and (
+            {n: e["hash"] for n, e in entries.items()} == {n: e["hash"] for n, e in old_entries.items()}
+        ):
+            return False
+        used_names = {
+            t.name
+            for s, tools in self.tool_index.items()
+            if s != server
+            for t in tools.values()
+        }
+ 
+        tools: Dict[str, MCPTool] = {}
+        rebuilt = 0
+        for name, entry in entries.items():
+            old = old_tools.get(name)
+            if old is not None and old_entries.get(name, {}).get("hash") == entry["hash"]:
+                used_names.add(old.name)
+                tools[name] = old
+                continue
+            tools[name] = self._make_tool(server, entry, used_names, (schemas or {}).get(entry["hash"]))
+            rebuilt += 1
+ 
+        removed = len(set(old_entries) - set(entries))
+        self.catalog[server] = entries
+        self.tool_index[server] = tools
+        self._rebuild_tool_list()
+        self.router.set_tool_keywords(server, [(e["name"], e["description"]) for e in entries.values()])
+ 
+        if rebuilt or removed:
+            self.catalog_version += 1
+            if self.recorder is not None:
+                self.recorder.catalog(server, list(entries.values()))
+            logger.info(f"[CATALOG] {server} → {rebuilt} rebuilt, {removed} removed, {len(tools)} total")
+        return bool(rebuilt or removed)
+ 
+    async def _fetch_server_catalog(self, server: str) -> Dict[str, Dict[str, Any]]:
+        async with self.pools[server].session() as client:
+            raw = await client.list_tools()
+ 
+        entries = {}
+        for t in raw:
+            entry = {
+                "name": t.name,
+                "description": t.description or "",
+                "inputSchema": t.inputSchema or {},
+            }
+            entry["hash"] = schema_hash(entry)
+            entries[t.name] = entry
+        return entries
+ 
+    def _save_catalog(self):
+        write_json(
+            json_value={
+                server: {
+                    "url": self._server_id(server),
+                    "tools": list(entries.values()),
+                    "schema_format": CATALOG_SCHEMA_FORMAT,
+                    # canonical schema per entry hash, so a warm start skips the pydantic → JSON schema pass
+                    "schemas": {
+                        entries[name]["hash"]: tool.call_schema
+                        for name, tool in self.tool_index.get(server, {}).items()
+                        if name in entries
+                    },
+                }
+                for server, entries in self.catalog.items()
+            },
+            json_file_name=TOOL_CATALOG_FILE,
+        )
  
+    def _load_cached_catalog(self) -> bool:
+        cached = read_json(TOOL_CATALOG_FILE)
+        if not isinstance(cached, dict):
+            return False
+ 
+        for server in self.servers:
+            data = cached.get(server)
+            if not data or data.get("url") != self._server_id(server):
+                return False
+ 
+        for server in self.servers:
+            entries = {e["name"]: e for e in cached[server]["tools"]}
+            fresh = cached[server].get("schema_format") == CATALOG_SCHEMA_FORMAT
+            self._apply_server_catalog(server, entries, cached[server].get("schemas") if fresh else None)
+        return True
+ 
+    async def refresh_catalog(self, wait: Optional[float] = None) -> bool:
+        # servers are fetched concurrently and registered as each one answers; with `wait`,
+        # servers still pending after that many seconds keep going in the background
+        changed = False
+        settled = False
+ 
+        async def refresh(server):
+            nonlocal changed
+            started = time.perf_counter()
+            try:
+                entries = await self._fetch_server_catalog(server)
             except Exception as e:
-                logger.error(f"[FAIL] {name} → {e}")
+                logger.error(f"[CATALOG] {server} refresh failed → {e}")
+                return
+            finally:
+                self.discovery_times[server] = round(time.perf_counter() - started, 4)
+            if not self._apply_server_catalog(server, entries):
+                return
+            changed = True
+            if settled:
+                logger.info(f"[CATALOG] {server} answered late, registering its tools")
+                self._save_catalog()
+                if self.agent is not None and self.tools:
+                    await self.build_agent()
+ 
+        tasks = {asyncio.create_task(refresh(n)) for n in self.pools}
+        pending = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=wait)
+        settled = True
+        if pending:
+            logger.warning(f"[CATALOG] {len(pending)} server(s) still discovering after {wait}s")
+            self._late_discovery |= pending
+            for task in pending:
+                task.add_done_callback(self._late_discovery.discard)
+ 
+        if changed:
+            self._save_catalog()
+            if self.agent is not None and self.tools:
+                await self.build_agent()
+        return changed
+ 
+    async def refresh_server(self, server: str) -> bool:
+        # one server only: unchanged hashes stop here, changed tools are rebuilt and the agent swapped
+        entries = await self._fetch_server_catalog(server)
+        if not self._apply_server_catalog(server, entries):
+            return False
+        self._save_catalog()
+        if self.agent is not None and self.tools:
+            await self.build_agent()
+        return True
  
     # -----------------------------
-    async def discover_tools(self):
-        self.tools.clear()
-        used_names = set()
- 
-        async def load(server, client):
-            async with client:
-                raw = await client.list_tools()
-                for t in raw:
-                    schema = t.inputSchema or {}
-                    Model = build_model(t.name + "_Input", schema)
-                    agent_tool_name = self._safe_tool_name(server, t.name)
-                    suffix = 2
-                    while agent_tool_name in used_names:
-                        agent_tool_name = f"{agent_tool_name}_{suffix}"
-                        suffix += 1
-                    used_names.add(agent_tool_name)
- 
-                    desc_prefix = f"[server={server}] {SERVER_ROUTING_GUIDE.get(server, '')}".strip()
-                    full_desc = f"{desc_prefix} Original tool: {t.name}. {t.description or ''}".strip()
- 
-                    tool = MCPTool(
-                        name=agent_tool_name,
-                        description=full_desc,
-                        args_schema=Model,
-                        server=server,
-                        mcp_tool_name=t.name,
-                        manager=self,
-                    )
-                    self.tools.append(tool)
- 
-        await asyncio.gather(*(load(n, c) for n, c in self.clients.items()))
-        logger.info("Loaded %d tools", len(self.tools))
+    async def discover_tools(self, wait: Optional[float] = None, verify_cached: bool = True) -> bool:
+        # True when the catalog came from the cache; with verify_cached=False the caller starts verify_catalog()
+        with self.telemetry.span("mcp.discover"):
+            if self._load_cached_catalog():
+                logger.info("Loaded %d tools from catalog cache", len(self.tools))
+                if verify_cached:
+                    self.verify_catalog()
+                return True
+ 
+            self.catalog.clear()
+            self.tool_index.clear()
+            await self.refresh_catalog(wait=wait)
+            if not self.tools and self._late_discovery:
+                # nothing answered in time; the agent needs at least one server
+                await asyncio.wait(set(self._late_discovery))
+            logger.info("Loaded %d tools", len(self.tools))
+            return False
+ 
+    def verify_catalog(self):
+        # re-fetches every server in the background and swaps in whatever changed since the cache was written
+        if self._catalog_task is None or self._catalog_task.done():
+            self._catalog_task = asyncio.create_task(self.refresh_catalog())
+ 
+    async def startup(self, discovery_wait: Optional[float] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        report: Dict[str, Any] = {"import_s": round(IMPORT_SECONDS, 4)}
+ 
+        async def phase(name, coro):
+            t0 = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                report[name] = round(time.perf_counter() - t0, 4)
+ 
+        # the LLM client (gen_ai_hub import + deployment lookup) is built while servers are discovered
+        llm_task = asyncio.create_task(phase("llm_s", asyncio.to_thread(lambda: self.llm)))
+        try:
+            await phase("connect_s", self.connect())
+            from_cache = await phase(
+                "discover_s",
+                self.discover_tools(
+                    wait=STARTUP_DISCOVERY_WAIT if discovery_wait is None else discovery_wait, verify_cached=False
+                ),
+            )
+            await llm_task
+        finally:
+            if not llm_task.done():
+                llm_task.cancel()
+        await phase("build_agent_s", self.build_agent())
+        # on a warm start the cached catalog is checked only now: re-fetching every server while the
+        # LLM client imports competed with it for the GIL and roughly doubled the time to ready
+        if from_cache:
+            self.verify_catalog()
+        self.catalog_watch.start()
+        self.artifacts.start()
+        if self.checkpointer is not None:
+            self._prune_task = asyncio.create_task(self._prune_loop())
+ 
+        report["servers_s"] = dict(self.discovery_times)
+        report["pending_servers"] = len(self._late_discovery)
+        report["tools"] = len(self.tools)
+        report["ready_s"] = round(time.perf_counter() - started, 4)
+        self.startup_report = report
+        logger.info(f"[STARTUP] {report}")
+        return report
  
     # -----------------------------
+    @asynccontextmanager
+    async def _admit(self, server):
+        # concurrency slot + pooled session, taken before the attempt timeout starts
+        limit, load = self.limits[server], self.server_load[server]
+        load["calls"] += 1
+        if limit.locked():
+            load["queued"] += 1
+        waited = time.perf_counter()
+        async with limit:
+            async with self.pools[server].lease() as lease:
+                load["wait_time"] += time.perf_counter() - waited
+                load["in_flight"] += 1
+                load["peak_in_flight"] = max(load["peak_in_flight"], load["in_flight"])
+                try:
+                    yield lease
+                finally:
+                    load["in_flight"] -= 1
+ 
+    async def _call_tool(self, server, tool, args, lease):
+        started = time.perf_counter()
+        try:
+            client = await lease.client()
+            res = await client.call_tool(tool, args)
+        except Exception as e:
+            if self.recorder is not None:
+                self.recorder.tool_call(server, tool, args, None, repr(e), (time.perf_counter() - started) * 1000)
+            raise
+ 
+        out = []
+        for c in res.content:
+            if getattr(c, "text", None):
+                out.append(c.text)
+            elif getattr(c, "json", None):
+                out.append(json.dumps(c.json, separators=(",", ":"), ensure_ascii=False))
+            else:
+                out.append(str(c))
+        if self.recorder is not None:
+            self.recorder.tool_call(server, tool, args, out, None, (time.perf_counter() - started) * 1000)
+        return out
+ 
+    def _cache_ttl(self, server: str, tool: str) -> float:
+        words = set(re.findall(r"[a-z]+", re.sub(r"([a-z])([A-Z])", r"\1_\2", tool).lower()))
+        if words & WRITE_TOOL_VERBS:
+            return 0.0
+        for pattern, ttl in TOOL_CACHE_TTL.get(server, {}).items():
+            if fnmatchcase(tool.lower(), pattern.lower()):
+                return ttl
+        return 0.0
+ 
+    async def _resilient_call(self, server, tool, args):
+        hedge = HEDGE_READ_ONLY_TOOLS and tool.lower().startswith(READ_ONLY_TOOL_PREFIXES)
+        attempts = 0
+ 
+        async def attempt(lease):
+            nonlocal attempts
+            attempts += 1
+            with self.telemetry.span("mcp.attempt", server=server, tool=tool, attempt=attempts):
+                return await self._call_tool(server, tool, args, lease)
+ 
+        out = await self.resilience.call(server, tool, attempt, hedge=hedge, admit=lambda: self._admit(server))
+        text = self.spill.fit(out)
+        if text is not None:
+            return text
+        # oversized: keep it on disk and give the agent a preview plus a handle
+        return await asyncio.to_thread(self.spill.spill, out)
+ 
     async def execute(self, server, tool, args):
-        client = self.clients[server]
+        try:
+            with self.telemetry.span("mcp.tool", server=server, tool=tool):
+                ttl = self._cache_ttl(server, tool)
+                if ttl > 0:
+                    return await self.result_cache.get_or_call(
+                        result_cache_key(server, tool, args),
+                        ttl,
+                        lambda: self._resilient_call(server, tool, args),
+                    )
+                return await self._resilient_call(server, tool, args)
+        except Exception as e:
+            logger.error(f"[CALL] {server}/{tool} failed → {e!r}")
+            return f"ERROR: {e}"
  
-        for attempt in range(MAX_RETRIES):
-            try:
-                async with client:
-                    res = await client.call_tool(tool, args)
+    def resilience_stats(self) -> Dict[str, Any]:
+        return self.resilience.snapshot()
  
-                out = []
-                for c in res.content:
-                    if getattr(c, "text", None):
-                        out.append(c.text)
-                    elif getattr(c, "json", None):
-                        out.append(json.dumps(c.json, indent=2))
-                    else:
-                        out.append(str(c))
+    def concurrency_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                **load,
+                "wait_time": round(load["wait_time"], 4),
+                "limit": SERVER_CONCURRENCY.get(name, 4),
+            }
+            for name, load in self.server_load.items()
+        }
  
-                return "\n".join(out)
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "telemetry": self.telemetry.snapshot(),
+            "concurrency": self.concurrency_stats(),
+            "pools": self.pool_stats(),
+            "routing": self.route_stats(),
+            "resilience": self.resilience_stats(),
+            "tool_cache": self.result_cache.snapshot(),
+            "tool_results": self.spill.snapshot(),
+            "prompt_cache": self.prompt_cache_stats(),
+            "llm_cache": self.llm_cache.snapshot() if self.llm_cache is not None else None,
+            "llm_governor": self.llm_governor.snapshot() if self.llm_governor is not None else None,
+            "traffic": self.recorder.snapshot() if self.recorder is not None else None,
+            "checkpoints": self.checkpointer.snapshot() if self.checkpointer is not None else None,
+            "artifacts": self.artifacts.snapshot(),
+            "artifact_store": self.artifact_store.snapshot(),
+            "catalog": {"version": self.catalog_version, "tools": len(self.tools), **self.catalog_watch.snapshot()},
+            "startup": self.startup_report,
+        }
  
-            except Exception as e:
-                if attempt == MAX_RETRIES - 1:
-                    return f"ERROR: {e}"
-                await asyncio.sleep(1)
+    # -----------------------------
+    def find_runs(self, **filters) -> List[Dict[str, Any]]:
+        return self.artifact_store.find(**filters)
+ 
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return self.artifact_store.get(run_id)
+ 
+    def export_pdf(self, run_id: str, pdf_mode: str = "full") -> Optional[str]:
+        return export_pdf(self.artifact_store, run_id, pdf_mode)
  
     # -----------------------------
+    def _create_agent(self, tools: List[MCPTool]):
+        from langchain.agents import create_agent
+ 
+        # fixed system prompt + name-sorted tools keep the request prefix byte-identical across turns
+        return create_agent(
+            model=self.llm,
+            tools=sorted([*tools, self.result_reader], key=lambda t: t.name),
+            system_prompt=SYSTEM_PROMPT,
+            checkpointer=self.checkpointer,
+        )
+ 
     async def build_agent(self):
         if not self.tools:
             raise RuntimeError("No MCP tools were discovered. Cannot build agent.")
  
-        routing_text = "\n".join(
-            f"- {name}: {guide}" for name, guide in SERVER_ROUTING_GUIDE.items()
-        )
+        # swap, don't mutate: runs already in flight keep the agent (and tools) they started with
+        agent = self._create_agent(self.tools)
+        self.agent, self.agents, self._tool_tokens = agent, {}, {}
  
-        self.agent = create_agent(
-            model=self.llm,
-            tools=self.tools,
-            system_prompt=(
-                "You are an SAP MCP automation agent.\n"
-                "Select tools strictly by server responsibility.\n"
-                "Server routing rules:\n"
-                f"{routing_text}\n"
-                "If the user asks for SAP-standard documentation, prioritize documentation_mcp tools first.\n"
-                "If the task is iFlow creation, prioritize integration_suite tools.\n"
-                "If the task is testing or validation, prioritize mcp_testing tools.\n"
-                "Do not mix servers unless explicitly required."
-            ),
+    # -----------------------------
+    def _tools_for_route(self, route_server: Optional[str]) -> List[MCPTool]:
+        if route_server is None or route_server not in self.tool_index:
+            return self.tools
+ 
+        selected = []
+        for tool in self.tools:
+            if tool.server == route_server:
+                selected.append(tool)
+ 
+        for server, tools in self.tool_index.items():
+            if server == route_server:
+                continue
+            explicit = set(ROUTE_FALLBACK_TOOLS.get(server, []))
+            read_only = 0
+            for name, tool in tools.items():
+                if name in explicit:
+                    selected.append(tool)
+                elif read_only < ROUTE_FALLBACK_PER_SERVER and name.lower().startswith(READ_ONLY_TOOL_PREFIXES):
+                    selected.append(tool)
+                    read_only += 1
+ 
+        return selected
+ 
+    def _schema_tokens(self, tools: List[MCPTool]) -> int:
+        total = 0
+        for tool in tools:
+            if tool.name not in self._tool_tokens:
+                self._tool_tokens[tool.name] = count_tokens(json.dumps(convert_to_openai_tool(tool)))
+            total += self._tool_tokens[tool.name]
+        return total
+ 
+    def _agent_for_route(self, route_server: Optional[str]):
+        tools = self._tools_for_route(route_server)
+        stats = self.routing_stats
+        stats["queries"] += 1
+ 
+        if len(tools) == len(self.tools):
+            return self.agent
+ 
+        full_tokens = self._schema_tokens(self.tools)
+        bound_tokens = self._schema_tokens(tools)
+        stats["subset_queries"] += 1
+        stats["full_tool_tokens"] += full_tokens
+        stats["bound_tool_tokens"] += bound_tokens
+        logger.info(
+            f"[ROUTE] {route_server} → {len(tools)}/{len(self.tools)} tools, "
+            f"{bound_tokens}/{full_tokens} tool schema tokens"
         )
-    def update_memory(self, user, assistant):
  
-        self.memory.append({"role":"user","content":user})
-        self.memory.append({"role":"assistant","content":assistant})
+        key = tuple(sorted(t.name for t in tools))
+        agent = self.agents.get(key)
+        if agent is None:
+            agent = self._create_agent(tools)
+            self.agents[key] = agent
+        return agent
+ 
+    def route_stats(self) -> Dict[str, Any]:
+        stats = dict(self.routing_stats)
+        full = stats["full_tool_tokens"]
+        stats["tool_tokens_saved"] = full - stats["bound_tool_tokens"]
+        stats["tool_tokens_saved_pct"] = round(100 * stats["tool_tokens_saved"] / full, 1) if full else 0.0
+        stats["cached_agents"] = len(self.agents)
+        return stats
+ 
+    def prompt_cache_stats(self) -> Dict[str, Any]:
+        stats = dict(self.prompt_stats)
+        total = stats["input_tokens"]
+        stats["cached_pct"] = round(100 * stats["cached_tokens"] / total, 1) if total else 0.0
+        return stats
  
-        if len(self.memory) > MEMORY_LIMIT:
-            self.memory = self.memory[-MEMORY_LIMIT:]
+    # -----------------------------
+    def new_memory(self) -> ConversationMemory:
+        return ConversationMemory(summarizer=self._summarize_history, **MEMORY_OPTIONS)
+ 
+    async def _summarize_history(self, transcript: str) -> str:
+        # runs in its own task, after the turn that triggered it; it never holds up a query
+        LLM_PRIORITY.set("background")
+        res = await self.llm.ainvoke([
+            {
+                "role": "system",
+                "content": (
+                    "Condense this conversation into a short digest for later turns. Keep decisions, "
+                    "artifact names (iFlows, packages, adapters), IDs and open questions. Drop long documents."
+                ),
+            },
+            {"role": "user", "content": transcript},
+        ])
+        return res.content if isinstance(res.content, str) else str(res.content)
+ 
+    def update_memory(self, user, assistant, memory: Optional[ConversationMemory] = None):
+        memory = memory if memory is not None else self.memory
+        memory.append("user", user)
+        memory.append("assistant", assistant)
  
     # -----------------------------
-    async def ask(self, query: str):
-        logger_cb = StepLogger()
-        route_server = self._routing_hint_for_query(query)
+    def _restored(self, saved: Optional[Dict[str, Any]]) -> ConversationMemory:
+        memory = self.new_memory()
+        if saved is not None and saved["memory"]:
+            memory.restore(saved["memory"])
+        return memory
+ 
+    def load_session(self, thread_id: str) -> ConversationMemory:
+        return self._restored(self.sessions.load(thread_id) if self.sessions is not None else None)
+ 
+    async def _load_saved(self, thread_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        # the SQLite read runs off the loop; restores stay on it (they may start a summarization task)
+        if self.sessions is None or thread_id is None:
+            return None
+        return await asyncio.to_thread(self.sessions.load, thread_id)
+ 
+    async def aload_session(self, thread_id: str) -> ConversationMemory:
+        return self._restored(await self._load_saved(thread_id))
+ 
+    def interrupted_run(self, thread_id: str) -> Optional[str]:
+        saved = self.sessions.load(thread_id) if self.sessions is not None else None
+        return saved["run_query"] if saved is not None else None
+ 
+    async def open_session(self, thread_id: str) -> Optional[str]:
+        # makes thread_id the default session (self.memory); returns the query of a run it left unfinished
+        saved = await self._load_saved(thread_id)
+        self.memory, self.thread_id = self._restored(saved), thread_id
+        return saved["run_query"] if saved is not None else None
+ 
+    def drop_session(self, thread_id: str) -> bool:
+        if self.sessions is None:
+            return False
+        saved = self.sessions.load(thread_id)
+        if saved is not None and saved["run_thread"]:
+            self.checkpointer.delete_thread(saved["run_thread"])
+        return self.sessions.delete(thread_id)
+ 
+    async def _session(self, memory: Optional[ConversationMemory], thread_id: Optional[str]):
+        if memory is not None:
+            return memory, thread_id
+        if thread_id is None or thread_id == self.thread_id:
+            return self.memory, self.thread_id
+        return await self.aload_session(thread_id), thread_id
+ 
+    async def _begin_run(self, query: str, thread_id: Optional[str]) -> str:
+        # each run gets its own graph thread, so it starts from empty state; the session only
+        # remembers which run is in flight
+        run_thread = f"{thread_id or 'run'}:{uuid.uuid4().hex[:12]}"
+        if self.sessions is not None and thread_id is not None:
+            previous = await asyncio.to_thread(self.sessions.begin_run, thread_id, run_thread, query)
+            if previous:
+                # a new query replaces a run that was never resumed
+                await self.checkpointer.adelete_thread(previous)
+        return run_thread
+ 
+    async def _end_run(self, run_thread: str, thread_id: Optional[str], memory: ConversationMemory):
+        if self.checkpointer is None:
+            return
+        if self.sessions is not None and thread_id is not None:
+            await asyncio.to_thread(self.sessions.end_run, thread_id, memory.state())
+        await self.checkpointer.adelete_thread(run_thread)
+ 
+    def _run_config(self, run_thread: str, callbacks: List[BaseCallbackHandler]) -> Dict[str, Any]:
+        config: Dict[str, Any] = {"callbacks": callbacks}
+        if self.checkpointer is not None:
+            config["configurable"] = {"thread_id": run_thread}
+        return config
+ 
+    # -----------------------------
+    def _callbacks(self, *extra) -> List[BaseCallbackHandler]:
+        callbacks = [*extra, UsageLogger(self.prompt_stats)]
+        if self.recorder is not None:
+            callbacks.append(TrafficCallback(self.recorder))
+        return callbacks
+ 
+    def _prepare_run(self, query: str, route: RouteResult, memory: Optional[ConversationMemory] = None):
+        if self.recorder is not None:
+            self.recorder.ask(query)
+        route_server = route.server
+        logger.info(f"[ROUTE] {route_server} (confidence {route.confidence}) ← {route.ranked}")
         guidance = ""
         if route_server:
             guidance = (
                 f"\n\nRouting hint: This request best matches `{route_server}`. "
                 f"{SERVER_ROUTING_GUIDE.get(route_server, '')}"
             )
-        if self._is_documentation_query(query):
-            guidance += f"\n\n{SAP_DOC_TEMPLATE}"
+        if route.is_documentation:
+            guidance += "\n\nDocumentation request: apply the documentation output contract from the system prompt."
  
-        messages = list(self.memory)
+        memory = memory if memory is not None else self.memory
+        messages = memory.messages()
         messages.append({"role": "user", "content": query + guidance})
+        return self._agent_for_route(route_server), messages
  
-        result = await self.agent.ainvoke(
-            {"messages": messages},
-            config={"callbacks": [logger_cb]},
-        )
-        
-        write_json(json_value = str(result), json_file_name = "pipo_client_code_response.json")
-        # print(type(response))
-        
-        agent_messages = result["messages"]
-
-        #################################
-        
-        structured_messages_1 = []
-
-        for idx, msg in enumerate(agent_messages):
-            msg_dict = msg.model_dump()  # includes EVERYTHING
-            msg_dict["index"] = idx
-            # msg_dict["message_type"] = msg.__class__.__name__
-            print("------------", f"{type(msg_dict)}")
-            print("------------", f"{len(msg_dict)}")
-
-            structured_messages_1.append(msg_dict)
-        
-        write_json(json_value = structured_messages_1, json_file_name = "pipo_client_code_parsed_1.json")
-        
-        #################################
-        
-        structured_messages_2 = []
-
-        HUMAN_UNWANTED = {
-            "additional_kwargs",
-            "response_metadata",
-            "id",
-            "name"
-        }
-
-        AI_UNWANTED = {
-            "additional_kwargs",
-            "response_metadata",
-            "usage_metadata",
-            "id",
-            "invalid_tool_calls",
-            "name"
-        }
-
-        TOOL_UNWANTED = {
-            "additional_kwargs",
-            "response_metadata",
-            "tool_call_id",
-            "artifact",
-            "id"
-        }
-
-        for idx, msg in enumerate(agent_messages):
-            msg_dict = msg.model_dump()
-            msg_type = msg_dict.get("type")
-
-            if msg_type == "human":
-                unwanted = HUMAN_UNWANTED
-            elif msg_type == "ai":
-                unwanted = AI_UNWANTED
-            elif msg_type == "tool":
-                unwanted = TOOL_UNWANTED
-            else:
-                unwanted = set()
-
-            # Remove unwanted keys
-            for key in unwanted:
-                msg_dict.pop(key, None)
-
-            # Remove empty values
-            # msg_dict = {k: v for k, v in msg_dict.items() if v not in (None, [], {})}
-
-            msg_dict["index"] = idx
-
-            structured_messages_2.append(msg_dict)
-
-        write_json(json_value = structured_messages_2, json_file_name = "pipo_client_code_parsed_2.json")
-        
-        #################################
-        
-        pretty_json = json.dumps(
-            structured_messages_2,
-            indent=4,
-            ensure_ascii=False
-        )
-
-        pdf_path, json_path = pdf_and_json_path()
-        save_to_pdf(pretty_json, pdf_path)
-        write_json(json_value = structured_messages_2, json_file_name = json_path)
-        
-        #################################
-        
-        final_msg = result["messages"][-1]
+    def _tools_used(self, agent_messages: List[Any]) -> List[tuple]:
+        by_name = {t.name: t for t in self.tools}
+        used = set()
+        for msg in agent_messages:
+            if getattr(msg, "type", None) == "tool":
+                tool = by_name.get(msg.name)
+                used.add((tool.server, tool.mcp_tool_name) if tool else (None, msg.name))
+        return sorted(used, key=str)
+ 
+    async def _finish_run(self, query: str, agent_messages: List[Any], memory: Optional[ConversationMemory] = None) -> str:
+        await self.artifacts.submit(agent_messages, {"query": query, "tools": self._tools_used(agent_messages)})
+ 
+        final_msg = agent_messages[-1]
         answer_text = final_msg.content if hasattr(final_msg, "content") else str(final_msg)
-        self.update_memory(query, answer_text)
-        
-        # result_str = str(answer_text)                                         #single pdf file save
-        # save_to_pdf(result_str, filename="final_message.pdf")    
-
+        self.update_memory(query, answer_text, memory)
+        return answer_text
+ 
+    # -----------------------------
+    async def ask(
+        self,
+        query: str,
+        memory: Optional[ConversationMemory] = None,
+        cache: bool = True,
+        thread_id: Optional[str] = None,
+        priority: Optional[str] = None,
+        route: Optional[RouteResult] = None,
+    ):
+        memory, thread_id = await self._session(memory, thread_id)
+        route = route or self.route(query)
+        logger_cb = StepLogger()
+        bypass = LLM_CACHE_BYPASS.set(not cache)
+        rank = LLM_PRIORITY.set(self._priority(route, priority))
+        try:
+            return await self._ask(query, route, memory, thread_id, logger_cb)
+        finally:
+            LLM_PRIORITY.reset(rank)
+            LLM_CACHE_BYPASS.reset(bypass)
+ 
+    def _priority(self, route: RouteResult, priority: Optional[str]) -> str:
+        # unless the caller says otherwise, documentation runs queue behind everything else
+        if priority is not None:
+            return priority
+        return "bulk" if route.is_documentation else "interactive"
+ 
+    async def resume(
+        self,
+        thread_id: Optional[str] = None,
+        memory: Optional[ConversationMemory] = None,
+        cache: bool = True,
+        priority: Optional[str] = None,
+        route: Optional[RouteResult] = None,
+    ):
+        # continues the session's interrupted run from its last checkpoint
+        thread_id = thread_id or self.thread_id
+        saved = await self._load_saved(thread_id)
+        if saved is None or not saved["run_thread"]:
+            raise ValueError(f"no interrupted run for session {thread_id!r}")
+        if memory is None:
+            # the record just read already holds the session's memory; no second load
+            memory = self.memory if thread_id == self.thread_id else self._restored(saved)
+        logger_cb = StepLogger()
+        bypass = LLM_CACHE_BYPASS.set(not cache)
+        route = route or self.route(saved["run_query"])
+        rank = LLM_PRIORITY.set(self._priority(route, priority))
+        try:
+            return await self._ask(saved["run_query"], route, memory, thread_id, logger_cb, resume=saved["run_thread"])
+        finally:
+            LLM_PRIORITY.reset(rank)
+            LLM_CACHE_BYPASS.reset(bypass)
+ 
+    async def _ask(
+        self,
+        query: str,
+        route: RouteResult,
+        memory: ConversationMemory,
+        thread_id: Optional[str],
+        logger_cb: StepLogger,
+        resume: Optional[str] = None,
+    ):
+        with self.telemetry.span("agent.ask"):
+            if resume is None:
+                agent, messages = self._prepare_run(query, route, memory)
+                run_input = {"messages": messages}
+                run_thread = await self._begin_run(query, thread_id)
+            else:
+                # no input: the graph picks up from the run's latest checkpoint and its saved task writes
+                agent, run_input, run_thread = self._agent_for_route(route.server), None, resume
+                logger.info(f"[CHECKPOINT] resuming {run_thread} ← {query[:80]!r}")
+ 
+            try:
+                result = await agent.ainvoke(
+                    run_input,
+                    config=self._run_config(
+                        run_thread, self._callbacks(logger_cb, TelemetryCallback(self.telemetry))
+                    ),
+                    durability=self.durability,
+                )
+            except Exception as e:
+                if thread_id is not None and self.checkpointer is not None:
+                    logger.warning(f"[CHECKPOINT] run {run_thread} interrupted, resumable → {e!r}")
+                raise
+ 
+            answer_text = await self._finish_run(query, result["messages"], memory)
+            await self._end_run(run_thread, thread_id, memory)
+ 
         return {
             "answer": answer_text,
             "steps": logger_cb.steps,
         }
  
+    # -----------------------------
+    async def ask_stream(
+        self,
+        query: str,
+        memory: Optional[ConversationMemory] = None,
+        cache: bool = True,
+        thread_id: Optional[str] = None,
+        priority: Optional[str] = None,
+        route: Optional[RouteResult] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # a with-block span would be entered and exited across yields, so this one is explicit
+        op = self.telemetry.begin("agent.ask")
+        error = None
+        # set for the graph tasks started below; they copy the context when they are created
+        route = route or self.route(query)
+        bypass = LLM_CACHE_BYPASS.set(not cache)
+        rank = LLM_PRIORITY.set(self._priority(route, priority))
+        try:
+            memory, thread_id = await self._session(memory, thread_id)
+            agent, messages = self._prepare_run(query, route, memory)
+            run_thread = await self._begin_run(query, thread_id)
+            tool_started: Dict[str, float] = {}
+            final_messages = None
+ 
+            async for ev in agent.astream_events(
+                {"messages": messages},
+                config=self._run_config(run_thread, self._callbacks(
+                    TelemetryCallback(self.telemetry, parent=trace.set_span_in_context(op[0])),
+                )),
+                version="v2",
+                durability=self.durability,
+            ):
+                kind = ev["event"]
+ 
+                if kind == "on_chat_model_stream":
+                    text = ev["data"]["chunk"].content
+                    if isinstance(text, str) and text:
+                        yield {"type": "token", "text": text}
+ 
+                elif kind == "on_tool_start":
+                    tool_started[ev["run_id"]] = time.perf_counter()
+                    yield {"type": "tool_start", "tool": ev["name"], "input": ev["data"].get("input")}
+ 
+                elif kind == "on_tool_end":
+                    started = tool_started.pop(ev["run_id"], None)
+                    output = ev["data"].get("output")
+                    yield {
+                        "type": "tool_end",
+                        "tool": ev["name"],
+                        "output": getattr(output, "content", output),
+                        "elapsed": time.perf_counter() - started if started else None,
+                    }
+ 
+                elif kind == "on_chain_end" and not ev.get("parent_ids"):
+                    final_messages = ev["data"]["output"]["messages"]
+ 
+            if final_messages is None:
+                raise RuntimeError("Agent run finished without a final state")
+ 
+            answer_text = await self._finish_run(query, final_messages, memory)
+            await self._end_run(run_thread, thread_id, memory)
+            yield {"type": "final", "answer": answer_text}
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.telemetry.end("agent.ask", op, error)
+            LLM_PRIORITY.reset(rank)
+            LLM_CACHE_BYPASS.reset(bypass)
  
  
 # --------------------------------------------------
 # CLI LOOP
 # --------------------------------------------------
-async def cli():
+def print_startup(report: Dict[str, Any]):
+    phases = ", ".join(f"{k[:-2]} {v:.2f}s" for k, v in report.items() if k.endswith("_s") and isinstance(v, float))
+    print(f"Startup: {phases}; {report['tools']} tools")
+    if report["pending_servers"]:
+        print(f"{report['pending_servers']} server(s) still discovering, their tools join when ready")
+ 
+ 
+async def cli(session: str = "default"):
     mcp = MultiMCP()
+    # memory (and an unfinished run) of the session carry over from the last time it was used
+    interrupted = await mcp.open_session(session)
+ 
+    # startup (LLM client, connections, discovery) runs while the first query is typed;
+    # input() runs in a thread so the event loop keeps working on it
+    starting = asyncio.create_task(mcp.startup())
+    print(f"\nAccepting input after {IMPORT_SECONDS:.2f}s import, still connecting... Type 'exit' to quit.")
+    print("The first query waits for startup if it is not done yet.")
+    print(f"Session '{session}' ({len(mcp.memory)} remembered messages).\n")
+    if interrupted:
+        print(f"The last run in this session was interrupted: {interrupted[:120]!r}. Type :resume to continue it.\n")
+ 
+    async def announce():
+        # READY = usable: import + connect + discover + build, measured from the first import
+        try:
+            report = await starting
+        except Exception:
+            return  # surfaced by the first query
+        print(f"\nREADY after {time.perf_counter() - _IMPORT_STARTED:.2f}s.")
+        print_startup(report)
+        print(">> ", end="", flush=True)
+ 
+    announcing = asyncio.create_task(announce())
+ 
+    try:
+        while True:
+            q = (await asyncio.to_thread(input, ">> ")).strip()
+            if q.lower() in {"exit", "quit"}:
+                break
+ 
+            if not starting.done():
+                print("(finishing startup...)")
+            await starting
+            await announcing
+ 
+            if q == ":stats":
+                print(json.dumps(mcp.stats(), indent=2, default=str))
+                continue
+ 
+            if q == ":sessions":
+                print(json.dumps(mcp.sessions.sessions() if mcp.sessions else [], indent=2, default=str))
+                continue
+ 
+            # ":pdf [run_id]" renders a stored run (default: the latest) to _downloads/_pdf
+            if q == ":pdf" or q.startswith(":pdf "):
+                run_id = q[len(":pdf"):].strip()
+                if not run_id:
+                    await mcp.artifacts.flush()
+                    latest = await asyncio.to_thread(mcp.find_runs, limit=1)
+                    run_id = latest[0]["run_id"] if latest else ""
+                path = await asyncio.to_thread(mcp.export_pdf, run_id) if run_id else None
+                print(f"PDF → {path}\n" if path else "No stored run to export.\n")
+                continue
+ 
+            if q == ":resume":
+                try:
+                    res = await mcp.resume(priority="interactive")
+                except ValueError as e:
+                    print(f"{e}\n")
+                    continue
+                print("\n--- RESULT ---")
+                print(res["answer"], "\n")
+                continue
+ 
+            # ":fresh <query>" asks without reading the LLM response cache
+            cache = True
+            if q.startswith(":fresh "):
+                q, cache = q[len(":fresh "):].strip(), False
+ 
+            print("\n--- RESULT ---")
+            streamed = False
+            async for ev in mcp.ask_stream(q, cache=cache, priority="interactive"):
+                if ev["type"] == "token":
+                    print(ev["text"], end="", flush=True)
+                    streamed = True
+                elif ev["type"] == "tool_start":
+                    print(f"\n[tool] {ev['tool']} ← {ev['input']}", flush=True)
+                elif ev["type"] == "tool_end":
+                    elapsed = f"{ev['elapsed']:.2f}s" if ev["elapsed"] is not None else "-"
+                    print(f"[tool] {ev['tool']} ✓ {elapsed} → {str(ev['output'])[:300]}", flush=True)
+                elif ev["type"] == "final" and not streamed:
+                    print(ev["answer"])
+            print("\n")
+    finally:
+        for task in (announcing, starting):
+            if not task.done():
+                task.cancel()
+        await mcp.close()
  
-    print("\nConnecting servers...")
-    await mcp.connect()
  
-    print("Discovering tools...")
-    await mcp.discover_tools()
+# --------------------------------------------------
+# BATCH MODE
+# --------------------------------------------------
+def read_queries(source: str):
+    stream = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    try:
+        for n, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                item = line
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict):
+                # a malformed line becomes an error record for that line instead of ending the batch
+                yield {"id": n, "invalid": f"line {n}: expected a JSON object or string, got {type(item).__name__}"}
+                continue
+            item.setdefault("id", n)
+            if not isinstance(item.get("query"), str) or not item["query"].strip():
+                item["invalid"] = f"line {n}: missing or empty 'query'"
+            yield item
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+ 
+ 
+async def run_batch(mcp: "MultiMCP", source: str, out_path: str, concurrency: int = 4) -> Dict[str, Any]:
+    queries = read_queries(source)
+    workers = max(1, concurrency)
+    pending: asyncio.Queue = asyncio.Queue(maxsize=workers)
+    write_lock = asyncio.Lock()
+    latencies: List[float] = []
+    failed = 0
+    started = time.perf_counter()
+ 
+    with open(out_path, "a", encoding="utf-8") as out:
+ 
+        async def reader():
+            try:
+                while True:
+                    # stdin (and file) reads block, so lines are pulled in a worker thread
+                    item = await asyncio.to_thread(next, queries, None)
+                    if item is None:
+                        break
+                    await pending.put(item)
+            finally:
+                for _ in range(workers):
+                    await pending.put(None)
+ 
+        async def worker():
+            nonlocal failed
+            while (item := await pending.get()) is not None:
+                t0 = time.perf_counter()
+                record = {"id": item["id"]}
+                try:
+                    if "invalid" in item:
+                        raise ValueError(item["invalid"])
+                    record["query"] = item["query"]
+                    # each query gets its own memory so batch runs never share history
+                    res = await mcp.ask(item["query"], memory=mcp.new_memory(), priority=item.get("priority", "bulk"))
+                    record.update(answer=res["answer"], steps=res["steps"])
+                except Exception as e:
+                    failed += 1
+                    record["error"] = repr(e)
+                    logger.error(f"[BATCH] {item['id']} failed → {e!r}")
+                record["elapsed"] = round(time.perf_counter() - t0, 3)
+                latencies.append(record["elapsed"])
+ 
+                async with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                    out.flush()
+                print(f"[{len(latencies)}] {item['id']} {'FAILED' if 'error' in record else 'ok'} in {record['elapsed']}s")
+ 
+        await asyncio.gather(reader(), *(worker() for _ in range(workers)))
+ 
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "queries": len(ordered),
+        "failed": failed,
+        "concurrency": concurrency,
+        "wall_s": round(wall, 3),
+        "throughput_qpm": round(60 * len(ordered) / wall, 2) if wall else 0.0,
+        "p50_s": ordered[len(ordered) // 2] if ordered else None,
+        "p95_s": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else None,
+    }
  
-    print("Building agent...")
-    await mcp.build_agent()
  
-    print("\nREADY. Type 'exit' to quit.\n")
+async def batch(source: str, out_path: str, concurrency: int):
+    mcp = MultiMCP()
+    await mcp.startup()
  
-    while True:
-        q = input(">> ").strip()
-        if q.lower() in {"exit", "quit"}:
-            break
+    try:
+        summary = await run_batch(mcp, source, out_path, concurrency)
+    finally:
+        await mcp.close()
  
-        res = await mcp.ask(q)
+    print("\n--- BATCH SUMMARY ---")
+    print(json.dumps(summary, indent=2))
  
-        print("\n--- RESULT ---")
-        print(res["answer"])
  
-        print("\n--- STEPS ---")
-        for s in res["steps"]:
-            print(s)
-        print()
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
  
  
 # --------------------------------------------------
 # MAIN
 # --------------------------------------------------
 if __name__ == "__main__":
-    asyncio.run(cli())
+    parser = argparse.ArgumentParser(description="SAP multi-MCP agent client")
+    parser.add_argument("--batch", metavar="JSONL", help="run queries from a JSONL file ('-' for stdin) instead of the REPL")
+    parser.add_argument("--out", default="batch_results.jsonl", help="batch output file (JSONL, appended)")
+    parser.add_argument("--concurrency", type=int, default=4, help="queries run at once in batch mode")
+    parser.add_argument("--session", default="default", help="REPL session (thread ID): its memory persists across restarts")
+    cli_args = parser.parse_args()
+ 
+    if cli_args.batch:
+        asyncio.run(batch(cli_args.batch, cli_args.out, cli_args.concurrency))
+    else:
+        asyncio.run(cli(cli_args.session))
  
- 
\ No newline at end of file
@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from _util.llm_governor import QueueTimeoutError
+from _util.router import RouteResult
+from pipo_client_code import MultiMCP
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------
+# SERVICE SETTINGS
+# --------------------------------------------------
+SESSION_TTL = 1800.0
+MAX_SESSIONS = 1000
+
+# documentation runs are long; they get their own, smaller lane so they cannot starve other queries
+ADMISSION_LANES = {
+    "default": {"max_concurrent": 8, "max_queue": 32},
+    "documentation": {"max_concurrent": 2, "max_queue": 8},
+}
+RETRY_AFTER_SECONDS = 5
+
+
+class AskRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+    # false: skip the LLM response cache for this query (the fresh answer is still cached)
+    cache: bool = True
+    # LLM queue class: interactive | bulk | background; default: bulk for documentation runs, else interactive
+    priority: Optional[str] = None
+
+
+# --------------------------------------------------
+# SESSIONS
+# --------------------------------------------------
+class SessionStore:
+    def __init__(self, mcp: MultiMCP, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        self.mcp = mcp
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session_id → (memory, lock, last_used)
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+
+    def _expire(self, keep: str):
+        # oldest first; a session with a request in flight is skipped rather than waited on, so
+        # one busy session cannot pin every idle one behind it past the TTL or the cap
+        now = time.monotonic()
+        excess = len(self._sessions) - self.max_sessions
+        for sid, entry in list(self._sessions.items()):
+            if now - entry[2] < self.ttl and excess <= 0:
+                break
+            if sid == keep or entry[1].locked():
+                continue
+            del self._sessions[sid]
+            excess -= 1
+
+    async def get(self, session_id: Optional[str]):
+        # a known session that expired here (or outlived a restart) is reloaded from the checkpoint store
+        memory = None
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+            memory = self.mcp.new_memory()
+        elif session_id not in self._sessions:
+            memory = await self.mcp.aload_session(session_id)
+        # another request may have loaded the same session while this one waited on the store
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            entry = [memory, asyncio.Lock(), time.monotonic()]
+            self._sessions[session_id] = entry
+        entry[2] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        self._expire(keep=session_id)
+        return session_id, entry[0], entry[1]
+
+    async def drop(self, session_id: str) -> bool:
+        dropped = self._sessions.pop(session_id, None) is not None
+        return await asyncio.to_thread(self.mcp.drop_session, session_id) or dropped
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+# --------------------------------------------------
+# ADMISSION CONTROL
+# --------------------------------------------------
+class AdmissionLane:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._sem = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.running = 0
+        self.stats = {"admitted": 0, "rejected": 0, "wait_time": 0.0}
+
+    def check(self):
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail=f"{self.name} queue is full, retry later",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+    async def acquire(self):
+        self.check()
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        self.stats["admitted"] += 1
+        self.stats["wait_time"] += time.perf_counter() - started
+
+    def release(self):
+        self.running -= 1
+        self._sem.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "wait_time": round(self.stats["wait_time"], 4),
+            "waiting": self.waiting,
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+
+# --------------------------------------------------
+# APP
+# --------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # an embedding caller may hand in an already warm MultiMCP via app.state.mcp
+    mcp = getattr(app.state, "mcp", None)
+    if mcp is None:
+        mcp = MultiMCP()
+        await mcp.startup()
+
+    app.state.mcp = mcp
+    app.state.sessions = SessionStore(mcp)
+    app.state.lanes = {name: AdmissionLane(name, **opts) for name, opts in ADMISSION_LANES.items()}
+    logger.info("[SERVER] ready with %d tools", len(mcp.tools))
+    try:
+        yield
+    finally:
+        await mcp.close()
+
+
+app = FastAPI(title="pipo_client", lifespan=lifespan)
+
+
+@app.exception_handler(QueueTimeoutError)
+async def llm_queue_timeout(request: Request, exc: QueueTimeoutError):
+    # the LLM call never left the governor queue, so the whole request can be retried
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+def _lane(route: RouteResult) -> AdmissionLane:
+    return app.state.lanes["documentation" if route.is_documentation else "default"]
+
+
+@app.post("/ask")
+async def ask(req: AskRequest):
+    route = app.state.mcp.route(req.query)
+    lane = _lane(route)
+    await lane.acquire()
+    try:
+        session_id, memory, lock = await app.state.sessions.get(req.session_id)
+        started = time.perf_counter()
+        async with lock:
+            res = await app.state.mcp.ask(
+                req.query, memory=memory, cache=req.cache, thread_id=session_id, priority=req.priority, route=route
+            )
+        return {
+            "session_id": session_id,
+            "answer": res["answer"],
+            "steps": res["steps"],
+            "elapsed": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        lane.release()
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    route = app.state.mcp.route(req.query)
+    lane = _lane(route)
+    lane.check()
+
+    async def events():
+        # the slot is taken inside the generator so it is only held while the response streams;
+        # the session is only created once admitted, so a request dropped while queued leaves none behind
+        await lane.acquire()
+        try:
+            session_id, memory, lock = await app.state.sessions.get(req.session_id)
+            async with lock:
+                yield json.dumps({"type": "session", "session_id": session_id}) + "\n"
+                async for ev in app.state.mcp.ask_stream(
+                    req.query, memory=memory, cache=req.cache, thread_id=session_id, priority=req.priority, route=route
+                ):
+                    yield json.dumps(ev, ensure_ascii=False, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"[SERVER] stream failed → {e!r}")
+            error = {"type": "error", "error": repr(e)}
+            if isinstance(e, QueueTimeoutError):
+                error["retry_after"] = RETRY_AFTER_SECONDS
+            yield json.dumps(error) + "\n"
+        finally:
+            lane.release()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/sessions/{session_id}/resume")
+async def resume_session(session_id: str):
+    query = await asyncio.to_thread(app.state.mcp.interrupted_run, session_id)
+    if query is None:
+        raise HTTPException(status_code=404, detail="no interrupted run for this session")
+    route = app.state.mcp.route(query)
+    lane = _lane(route)
+    await lane.acquire()
+    try:
+        _, memory, lock = await app.state.sessions.get(session_id)
+        started = time.perf_counter()
+        async with lock:
+            res = await app.state.mcp.resume(session_id, memory=memory, route=route)
+        return {
+            "session_id": session_id,
+            "answer": res["answer"],
+            "steps": res["steps"],
+            "elapsed": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        lane.release()
+
+
+@app.delete("/sessions/{session_id}")
+async def drop_session(session_id: str):
+    if not await app.state.sessions.drop(session_id):
+        raise HTTPException(status_code=404, detail="unknown session")
+    return {"session_id": session_id, "dropped": True}
+
+
+@app.get("/runs")
+async def find_runs(
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    query: Optional[str] = None,
+    server: Optional[str] = None,
+    tool: Optional[str] = None,
+    limit: int = 50,
+):
+    # SQLite reads run in a thread so in-flight /ask streams are not stalled
+    return await asyncio.to_thread(
+        app.state.mcp.find_runs, since=since, until=until, query=query, server=server, tool=tool, limit=min(limit, 500)
+    )
+
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    # segment read + zstd decompression, off the event loop
+    run = await asyncio.to_thread(app.state.mcp.get_run, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="unknown run")
+    return run
+
+
+@app.get("/runs/{run_id}/pdf")
+async def get_run_pdf(run_id: str, mode: str = "full"):
+    # PDFs are only rendered on request, from the stored run
+    try:
+        path = await asyncio.to_thread(app.state.mcp.export_pdf, run_id, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="unknown run")
+    return FileResponse(path, media_type="application/pdf", filename=os.path.basename(path))
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "tools": len(app.state.mcp.tools)}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "sessions": len(app.state.sessions),
+        "admission": {name: lane.snapshot() for name, lane in app.state.lanes.items()},
+        **app.state.mcp.stats(),
+    }
+
+
+# --------------------------------------------------
+# MAIN
+# --------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve MultiMCP over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    cli_args = parser.parse_args()
+
+    uvicorn.run(app, host=cli_args.host, port=cli_args.port)